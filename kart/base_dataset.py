@@ -11,6 +11,7 @@ from kart import crs_util
 from kart.core import find_blobs_with_paths_in_tree
 from kart.dataset_mixins import DatasetDiffMixin
 from kart.exceptions import InvalidOperation, UNSUPPORTED_VERSION, PATCH_DOES_NOT_APPLY
+from kart.parsed_blob_cache import PARSED_BLOB_CACHE
 from kart.serialise_util import ensure_text, ensure_bytes, json_pack, json_unpack
 
 
@@ -364,16 +365,19 @@ class BaseDataset(DatasetDiffMixin, metaclass=BaseDatasetMetaClass):
         JSON objects using json.loads(). All user-visible meta-items should be JSON dumpable once deserialised, whether
         or not they are stored as JSON. Meta-items that are for internal use only can use binary fornats.
         """
-        data = self.get_data_at(
+        blob = self.get_blob_at(
             meta_item_path, missing_ok=missing_ok, from_tree=self.meta_tree
         )
-        if data is None:
-            return data
+        if blob is None:
+            return None
         definition = self.get_meta_item_definition(meta_item_path)
         file_type = MetaItemFileType.get_from_definition_or_suffix(
             definition, meta_item_path
         )
-        return file_type.decode_from_bytes(data)
+        if file_type == MetaItemFileType.WKT:
+            # Normalising WKT is slow, and the same CRS blobs are found at many commits.
+            return PARSED_BLOB_CACHE.get("crs", blob, file_type.decode_from_bytes)
+        return file_type.decode_from_bytes(blob.data)
 
     @functools.lru_cache()
     def meta_items(self, min_visibility=MetaItemVisibility.VISIBLE):
@@ -13,6 +13,8 @@ from .key_filters import RepoKeyFilter
 from .promisor_utils import FetchPromisedBlobsProcess, object_is_promised
 from .repo import KartRepoState
 from .spatial_filter import SpatialFilter
+from .tabular.feature_output import reproject_features
+from .utils import chunk
 
 
 L = logging.getLogger("kart.diff_writer")
@@ -34,6 +36,11 @@ class BaseDiffWriter:
     # as we know the delta does or does not match the spatial filter.
     record_spatial_filter_stats = False
 
+    # Writers that output each dataset's feature deltas once, as they go, set this to True - then large diffs are
+    # streamed from the repository as they are written, rather than being generated in full first.
+    # See diff_structs.StreamingDeltaDiff.
+    stream_feature_deltas = False
+
     @classmethod
     def get_diff_writer_class(cls, output_format):
         if output_format == "quiet":
@@ -76,6 +83,7 @@ class BaseDiffWriter:
         target_crs=None,
         # used by json-lines diffs only
         diff_estimate_accuracy=None,
+        num_processes=None,
     ):
         self.repo = repo
         self.commit_spec = commit_spec
@@ -111,6 +119,7 @@ class BaseDiffWriter:
 
         self.json_style = json_style
         self.target_crs = target_crs
+        self.num_processes = num_processes
 
         self.commit = None
         self.do_convert_to_dataset_format = False
@@ -239,17 +248,11 @@ class BaseDiffWriter:
         """Default implementation for writing a diff. Subclasses can override."""
         self.write_header()
         self.has_changes = False
-        for ds_path in self.all_ds_paths:
-            self.has_changes |= self.write_ds_diff_for_path(ds_path)
+        for ds_path, ds_diff in self.get_dataset_diffs():
+            self.has_changes |= bool(ds_diff)
+            self.write_ds_diff(ds_path, ds_diff)
         self.write_warnings_footer()
 
-    def write_ds_diff_for_path(self, ds_path):
-        """Default implementation for writing the diff for a particular dataset. Subclasses can override."""
-        ds_diff = self.get_dataset_diff(ds_path)
-        has_changes = bool(ds_diff)
-        self.write_ds_diff(ds_path, ds_diff)
-        return has_changes
-
     def write_ds_diff(self, ds_path, ds_diff):
         """For outputting ds_diff, the diff of a particular dataset."""
         raise NotImplementedError()
@@ -265,6 +268,25 @@ class BaseDiffWriter:
             workdir_diff_cache=self.workdir_diff_cache,
             repo_key_filter=self.repo_key_filter,
             convert_to_dataset_format=self.do_convert_to_dataset_format,
+            num_processes=self.num_processes,
+        )
+
+    def get_dataset_diffs(self):
+        """
+        Generator. Yields (ds_path, ds_diff) for every dataset in self.all_ds_paths, in order - see get_dataset_diff.
+        If self.num_processes is more than 1, the datasets may be diffed in worker processes.
+        If self.stream_feature_deltas is True, large dataset diffs may be streamed, so each can only be output once.
+        """
+        return diff_util.get_dataset_diffs(
+            self.all_ds_paths,
+            self.base_rs,
+            self.target_rs,
+            include_wc_diff=self.include_wc_diff,
+            workdir_diff_cache=self.workdir_diff_cache,
+            repo_key_filter=self.repo_key_filter,
+            convert_to_dataset_format=self.do_convert_to_dataset_format,
+            num_processes=self.num_processes,
+            streaming=self.stream_feature_deltas,
         )
 
     def get_dataset_diff(self, ds_path):
@@ -462,6 +484,49 @@ class BaseDiffWriter:
         )
         return (_get_transform(old_crs), _get_transform(new_crs))
 
+    # How many feature-deltas are reprojected together - see reprojected_ds_feature_deltas.
+    REPROJECT_BATCH_SIZE = 1000
+
+    def reprojected_ds_feature_deltas(self, ds_path, ds_diff, need_old=None):
+        """
+        Yields key, delta, old_value, new_value for the same feature-deltas as filtered_ds_feature_deltas,
+        where old_value and new_value are the old and new features (or None), with their geometries
+        reprojected into self.target_crs if it is set. Deltas are reprojected in batches, so that the
+        geometries of a whole batch are transformed together - see reproject_features.
+        If need_old is set, old features are only loaded for deltas where need_old(delta) is True -
+        otherwise old_value is None - so that writers that don't output every old feature don't read them.
+        """
+        old_transform, new_transform = self.get_geometry_transforms(ds_path, ds_diff)
+        deltas = self.filtered_ds_feature_deltas(ds_path, ds_diff)
+
+        def _has_old(delta):
+            return delta.old is not None and (need_old is None or need_old(delta))
+
+        if old_transform is None and new_transform is None:
+            for key, delta in deltas:
+                old_value = delta.old_value if _has_old(delta) else None
+                new_value = delta.new_value if delta.new else None
+                yield key, delta, old_value, new_value
+            return
+
+        for batch in chunk(deltas, self.REPROJECT_BATCH_SIZE):
+            old_values = iter(
+                reproject_features(
+                    [(d.old_value, d.old_key) for k, d in batch if _has_old(d)],
+                    old_transform,
+                )
+            )
+            new_values = iter(
+                reproject_features(
+                    [(d.new_value, d.new_key) for k, d in batch if d.new],
+                    new_transform,
+                )
+            )
+            for key, delta in batch:
+                old_value = next(old_values) if _has_old(delta) else None
+                new_value = next(new_values) if delta.new else None
+                yield key, delta, old_value, new_value
+
     def get_spatial_filters(self, ds_path, ds_diff):
         """
         Returns old_spatial_filter, new_spatial filter for the datast at a particular path -
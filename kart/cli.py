@@ -3,6 +3,7 @@ import importlib
 import importlib.util
 import inspect
 import logging
+import multiprocessing
 import os
 import io
 import pathlib
@@ -184,6 +185,31 @@ def cli(ctx, repo_dir, verbose, post_mortem):
         # enable SQLAlchemy query logging
         logging.getLogger("sqlalchemy.engine").setLevel("INFO")
 
+    _configure_caches(ctx.obj.repo_path)
+    ctx.call_on_close(_log_cache_stats)
+
+
+def _configure_caches(repo_path):
+    """Configures the process-wide caches once per command, from the config of the command's own repo, if any."""
+    from kart.exceptions import NotFound
+    from kart.repo import KartRepo
+    from kart.tabular.feature_cache import DECODED_FEATURE_CACHE
+
+    try:
+        repo = KartRepo(repo_path, validate=False)
+    except NotFound:
+        DECODED_FEATURE_CACHE.configure(0)
+        return
+    DECODED_FEATURE_CACHE.configure_from_repo(repo)
+
+
+def _log_cache_stats():
+    from kart.parsed_blob_cache import PARSED_BLOB_CACHE
+    from kart.tabular.feature_cache import DECODED_FEATURE_CACHE
+
+    PARSED_BLOB_CACHE.log_stats()
+    DECODED_FEATURE_CACHE.log_stats()
+
 
 # straight process-replace commands
 
@@ -388,6 +414,8 @@ def load_commands_from_args(args, skip_first_arg=True):
 
 
 def entrypoint():
+    # Worker processes (eg, for encoding features during an import) need this when Kart is frozen by PyInstaller.
+    multiprocessing.freeze_support()
     load_commands_from_args(sys.argv)
     cli()
 
@@ -53,6 +53,46 @@ def find_blobs_with_paths_in_tree(tree, path=""):
             yield from find_blobs_with_paths_in_tree(entry, path=entry_path)
 
 
+def diff_trees(old_tree, new_tree, path=""):
+    """
+    Recursively yields a (path, old_blob, new_blob) tuple for every blob that is different between the two given
+    directory trees - old_blob is None for blobs that are only in new_tree, and new_blob is None for blobs that are
+    only in old_tree. Either tree can be None, meaning it is empty. Subtrees that are the same in both are skipped,
+    and nothing more than the two trees currently being compared is held in memory, so this can be used to stream
+    very large diffs. Blobs are yielded in the order of their paths.
+    """
+    old_entries = {e.name: e for e in old_tree} if old_tree is not None else {}
+    new_entries = {e.name: e for e in new_tree} if new_tree is not None else {}
+
+    for name in sorted(old_entries.keys() | new_entries.keys()):
+        old_entry = old_entries.get(name)
+        new_entry = new_entries.get(name)
+        if (
+            old_entry is not None
+            and new_entry is not None
+            and old_entry.id == new_entry.id
+        ):
+            continue
+
+        entry_path = f"{path}/{name}" if path else name
+        old_subtree = old_blob = new_subtree = new_blob = None
+        if old_entry is not None:
+            if old_entry.type == pygit2.GIT_OBJ_TREE:
+                old_subtree = old_entry
+            elif old_entry.type == pygit2.GIT_OBJ_BLOB:
+                old_blob = old_entry
+        if new_entry is not None:
+            if new_entry.type == pygit2.GIT_OBJ_TREE:
+                new_subtree = new_entry
+            elif new_entry.type == pygit2.GIT_OBJ_BLOB:
+                new_blob = new_entry
+
+        if old_subtree is not None or new_subtree is not None:
+            yield from diff_trees(old_subtree, new_subtree, path=entry_path)
+        if old_blob is not None or new_blob is not None:
+            yield entry_path, old_blob, new_blob
+
+
 def walk_tree(top, path="", topdown=True):
     """
     Corollary of os.walk() for git Tree objects:
@@ -1,5 +1,6 @@
 import pygit2
 
+from kart.core import diff_trees
 from kart.diff_structs import DatasetDiff, DeltaDiff, Delta
 from kart.key_filters import DatasetKeyFilter, MetaKeyFilter, UserStringKeyFilter
 
@@ -7,10 +8,19 @@ from kart.key_filters import DatasetKeyFilter, MetaKeyFilter, UserStringKeyFilte
 class DatasetDiffMixin:
     """Adds diffing of meta-items to a dataset, by delegating to dataset.meta_items()"""
 
-    def diff(self, other, ds_filter=DatasetKeyFilter.MATCH_ALL, reverse=False):
+    def diff(
+        self,
+        other,
+        ds_filter=DatasetKeyFilter.MATCH_ALL,
+        reverse=False,
+        *,
+        streaming=False,
+    ):
         """
         Generates a Diff from self -> other.
         If reverse is true, generates a diff from other -> self.
+        If streaming is true, large diffs of features (or tiles) are StreamingDeltaDiffs, which are only generated as
+        they are output - see diff_structs.StreamingDeltaDiff. Meta-item diffs are always generated up front.
         """
         ds_diff = DatasetDiff()
         meta_filter = ds_filter.get("meta", ds_filter.child_type())
@@ -76,6 +86,10 @@ class DatasetDiffMixin:
         )
         return diff
 
+    # A key-filtered diff looks up each key in turn if there are at most this many keys in the filter -
+    # otherwise it diffs the whole subtree and filters the results.
+    TARGETED_DIFF_MAX_KEYS = 1000
+
     def diff_subtree(
         self,
         other,
@@ -84,7 +98,9 @@ class DatasetDiffMixin:
         *,
         key_decoder_method,
         value_decoder_method,
+        key_encoder_method=None,
         reverse=False,
+        streaming=False,
     ):
         """
         A pattern for datasets to use for diffing some specific subtree. Works as follows:
@@ -96,6 +112,11 @@ class DatasetDiffMixin:
         5. Run some transform on each path to decide what to call each item (eg decode primary key)
         6. Run some transform on each path to load the content of each item (eg, read and decode feature)
 
+        If key_encoder_method is set and the key filter only has a few keys in it, steps 1 to 3 are skipped -
+        instead, the path of each key in the filter is looked up in both datasets, and only those items are diffed.
+        If streaming is True, steps 1 to 3 are done by walking both subtrees as the deltas are yielded, rather than by
+        generating a pygit2.Diff of every change up front - so that even very large diffs don't use much memory.
+
         Args:
         other - a dataset similar to self (ie the same dataset, but at a different commit).
             This can be None, in which case there are no items in other and they don't need to be transformed.
@@ -103,14 +124,13 @@ class DatasetDiffMixin:
         key_filter - deltas are only yielded if they involve at least one key that matches the key filter.
         key_decoder_method, value_decoder_method - these must be names of methods that are present in both
             self and other - self's methods are used to decode self's items, and other's methods for other's items.
+        key_encoder_method - optional, the name of a method present in both self and other, which is the inverse of
+            key_decoder_method: given a key from the key filter, it returns the path of that item (relative to the
+            dataset, ie starting with subtree_name), or raises a ValueError if it can't.
         reverse - normally yields deltas from self -> other, but if reverse is True, yields deltas from other -> self.
+        streaming - see above.
         """
-        # TODO - if the key-filter is very restrictive (ie it has only a few items in) then
-        # it would be more efficient if we first search for those items and diff only those.
-
         subtree_name = subtree_name.rstrip("/")
-        raw_diff = self.get_raw_diff_for_subtree(other, subtree_name, reverse=reverse)
-        # NOTE - we could potentially call diff.find_similar() to detect renames here,
 
         if reverse:
             old, new = other, self
@@ -128,6 +148,49 @@ class DatasetDiffMixin:
             # This shouldn't happen:
             return lambda x: _no_dataset_error(method_name)
 
+        if (
+            key_encoder_method is not None
+            and not key_filter.match_all
+            and len(key_filter) <= self.TARGETED_DIFF_MAX_KEYS
+        ):
+            paths = self._encode_key_filter_to_paths(
+                (old, new), key_filter, key_encoder_method
+            )
+            if paths is not None:
+                self.L.debug(
+                    "diff %s: looking up %d paths for %d keys",
+                    subtree_name,
+                    len(paths),
+                    len(key_filter),
+                )
+                yield from self.diff_paths(
+                    old,
+                    new,
+                    paths,
+                    key_filter,
+                    old_key_transform=get_decoder(old, key_decoder_method),
+                    old_value_transform=get_decoder(old, value_decoder_method),
+                    new_key_transform=get_decoder(new, key_decoder_method),
+                    new_value_transform=get_decoder(new, value_decoder_method),
+                )
+                return
+
+        if streaming:
+            old_subtree = old.get_subtree(subtree_name) if old else None
+            new_subtree = new.get_subtree(subtree_name) if new else None
+            yield from self.transform_blob_changes(
+                diff_trees(old_subtree, new_subtree, path=subtree_name),
+                key_filter,
+                old_key_transform=get_decoder(old, key_decoder_method),
+                old_value_transform=get_decoder(old, value_decoder_method),
+                new_key_transform=get_decoder(new, key_decoder_method),
+                new_value_transform=get_decoder(new, value_decoder_method),
+            )
+            return
+
+        raw_diff = self.get_raw_diff_for_subtree(other, subtree_name, reverse=reverse)
+        # NOTE - we could potentially call diff.find_similar() to detect renames here,
+
         path_decoder = lambda path: f"{subtree_name}/{path}"
 
         yield from self.transform_raw_deltas(
@@ -141,6 +204,79 @@ class DatasetDiffMixin:
             new_value_transform=get_decoder(new, value_decoder_method),
         )
 
+    @classmethod
+    def _encode_key_filter_to_paths(cls, datasets, key_filter, key_encoder_method):
+        """
+        Returns a sorted list of every path that any key in the key filter could be found at, in any of the given
+        datasets - or None if any of the keys can't be encoded, in which case the whole subtree must be diffed.
+        """
+        paths = set()
+        for dataset in datasets:
+            if dataset is None:
+                continue
+            key_encoder = getattr(dataset, key_encoder_method)
+            try:
+                paths.update(key_encoder(key) for key in key_filter)
+            except (ValueError, TypeError):
+                return None
+        return sorted(paths)
+
+    def diff_paths(
+        self,
+        old,
+        new,
+        paths,
+        key_filter=UserStringKeyFilter.MATCH_ALL,
+        **transforms,
+    ):
+        """
+        Given a list of paths (relative to the dataset), yields a Kart delta for each path where the blob in the old
+        dataset is different to the blob in the new dataset - the same deltas that transform_raw_deltas would yield
+        for those paths, given a diff of the whole tree. Either dataset can be None, meaning it has no blobs.
+        See transform_blob_changes for the transforms that can be supplied.
+        """
+
+        def _blob_changes():
+            for path in paths:
+                old_blob = old.get_blob_at(path, missing_ok=True) if old else None
+                new_blob = new.get_blob_at(path, missing_ok=True) if new else None
+                if old_blob is None and new_blob is None:
+                    continue
+                if old_blob is not None and new_blob is not None:
+                    if old_blob.id == new_blob.id:
+                        continue
+                yield path, old_blob, new_blob
+
+        yield from self.transform_blob_changes(
+            _blob_changes(), key_filter, **transforms
+        )
+
+    def transform_blob_changes(
+        self,
+        blob_changes,
+        key_filter=UserStringKeyFilter.MATCH_ALL,
+        *,
+        old_key_transform=lambda x: x,
+        old_value_transform=lambda x: x,
+        new_key_transform=lambda x: x,
+        new_value_transform=lambda x: x,
+    ):
+        """
+        Like transform_raw_deltas, but given (path, old_blob, new_blob) tuples - such as those yielded by
+        core.diff_trees - rather than pygit2 deltas. The paths must already be relative to the dataset.
+        """
+        for path, old_blob, new_blob in blob_changes:
+            old_key = old_key_transform(path) if old_blob is not None else None
+            new_key = new_key_transform(path) if new_blob is not None else None
+            if old_key not in key_filter and new_key not in key_filter:
+                continue
+
+            self.L.debug("diff(): %s %s -> %s", path, old_key, new_key)
+            yield Delta(
+                (old_key, old_value_transform(path)) if old_blob is not None else None,
+                (new_key, new_value_transform(path)) if new_blob is not None else None,
+            )
+
     # We treat UNTRACKED like an ADD since we don't have a staging area -
     # if the user has untracked files, we have to assume they want to add them.
     # (This is not actually needed right now since we are not using this for working copy diffs).
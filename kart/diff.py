@@ -123,6 +123,13 @@ def feature_count_diff(
     help="Ignores file format differences in any new files when generating the diff - assumes that the new files will "
     "also committed using --convert-to-dataset-format, so the conversion step will remove the format differences.",
 )
+@click.option(
+    "--num-processes",
+    hidden=True,
+    type=click.INT,
+    default=None,
+    help="Number of worker processes to use when diffing more than one dataset (advanced users only)",
+)
 @click.argument("commit_spec", required=False, nargs=1)
 @click.argument("filters", nargs=-1)
 def diff(
@@ -137,6 +144,7 @@ def diff(
     filters,
     add_feature_count_estimate,
     convert_to_dataset_format,
+    num_processes,
 ):
     """
     Show changes between two commits, or between a commit and the working copy.
@@ -192,6 +200,7 @@ def diff(
         json_style=fmt,
         target_crs=crs,
         diff_estimate_accuracy=add_feature_count_estimate,
+        num_processes=num_processes,
     )
     diff_writer.convert_to_dataset_format(convert_to_dataset_format)
     diff_writer.write_diff()
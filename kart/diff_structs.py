@@ -1,6 +1,5 @@
+import itertools
 from collections import UserDict
-from dataclasses import dataclass
-from typing import Any
 
 from .exceptions import InvalidOperation
 
@@ -9,22 +8,37 @@ class Conflict(Exception):
     pass
 
 
-@dataclass
 class KeyValue:
     """
     A key-value pair. A delta is made of two of these - one old, one new.
+    Large diffs contain millions of these, so they use __slots__ rather than a per-instance __dict__.
     """
 
-    key: Any
-    value: Any
+    __slots__ = ("key", "value", "_cached_value")
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.key, self.value) == (other.key, other.value)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"KeyValue(key={self.key!r}, value={self.value!r})"
 
     @staticmethod
     def of(obj):
         """Ensures that the given object is a KeyValue, or None."""
-        if isinstance(obj, (KeyValue, type(None))):
+        if obj is None or obj.__class__ is KeyValue:
             return obj
         elif isinstance(obj, tuple):
             return KeyValue(*obj)
+        elif isinstance(obj, KeyValue):
+            return obj
         raise ValueError(f"Expected (key, value) tuple - got f{type(obj)}")
 
     def get_lazy_value(self):
@@ -44,7 +58,6 @@ class KeyValue:
 WORKING_COPY_EDIT = 0x1  # Delta represents a change made in the WC - it is "dirty".
 
 
-@dataclass
 class Delta:
     """
     An object changes from old to new. Either old or new can be None, for insert or delete operations.
@@ -58,10 +71,11 @@ class Delta:
     Prefer to access (old_key, new_key, old_value, new_value) over (old.key, new.key, old.value, new.value)
     - these handle one possible AttributeError if old or new is None.
     - these handle the case where old.value or new.value is a callable and can be lazily evaluated.
+
+    Like KeyValue, Delta uses __slots__ to keep the memory used by large diffs down.
     """
 
-    old: KeyValue
-    new: KeyValue
+    __slots__ = ("old", "new", "type", "flags")
 
     def __init__(self, old, new):
         self.old = KeyValue.of(old)
@@ -76,6 +90,16 @@ class Delta:
             self.type = "update"
         self.flags = 0
 
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.old, self.new) == (other.old, other.new)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Delta(old={self.old!r}, new={self.new!r})"
+
     @staticmethod
     def insert(new):
         return Delta(None, new)
@@ -207,7 +231,7 @@ class RichDict(UserDict):
         super().__init__(*args, **kwargs)
 
     def ensure_child_type(self, key, value):
-        if type(value) != self.child_type:
+        if not isinstance(value, self.child_type):
             raise TypeError(
                 f"{type(self).__name__} accepts children of type {self.child_type.__name__} "
                 f"but received {type(value).__name__}"
@@ -473,6 +497,68 @@ class DeltaDiff(Diff):
         return len(self)
 
 
+class StreamingDeltaDiff(DeltaDiff):
+    """
+    A DeltaDiff that doesn't need to hold all of its Deltas in memory at once, for diffs that are output as they are
+    generated. Up to MAX_BUFFERED_DELTAS deltas are read from the given iterable straight away - if that's all of them,
+    this is just like a DeltaDiff. Otherwise, the rest are read as sorted_items() is iterated, which can only be done
+    once, and all of the deltas are yielded in the order they were found rather than being sorted by key.
+    Either way, a StreamingDeltaDiff is only empty if there are no deltas - but len(), items() and so on only include
+    the deltas that were buffered, and it can't be inverted or concatenated.
+    """
+
+    MAX_BUFFERED_DELTAS = 10_000
+
+    def __init__(self, initial_contents=()):
+        self._remaining = None
+        self._streamed = False
+        if isinstance(initial_contents, (dict, UserDict)):
+            super().__init__(initial_contents)
+            return
+
+        super().__init__()
+        deltas = iter(initial_contents)
+        for delta in itertools.islice(deltas, self.MAX_BUFFERED_DELTAS):
+            self.add_delta(delta)
+        next_delta = next(deltas, None)
+        if next_delta is not None:
+            self._remaining = itertools.chain((next_delta,), deltas)
+
+    @property
+    def is_streaming(self):
+        """True if there were too many deltas to buffer, so the rest are read as sorted_items() is iterated."""
+        return self._remaining is not None
+
+    def sorted_items(self):
+        if not self.is_streaming:
+            return super().sorted_items()
+        return self._streamed_items()
+
+    def _streamed_items(self):
+        if self._streamed:
+            raise RuntimeError("A streamed diff can only be iterated once")
+        self._streamed = True
+        yield from self.items()
+        for delta in self._remaining:
+            yield delta.key, delta
+
+    def _check_not_streaming(self):
+        if self.is_streaming:
+            raise NotImplementedError("Can't modify a streamed diff")
+
+    def __invert__(self):
+        self._check_not_streaming()
+        return super().__invert__()
+
+    def __add__(self, other, result=None):
+        self._check_not_streaming()
+        return super().__add__(other, result=result)
+
+    def __iadd__(self, other):
+        self._check_not_streaming()
+        return super().__iadd__(other)
+
+
 class DatasetDiff(Diff):
     """A DatasetDiff contains up to two DeltaDiffs, at keys "meta" or "feature"."""
 
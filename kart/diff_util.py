@@ -1,9 +1,14 @@
+import functools
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
 
+import pygit2
 
-from .diff_structs import DatasetDiff, RepoDiff
+from .diff_structs import DatasetDiff, RepoDiff, StreamingDeltaDiff
 from .key_filters import DatasetKeyFilter, RepoKeyFilter
 from .structure import RepoStructure
+from .utils import bounded_ordered_map
 
 L = logging.getLogger("kart.diff_util")
 
@@ -41,6 +46,7 @@ def get_repo_diff(
     workdir_diff_cache=None,
     repo_key_filter=RepoKeyFilter.MATCH_ALL,
     convert_to_dataset_format=False,
+    num_processes=None,
 ):
     """
     Generates a RepoDiff containing an entry for every dataset in the repo
@@ -52,16 +58,70 @@ def get_repo_diff(
     workdir_diff_cache - not required, but can be provided if a WorkdirDiffCache is already in use
         to save repeated work.
     repo_key_filter - controls which datasets (and PK values) match and are included in the diff.
+    num_processes - if more than 1, datasets may be diffed in this many worker processes at once -
+        see get_dataset_diffs.
     """
 
     all_ds_paths = get_all_ds_paths(base_rs, target_rs, repo_key_filter)
 
+    repo_diff = RepoDiff()
+    for ds_path, ds_diff in get_dataset_diffs(
+        all_ds_paths,
+        base_rs,
+        target_rs,
+        include_wc_diff=include_wc_diff,
+        workdir_diff_cache=workdir_diff_cache,
+        repo_key_filter=repo_key_filter,
+        convert_to_dataset_format=convert_to_dataset_format,
+        num_processes=num_processes,
+    ):
+        repo_diff[ds_path] = ds_diff
+    # No need to recurse since self.get_dataset_diff already prunes the dataset diffs.
+    repo_diff.prune(recurse=False)
+    return repo_diff
+
+
+def get_dataset_diffs(
+    ds_paths,
+    base_rs,
+    target_rs,
+    *,
+    include_wc_diff=False,
+    workdir_diff_cache=None,
+    repo_key_filter=RepoKeyFilter.MATCH_ALL,
+    convert_to_dataset_format=False,
+    num_processes=None,
+    streaming=False,
+):
+    """
+    Generator. Yields (ds_path, ds_diff) for each of the given dataset paths, in the given order -
+    see get_dataset_diff.
+
+    If num_processes is more than 1, the datasets are diffed in a pool of worker processes, each of which opens the
+    repository for itself. Workers send back the keys and blob IDs of each delta, and the values are still only read
+    and decoded in this process as they are needed - the diffs are yielded in the given order, as each one is ready.
+    If streaming is set and a worker finds a dataset diff too large to buffer, that dataset is diffed again in this
+    process so that it can be streamed. Datasets are diffed one at a time in this process instead, if there's only one
+    dataset, if Kart is running as a helper, if the diff includes the working copy, or if this is a partial clone
+    (where missing features are fetched as the diff is output).
+    """
     if include_wc_diff and workdir_diff_cache is None:
         workdir_diff_cache = target_rs.repo.working_copy.workdir_diff_cache()
 
-    repo_diff = RepoDiff()
-    for ds_path in all_ds_paths:
-        repo_diff[ds_path] = get_dataset_diff(
+    if _use_diff_workers(ds_paths, target_rs.repo, include_wc_diff, num_processes):
+        yield from _parallel_dataset_diffs(
+            ds_paths,
+            base_rs,
+            target_rs,
+            repo_key_filter=repo_key_filter,
+            convert_to_dataset_format=convert_to_dataset_format,
+            num_processes=num_processes,
+            streaming=streaming,
+        )
+        return
+
+    for ds_path in ds_paths:
+        yield ds_path, get_dataset_diff(
             ds_path,
             base_rs.datasets(),
             target_rs.datasets(),
@@ -69,10 +129,184 @@ def get_repo_diff(
             workdir_diff_cache=workdir_diff_cache,
             ds_filter=repo_key_filter[ds_path],
             convert_to_dataset_format=convert_to_dataset_format,
+            streaming=streaming,
         )
-    # No need to recurse since self.get_dataset_diff already prunes the dataset diffs.
-    repo_diff.prune(recurse=False)
-    return repo_diff
+
+
+def _use_diff_workers(ds_paths, repo, include_wc_diff, num_processes):
+    if not num_processes or num_processes <= 1 or len(ds_paths) <= 1:
+        return False
+    if include_wc_diff or os.environ.get("KART_HELPER_PID"):
+        return False
+    return not repo.is_partial_clone()
+
+
+def _refish_for_worker(rs):
+    # The [EMPTY] tree isn't necessarily written to the ODB, so it has to be passed by name.
+    if rs.ref == "[EMPTY]":
+        return "[EMPTY]"
+    return (rs.commit or rs.tree).id.hex
+
+
+def _parallel_dataset_diffs(
+    ds_paths,
+    base_rs,
+    target_rs,
+    *,
+    repo_key_filter,
+    convert_to_dataset_format,
+    num_processes,
+    streaming,
+):
+    """
+    Generator. Yields the same (ds_path, ds_diff) tuples as get_dataset_diffs, in the same order,
+    but each dataset is diffed by a worker process.
+    """
+    num_processes = min(num_processes, len(ds_paths))
+    L.debug("Diffing %d datasets in %d processes", len(ds_paths), num_processes)
+    repo = target_rs.repo
+
+    def _worker_args():
+        for ds_path in ds_paths:
+            ds_filter = repo_key_filter[ds_path]
+            # Most filters match everything - these are recreated in the worker rather than pickled.
+            yield ds_path, None if ds_filter.match_all else ds_filter
+
+    with ProcessPoolExecutor(
+        max_workers=num_processes,
+        initializer=_init_diff_worker,
+        initargs=(
+            str(repo.gitdir_path),
+            _refish_for_worker(base_rs),
+            _refish_for_worker(target_rs),
+            convert_to_dataset_format,
+            streaming,
+        ),
+    ) as executor:
+        # Every worker stays busy, but at most a few diffs are held in memory waiting for their turn to be output.
+        for ds_path, ds_diff in bounded_ordered_map(
+            executor,
+            _diff_dataset_in_worker,
+            _worker_args(),
+            max_pending=num_processes * 2,
+        ):
+            if ds_diff is None:
+                L.debug("Streaming the diff of %s", ds_path)
+                ds_diff = get_dataset_diff(
+                    ds_path,
+                    base_rs.datasets(),
+                    target_rs.datasets(),
+                    ds_filter=repo_key_filter[ds_path],
+                    convert_to_dataset_format=convert_to_dataset_format,
+                    streaming=True,
+                )
+            else:
+                base_ds = base_rs.datasets().get(ds_path)
+                target_ds = target_rs.datasets().get(ds_path)
+                _attach_lazy_values(ds_diff, repo, base_ds, target_ds)
+            yield ds_path, ds_diff
+
+
+# The (repo, base_rs, target_rs, convert_to_dataset_format, streaming) used by the current worker process -
+# see _parallel_dataset_diffs.
+_worker_diff_context = None
+
+
+def _init_diff_worker(
+    repo_path, base_refish, target_refish, convert_to_dataset_format, streaming
+):
+    from .repo import KartRepo
+
+    global _worker_diff_context
+    repo = KartRepo(repo_path, validate=False)
+    _worker_diff_context = (
+        repo,
+        repo.structure(base_refish),
+        repo.structure(target_refish),
+        convert_to_dataset_format,
+        streaming,
+    )
+
+
+def _diff_dataset_in_worker(args):
+    """
+    Returns (ds_path, ds_diff), with the lazy values of ds_diff detached so that it can be sent to the parent process -
+    or (ds_path, None) if the diff is to be streamed but is too large to buffer, so that the parent streams it instead.
+    """
+    ds_path, ds_filter = args
+    repo, base_rs, target_rs, convert_to_dataset_format, streaming = (
+        _worker_diff_context
+    )
+    ds_diff = get_dataset_diff(
+        ds_path,
+        base_rs.datasets(),
+        target_rs.datasets(),
+        ds_filter=ds_filter if ds_filter is not None else DatasetKeyFilter.MATCH_ALL,
+        convert_to_dataset_format=convert_to_dataset_format,
+        streaming=streaming,
+    )
+    for delta_diff in ds_diff.values():
+        if isinstance(delta_diff, StreamingDeltaDiff) and delta_diff.is_streaming:
+            return ds_path, None
+    _detach_lazy_values(ds_diff)
+    return ds_path, ds_diff
+
+
+class _DetachedBlobValue:
+    """
+    Stands in for a promise to read and decode a blob - functools.partial(dataset.method_name, blob) - while a diff is
+    sent from a worker process to the parent. See _detach_lazy_values.
+    """
+
+    __slots__ = ("method_name", "blob_id")
+
+    def __init__(self, method_name, blob_id):
+        self.method_name = method_name
+        self.blob_id = blob_id
+
+    def promise(self, repo, dataset):
+        method = getattr(dataset, self.method_name)
+        oid = pygit2.Oid(raw=self.blob_id)
+        return lambda: method(repo[oid])
+
+
+def _detach_lazy_values(ds_diff):
+    """
+    Replaces every lazily-evaluated delta value in the given dataset diff with a _DetachedBlobValue, so that the diff
+    no longer refers to the datasets it came from and can be sent to another process, without any blobs being read.
+    Lazy values that aren't promises to decode a single blob are loaded instead.
+    """
+    for delta_diff in ds_diff.values():
+        for delta in delta_diff.values():
+            for key_value in (delta.old, delta.new):
+                if key_value is None or not callable(key_value.value):
+                    continue
+                promise = key_value.value
+                if (
+                    isinstance(promise, functools.partial)
+                    and hasattr(promise.func, "__self__")
+                    and len(promise.args) == 1
+                    and not promise.keywords
+                    and isinstance(promise.args[0], pygit2.Blob)
+                ):
+                    key_value.value = _DetachedBlobValue(
+                        promise.func.__name__, promise.args[0].id.raw
+                    )
+                else:
+                    key_value.value = key_value.get_lazy_value()
+
+
+def _attach_lazy_values(ds_diff, repo, old_ds, new_ds):
+    """
+    The inverse of _detach_lazy_values - old values are read from old_ds and new values from new_ds, as they are needed.
+    """
+    for delta_diff in ds_diff.values():
+        for delta in delta_diff.values():
+            for key_value, dataset in ((delta.old, old_ds), (delta.new, new_ds)):
+                if key_value is not None and isinstance(
+                    key_value.value, _DetachedBlobValue
+                ):
+                    key_value.value = key_value.value.promise(repo, dataset)
 
 
 def get_dataset_diff(
@@ -84,6 +318,7 @@ def get_dataset_diff(
     workdir_diff_cache=None,
     ds_filter=DatasetKeyFilter.MATCH_ALL,
     convert_to_dataset_format=False,
+    streaming=False,
 ):
     """
     Generates the DatasetDiff for the dataset at path dataset_path.
@@ -94,6 +329,9 @@ def get_dataset_diff(
     workdir_diff_cache - reusing the same WorkdirDiffCache for every dataset that is being diffed at one time
         is more efficient as it can save FileSystemWorkingCopy.raw_diff_from_index being called multiple times
     ds_filter - controls which PK values match and are included in the diff.
+    streaming - if True, the feature deltas of a large diff aren't all generated up front, but as the diff is output -
+        see diff_structs.StreamingDeltaDiff. Such a diff can only be output once. Diffs that include the working copy
+        are never streamed, since the working copy changes have to be combined with the rest of the diff.
     """
     base_target_diff = None
     target_wc_diff = None
@@ -113,7 +351,12 @@ def get_dataset_diff(
             from_ds, to_ds = target_ds, base_ds
             reverse = True
 
-        base_target_diff = from_ds.diff(to_ds, ds_filter=ds_filter, reverse=reverse)
+        base_target_diff = from_ds.diff(
+            to_ds,
+            ds_filter=ds_filter,
+            reverse=reverse,
+            streaming=streaming and not include_wc_diff,
+        )
         L.debug("base<>target diff (%s): %s", ds_path, repr(base_target_diff))
 
     if include_wc_diff:
@@ -1,8 +1,13 @@
+import collections
+import itertools
+import json
 import logging
+import os
 import subprocess
 import time
 import uuid
-from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
 from enum import Enum, auto
 
 import click
@@ -10,14 +15,17 @@ import pygit2
 
 from .cli_util import tool_environment
 from .exceptions import NO_CHANGES, InvalidOperation, NotFound, SubprocessError
+from .repo import KartRepoFiles
 from kart.tabular.version import (
     SUPPORTED_VERSIONS,
     dataset_class_for_version,
     extra_blobs_for_version,
 )
+from .tabular.import_profile import active_import_profile
 from .tabular.import_source import TableImportSource
 from .tabular.pk_generation import PkGeneratingTableImportSource
 from .timestamps import minutes_to_tz_offset
+from .utils import bounded_ordered_map, chunk
 
 L = logging.getLogger("kart.fast_import")
 
@@ -28,11 +36,31 @@ class FastImportSettings:
     If not set, reasonable defaults are used.
     """
 
-    def __init__(self, *, max_pack_size=None, max_delta_depth=None):
+    def __init__(
+        self,
+        *,
+        max_pack_size=None,
+        max_delta_depth=None,
+        num_processes=None,
+        chunk_size=None,
+        max_concurrent_sources=None,
+        checkpoint_interval=None,
+        optimise=False,
+    ):
         # Maximum size of pack files
         self.max_pack_size = max_pack_size or "2G"
         # Maximum depth of delta-compression chains
         self.max_delta_depth = max_delta_depth or 0
+        # Number of worker processes used to encode features. 1 means features are encoded in this process.
+        self.num_processes = num_processes or 1
+        # Number of features sent to a worker process at a time.
+        self.chunk_size = chunk_size or 1000
+        # Maximum number of sources that are imported at once, each by its own worker process and git-fast-import process.
+        self.max_concurrent_sources = max_concurrent_sources or 1
+        # Number of features imported between each checkpoint, during a resumable import.
+        self.checkpoint_interval = checkpoint_interval or 100_000
+        # Whether to repack the repository once the import is complete - see optimise_repo_after_import.
+        self.optimise = optimise
 
     def as_args(self):
         args = []
@@ -56,6 +84,122 @@ class ReplaceExisting(Enum):
     ALL = auto()
 
 
+class ResumableImportState:
+    """
+    The state of a resumable import, which is stored in the gitdir so that if the import is interrupted,
+    running it again continues from where it left off, rather than starting over.
+    During the import, the work done so far is regularly committed to the import ref using git-fast-import's
+    checkpoint command - each checkpoint ends one commit and starts the next, and the state records how far
+    through the sources each checkpoint commit got. Since git-fast-import only updates the import ref at a
+    checkpoint, the number of commits found at the import ref tells us which was the last successful checkpoint.
+    """
+
+    def __init__(self, repo, key, import_ref, checkpoints):
+        self.repo = repo
+        self.key = key
+        self.import_ref = import_ref
+        self.checkpoints = checkpoints
+
+        # Where this import starts from - which source, its position, and how many of its features are already
+        # imported. A position of None means the source hasn't been started yet.
+        self.source_index = 0
+        self.position = None
+        self.count = 0
+        # The last checkpoint commit, if we are resuming an interrupted import.
+        self.resume_commit = None
+
+        self._commit_header = None
+
+    @classmethod
+    def start_or_resume(cls, repo, sources, replace_existing, from_commit, limit):
+        """
+        Resumes the interrupted import stored in the gitdir if it was importing the same sources from the same
+        starting point as this import - otherwise, starts a new resumable import.
+        """
+        key = {
+            "sources": [[str(s), s.dest_path] for s in sources],
+            "replaceExisting": replace_existing.name,
+            "fromCommit": str(from_commit.id) if from_commit else None,
+            "limit": limit,
+        }
+        data = repo.read_gitdir_file(KartRepoFiles.IMPORT_STATE, missing_ok=True)
+        if data:
+            data = json.loads(data)
+            old_state = cls(repo, data["key"], data["importRef"], data["checkpoints"])
+            if old_state.key == key and old_state.import_ref in repo.references:
+                old_state._load_resume_point(from_commit)
+                return old_state
+            # A different import was interrupted - we can't resume that one, so clean it up.
+            old_state.discard()
+
+        return cls(repo, key, f"refs/kart-import/{uuid.uuid4()}", [])
+
+    def _load_resume_point(self, from_commit):
+        tip = self.repo.references[self.import_ref].peel(pygit2.Commit)
+        walker = self.repo.walk(tip.id)
+        if from_commit:
+            walker.hide(from_commit.id)
+        num_commits = sum(1 for c in walker)
+        if not num_commits:
+            return
+
+        self.checkpoints = self.checkpoints[:num_commits]
+        checkpoint = self.checkpoints[-1]
+        self.source_index = checkpoint["source"]
+        self.position = checkpoint["position"]
+        self.count = checkpoint["count"]
+        self.resume_commit = tip
+
+    @property
+    def is_resuming(self):
+        return self.resume_commit is not None
+
+    def generate_header(self, sources, message, from_commit):
+        """Returns the header for the first commit of this import - which continues from the last checkpoint, if any."""
+        if self.is_resuming:
+            message = self.resume_commit.message
+            from_commit = self.resume_commit
+        elif message is None:
+            message = generate_message(sources)
+
+        # Every checkpoint starts a new commit on the import ref, which follows on from the previous one.
+        self._commit_header = generate_header(
+            self.repo, sources, message, self.import_ref, None
+        )
+        return generate_header(
+            self.repo, sources, message, self.import_ref, from_commit
+        )
+
+    def checkpoint(self, proc, source_index, position, count):
+        """
+        Commits everything imported so far - which is everything up to the given position in the given source,
+        and count features of that source - and starts a new commit for whatever is imported next.
+        """
+        # The state is saved before the checkpoint is written, so it's never behind the import ref.
+        self.checkpoints.append(
+            {"source": source_index, "position": position, "count": count}
+        )
+        self.repo.write_gitdir_file(
+            KartRepoFiles.IMPORT_STATE,
+            json.dumps(
+                {
+                    "key": self.key,
+                    "importRef": self.import_ref,
+                    "checkpoints": self.checkpoints,
+                }
+            ),
+        )
+        proc.stdin.write(b"checkpoint\n\n")
+        proc.stdin.write(self._commit_header.encode("utf8"))
+        proc.stdin.flush()
+
+    def discard(self):
+        """Removes the stored state and the import ref, once the import is complete or can't be resumed."""
+        self.repo.remove_gitdir_file(KartRepoFiles.IMPORT_STATE)
+        if self.import_ref in self.repo.references:
+            self.repo.references.delete(self.import_ref)
+
+
 class _CommitMissing(Exception):
     pass
 
@@ -137,6 +281,27 @@ def should_compare_imported_features_against_old_features(
     return False
 
 
+def can_skip_unchanged_features(source, dataset, replacing_dataset, replace_ids):
+    """
+    Returns True iff we can import over the top of the existing features of replacing_dataset, rather than clearing
+    them first - in which case unchanged features needn't be sent to git-fast-import at all, and only new and changed
+    features are written, and any features that are no longer present are deleted.
+
+    This requires that features are still stored at the same paths - ie, the path structure is the same and
+    the primary key hasn't changed.
+    """
+    if replacing_dataset is None or replace_ids is not None:
+        return False
+    if getattr(source, "feature_blobs_already_written", False):
+        return False
+    if replacing_dataset.schema.diff_type_counts(source.schema)["pk_updates"]:
+        return False
+    return (
+        replacing_dataset.feature_path_encoder.to_dict()
+        == dataset.feature_path_encoder.to_dict()
+    )
+
+
 @contextmanager
 def git_fast_import(repo, *args):
     p = subprocess.Popen(
@@ -154,6 +319,15 @@ def git_fast_import(repo, *args):
         # if git-fast-import dies early, we get an EPIPE here
         # we'll deal with it below
         pass
+    except Exception:
+        # Let git-fast-import process everything it was sent so far (eg, any checkpoints),
+        # before it exits with an error due to the missing "done" command.
+        try:
+            p.stdin.close()
+        except BrokenPipeError:
+            pass
+        p.wait()
+        raise
     else:
         p.stdin.close()
     p.wait()
@@ -163,17 +337,20 @@ def git_fast_import(repo, *args):
         )
 
 
-def fast_import_clear_tree(*, proc, replace_ids, replacing_dataset, source):
+def fast_import_clear_tree(
+    *, proc, replace_ids, replacing_dataset, source, keep_features=False
+):
     """
     Clears out the appropriate trees in each of the fast_import processes,
     before importing any actual data over the top.
+    If keep_features is set, the existing features are left in place - see can_skip_unchanged_features.
     """
     if replacing_dataset is None:
         # nothing to do
         return
     dest_path = source.dest_path
     dest_inner_path = f"{dest_path}/{replacing_dataset.DATASET_DIRNAME}"
-    if replace_ids is None:
+    if replace_ids is None and not keep_features:
         # Delete the existing dataset, before we re-import it.
         proc.stdin.write(f"D {source.dest_path}\n".encode("utf8"))
     else:
@@ -209,6 +386,7 @@ def fast_import_tables(
     replace_ids=None,
     allow_empty=False,
     limit=None,
+    resumable=False,
     # Advanced use - used by kart upgrade.
     header=None,
     extra_cmd_args=(),
@@ -228,6 +406,8 @@ def fast_import_tables(
     from_commit - the commit to be used as a starting point before beginning the import.
     replace_ids - list of PK values to replace, or None
     limit - maximum number of features to import per source.
+    resumable - if True, the import is regularly checkpointed, and if it is interrupted, running it again
+        continues from the last checkpoint - see ResumableImportState.
 
     The following extra options are used by kart upgrade.
     header - the commit-header to supply git-fast-import. Generated if not supplied - see generate_header.
@@ -237,6 +417,8 @@ def fast_import_tables(
     if settings is None:
         settings = FastImportSettings()
 
+    profile = active_import_profile()
+
     # The commit that this import is using as the basis for the new commit.
     # If we are replacing everything, we start from scratch, so from_commit is None.
     if replace_existing is ReplaceExisting.ALL:
@@ -264,6 +446,9 @@ def fast_import_tables(
                 )
         assert replace_ids is None
 
+    if resumable and replace_ids is not None:
+        raise InvalidOperation("Resumable imports don't support replacing specific IDs")
+
     # Add primary keys if needed.
     sources = PkGeneratingTableImportSource.wrap_sources_if_needed(sources, repo)
 
@@ -276,17 +461,58 @@ def fast_import_tables(
     if verbosity >= 1:
         click.echo("Starting git-fast-import...")
 
+    # Each source can be imported by a separate git-fast-import process, and the resulting trees combined at the end.
+    # This isn't supported by the upgrade flow, which supplies its own header, or when replacing specific IDs,
+    # since the replace_ids iterator can't be shared between sources, or for resumable imports.
+    import_concurrently = (
+        settings.max_concurrent_sources > 1
+        and len(sources) > 1
+        and header is None
+        and replace_ids is None
+        and not resumable
+    )
+    source_refs = []
+    resume_state = None
+    import_complete = False
+
     try:
         import_ref = None
         if header is None:
-            # import onto a temp branch. then reset the head branch afterwards.
-            import_ref = f"refs/kart-import/{uuid.uuid4()}"
-
             # orig_branch may be None, if head is detached
             # FIXME - this code relies upon the fact that we always either a) import at HEAD (import flow)
             # or b) Fix up the branch heads later (upgrade flow).
             orig_branch = repo.head_branch
-            header = generate_header(repo, sources, message, import_ref, from_commit)
+
+            if resumable:
+                resume_state = ResumableImportState.start_or_resume(
+                    repo, sources, replace_existing, from_commit, limit
+                )
+                import_ref = resume_state.import_ref
+                header = resume_state.generate_header(sources, message, from_commit)
+                if resume_state.is_resuming and verbosity >= 1:
+                    click.echo(
+                        "Resuming interrupted import from the last checkpoint..."
+                    )
+            else:
+                # import onto a temp branch. then reset the head branch afterwards.
+                import_ref = f"refs/kart-import/{uuid.uuid4()}"
+                header = generate_header(
+                    repo, sources, message, import_ref, from_commit
+                )
+
+        if import_concurrently:
+            source_refs = [f"refs/kart-import/{uuid.uuid4()}" for source in sources]
+            _import_sources_concurrently(
+                repo,
+                sources,
+                source_refs,
+                cmd_args,
+                replace_existing,
+                from_commit,
+                limit,
+                verbosity,
+                settings,
+            )
 
         with git_fast_import(repo, *cmd_args) as proc:
             proc.stdin.write(header.encode("utf8"))
@@ -296,18 +522,44 @@ def fast_import_tables(
                 if replace_existing != ReplaceExisting.ALL and blob_path in from_tree:
                     raise ValueError(f"{blob_path} already exists")
 
-            for source in sources:
-                _import_single_source(
-                    repo,
-                    source,
-                    replace_existing,
-                    from_commit,
-                    proc,
-                    replace_ids,
-                    limit,
-                    verbosity,
-                )
-
+            if import_concurrently:
+                # The sources have already been imported - just copy each dataset's tree into this commit.
+                for source, source_ref in zip(sources, source_refs):
+                    source_tree = repo.revparse_single(source_ref).peel(pygit2.Tree)
+                    copy_existing_tree_to_stream(
+                        proc.stdin,
+                        source.dest_path,
+                        (source_tree / source.dest_path).id,
+                    )
+            else:
+                for i, source in enumerate(sources):
+                    if resume_state and i < resume_state.source_index:
+                        # This source was fully imported before the import was interrupted.
+                        continue
+                    _import_single_source(
+                        repo,
+                        source,
+                        replace_existing,
+                        from_commit,
+                        proc,
+                        replace_ids,
+                        limit,
+                        verbosity,
+                        settings,
+                        resume_state=resume_state,
+                        source_index=i,
+                    )
+                    if resume_state and i + 1 < len(sources):
+                        resume_state.checkpoint(proc, i + 1, None, 0)
+
+            if profile:
+                # Covers the time git-fast-import takes to finish up, once everything has been sent.
+                profile.start("git-fast-import-finish")
+
+        if profile:
+            profile.stop()
+
+        import_complete = True
         if import_ref is not None:
             # we created a temp branch for the import above.
             # now we need to reset the head branch to the temp branch tip.
@@ -318,18 +570,181 @@ def fast_import_tables(
 
             # use the existing commit details we already imported, but use the new tree
             existing_commit = repo.revparse_single(import_ref).peel(pygit2.Commit)
+            if resume_state:
+                # A resumable import is made up of several checkpoint commits - only the first one has the right parents.
+                parent_ids = [from_commit.id] if from_commit else []
+            else:
+                parent_ids = existing_commit.parent_ids
             repo.create_commit(
                 orig_branch or "HEAD",
                 existing_commit.author,
                 existing_commit.committer,
                 existing_commit.message,
                 new_tree.id,
-                existing_commit.parent_ids,
+                parent_ids,
             )
     finally:
+        if resume_state and not import_complete:
+            # Leave the import branch and the resume-state in place, so the import can be resumed.
+            if resume_state.checkpoints:
+                click.echo(
+                    "Import was interrupted - run the same command again to resume it from the last checkpoint.",
+                    err=True,
+                )
+            import_ref = None
+        elif resume_state:
+            resume_state.discard()
+
         # remove the import branches
-        if import_ref is not None and import_ref in repo.references:
-            repo.references.delete(import_ref)
+        for ref in [import_ref, *source_refs]:
+            if ref is not None and ref in repo.references:
+                repo.references.delete(ref)
+
+    if settings.optimise:
+        if profile:
+            with profile.stage("optimise-repo"):
+                profile.repo_optimisation = optimise_repo_after_import(
+                    repo, verbosity=verbosity
+                )
+        else:
+            optimise_repo_after_import(repo, verbosity=verbosity)
+
+
+def _objects_size(repo):
+    """Returns the total size in bytes of the repository's object database - packs, pack indexes and loose objects."""
+    objects_dir = repo.gitdir_path / "objects"
+    return sum(
+        os.path.getsize(os.path.join(dirpath, filename))
+        for dirpath, dirnames, filenames in os.walk(objects_dir)
+        for filename in filenames
+    )
+
+
+def _format_size(num_bytes):
+    if num_bytes < 1024:
+        return f"{num_bytes} B"
+    for unit in ("KiB", "MiB", "GiB"):
+        num_bytes /= 1024
+        if num_bytes < 1024:
+            break
+    return f"{num_bytes:.1f} {unit}"
+
+
+def optimise_repo_after_import(repo, *, verbosity=1):
+    """
+    git-fast-import writes its objects with little or no delta-compression (see FastImportSettings.max_delta_depth),
+    and leaves one or more packs per import - which makes the repository larger, and slower to clone, fetch and diff,
+    until it is next repacked. This repacks the whole repository into a single delta-compressed pack with a
+    reachability bitmap, and writes a multi-pack-index and commit-graph.
+
+    Returns a dict describing the size of the object database before and after, and the time taken.
+    """
+    if verbosity >= 1:
+        click.echo("Optimising repository...")
+
+    quiet_args = ["--quiet"] if verbosity < 2 else []
+    progress_args = ["--no-progress"] if verbosity < 2 else []
+    size_before = _objects_size(repo)
+    t0 = time.monotonic()
+    repo.invoke_git("repack", "-a", "-d", "--write-bitmap-index", *quiet_args)
+    repo.invoke_git("multi-pack-index", "write", *progress_args)
+    repo.invoke_git("commit-graph", "write", "--reachable", *progress_args)
+    elapsed = time.monotonic() - t0
+    size_after = _objects_size(repo)
+
+    if verbosity >= 1:
+        click.echo(
+            f"Optimised repository in {elapsed:.1f}s: "
+            f"{_format_size(size_before)} -> {_format_size(size_after)}"
+        )
+    return {
+        "sizeBefore": size_before,
+        "sizeAfter": size_after,
+        "seconds": round(elapsed, 3),
+    }
+
+
+def _import_sources_concurrently(
+    repo,
+    sources,
+    source_refs,
+    cmd_args,
+    replace_existing,
+    from_commit,
+    limit,
+    verbosity,
+    settings,
+):
+    """
+    Imports each source into its own temporary commit at the matching ref from source_refs, with each import running
+    in a separate worker process using a separate git-fast-import process, and up to settings.max_concurrent_sources
+    imports running at once. Each temporary commit is based on from_commit, and only differs from it at source.dest_path.
+    Sources are pickled to send them to the worker processes - see TableImportSource.__getstate__.
+    """
+    profile = active_import_profile()
+    with ProcessPoolExecutor(max_workers=settings.max_concurrent_sources) as executor:
+        futures = [
+            executor.submit(
+                _import_source_in_worker,
+                str(repo.gitdir_path),
+                source,
+                source_ref,
+                cmd_args,
+                replace_existing,
+                from_commit.id.hex if from_commit else None,
+                limit,
+                verbosity,
+                settings,
+                bool(profile),
+            )
+            for source, source_ref in zip(sources, source_refs)
+        ]
+        for future in futures:
+            # Re-raises any error from the import.
+            source_profile = future.result()
+            if profile:
+                profile.merge(source_profile)
+
+
+def _import_source_in_worker(
+    repo_path,
+    source,
+    source_ref,
+    cmd_args,
+    replace_existing,
+    from_commit_id,
+    limit,
+    verbosity,
+    settings,
+    do_profile,
+):
+    """
+    Imports a single source to source_ref - see _import_sources_concurrently.
+    If do_profile is True, returns the ImportProfile of this source's import, otherwise None.
+    """
+    from .repo import KartRepo
+    from .tabular.import_profile import ImportProfile
+
+    repo = KartRepo(repo_path, validate=False)
+    from_commit = repo[from_commit_id] if from_commit_id else None
+    source_header = generate_header(repo, [source], None, source_ref, from_commit)
+
+    profile = ImportProfile() if do_profile else None
+    with profile.activate() if profile else nullcontext():
+        with git_fast_import(repo, *cmd_args) as proc:
+            proc.stdin.write(source_header.encode("utf8"))
+            _import_single_source(
+                repo,
+                source,
+                replace_existing,
+                from_commit,
+                proc,
+                None,
+                limit,
+                verbosity,
+                settings,
+            )
+    return profile
 
 
 def _import_single_source(
@@ -341,6 +756,10 @@ def _import_single_source(
     replace_ids,
     limit,
     verbosity,
+    settings,
+    *,
+    resume_state=None,
+    source_index=0,
 ):
     """
     repo - the Kart repo to import into.
@@ -354,8 +773,25 @@ def _import_single_source(
         0: no progress information is printed to stdout.
         1: basic status information
         2: full output of `git-fast-import --stats ...`
+    settings - FastImportSettings: Tuneable settings which affect performance.
+    resume_state - ResumableImportState if this is a resumable import, or None.
+    source_index - the index of this source among all sources being imported - used by resumable imports.
     """
+    resume_position = None
+    resume_count = 0
+    if resume_state and source_index == resume_state.source_index:
+        resume_position = resume_state.position
+        resume_count = resume_state.count
+        if limit is not None:
+            limit -= resume_count
+
+    dataset_class = dataset_class_for_version(repo.table_dataset_version)
+    dataset = dataset_class.new_dataset_for_writing(
+        source.dest_path, source.schema, repo
+    )
+
     replacing_dataset = None
+    skip_unchanged = False
     if replace_existing == ReplaceExisting.GIVEN:
         try:
             replacing_dataset = repo.datasets(refish=from_commit)[source.dest_path]
@@ -363,17 +799,20 @@ def _import_single_source(
             # no such dataset; no problem
             replacing_dataset = None
 
-        fast_import_clear_tree(
-            proc=proc,
-            replace_ids=replace_ids,
-            replacing_dataset=replacing_dataset,
-            source=source,
+        # Resumable imports can't skip unchanged features, since the features that were seen before the import was
+        # interrupted are needed to work out which features to delete.
+        skip_unchanged = resume_state is None and can_skip_unchanged_features(
+            source, dataset, replacing_dataset, replace_ids
         )
-
-    dataset_class = dataset_class_for_version(repo.table_dataset_version)
-    dataset = dataset_class.new_dataset_for_writing(
-        source.dest_path, source.schema, repo
-    )
+        if resume_position is None:
+            # (If resuming partway through this source, the tree was already cleared before the interruption.)
+            fast_import_clear_tree(
+                proc=proc,
+                replace_ids=replace_ids,
+                replacing_dataset=replacing_dataset,
+                source=source,
+                keep_features=skip_unchanged,
+            )
 
     with source:
         if limit:
@@ -403,10 +842,23 @@ def _import_single_source(
 
             id_iterator = _ids()
             src_iterator = source.get_features(id_iterator, ignore_missing=True)
+        elif resume_state is not None:
+            id_iterator = None
+            # The position of each feature read, so we know where each checkpoint gets to.
+            positions = collections.deque()
+            src_iterator = _record_positions(
+                source.resumable_features(resume_position), positions
+            )
+            if limit is not None:
+                src_iterator = itertools.islice(src_iterator, limit)
         else:
             id_iterator = None
             src_iterator = source.features()
 
+        profile = active_import_profile()
+        if profile:
+            src_iterator = profile.timed_iter("read", src_iterator)
+
         progress_every = None
         if verbosity >= 1:
             progress_every = max(100, 100_000 // (10 ** (verbosity - 1)))
@@ -414,6 +866,16 @@ def _import_single_source(
         feature_blobs_already_written = getattr(
             source, "feature_blobs_already_written", False
         )
+        if (
+            not feature_blobs_already_written
+            and replace_ids is None
+            and resume_state is None
+            and not skip_unchanged
+            and hasattr(source, "can_reuse_feature_blobs")
+        ):
+            # Sources such as another Kart repository may be able to supply existing blobs, rather than features.
+            feature_blobs_already_written = source.can_reuse_feature_blobs(dataset)
+
         if feature_blobs_already_written:
             # This is an optimisation for upgrading repos in-place from V2 -> V3,
             # which are so similar we don't even need to rewrite the blobs.
@@ -421,51 +883,158 @@ def _import_single_source(
                 dataset, id_iterator
             )
 
+        elif skip_unchanged:
+            if limit is not None:
+                # Don't read ahead of the limit - some sources (eg PK-generating ones) record every feature read.
+                src_iterator = itertools.islice(src_iterator, limit)
+            comparer = dataset.import_feature_comparer(
+                replacing_dataset, source.schema, skip_unchanged=True
+            )
+            feature_blob_iter = comparer.iter_feature_blobs(src_iterator)
+
         elif should_compare_imported_features_against_old_features(
             repo,
             source,
             replacing_dataset,
             from_commit,
         ):
+            if limit is not None:
+                src_iterator = itertools.islice(src_iterator, limit)
             feature_blob_iter = dataset.import_iter_feature_blobs(
                 repo,
                 src_iterator,
                 source,
                 replacing_dataset=replacing_dataset,
             )
+        elif settings.num_processes > 1:
+            if limit is not None:
+                src_iterator = itertools.islice(src_iterator, limit)
+            feature_blob_iter = _parallel_iter_feature_blobs(
+                dataset.import_feature_encoder(source.schema), src_iterator, settings
+            )
+        elif profile:
+            feature_blob_iter = _profiled_iter_feature_blobs(
+                dataset.import_feature_encoder(source.schema), src_iterator, profile
+            )
         else:
             feature_blob_iter = dataset.import_iter_feature_blobs(
                 repo, src_iterator, source
             )
 
+        if profile:
+            feature_blob_iter = profile.timed_iter("encode", feature_blob_iter)
+
         for i, (feature_path, blob_data) in enumerate(feature_blob_iter):
+            if profile:
+                profile.start("write")
+
             if feature_blobs_already_written:
                 copy_existing_blob_to_stream(proc.stdin, feature_path, blob_data)
+            elif blob_data is None:
+                # An unchanged feature, which is already in place - nothing to write.
+                pass
+            elif isinstance(blob_data, pygit2.Oid):
+                # An unchanged feature from the dataset we're replacing - reuse its blob.
+                copy_existing_blob_to_stream(proc.stdin, feature_path, blob_data.hex)
             else:
                 write_blob_to_stream(proc.stdin, feature_path, blob_data)
 
+            if profile:
+                profile.stop()
+                profile.record_feature(blob_data)
+
+            if resume_state is not None:
+                position = positions.popleft()
+                if (i + 1) % settings.checkpoint_interval == 0:
+                    resume_state.checkpoint(
+                        proc, source_index, position, resume_count + i + 1
+                    )
+
             if i and progress_every and i % progress_every == 0:
                 click.echo(f"  {i:,d} features... @{time.monotonic()-t1:.1f}s")
 
             if limit is not None and i == (limit - 1):
                 click.secho(f"  Stopping at {limit:,d} features", fg="yellow")
                 break
+
+        if skip_unchanged:
+            # Remove any existing features that weren't in the import.
+            for path in comparer.iter_deleted_paths():
+                proc.stdin.write(f"D {path}\n".encode("utf8"))
         t2 = time.monotonic()
         if verbosity >= 1:
             click.echo(f"Added {num_rows:,d} Features to index in {t2-t1:.1f}s")
             click.echo(f"Overall rate: {(num_rows/(t2-t1 or 1E-3)):.0f} features/s)")
 
         # Meta items - written second as certain importers generate extra metadata as they import features.
-        for x in write_blobs_to_stream(
-            proc.stdin, dataset.import_iter_meta_blobs(repo, source)
-        ):
+        meta_blob_iter = dataset.import_iter_meta_blobs(repo, source)
+        if profile:
+            meta_blob_iter = profile.record_blob_sizes(
+                "meta", profile.timed_iter("meta", meta_blob_iter)
+            )
+            profile.start("write-meta")
+        for x in write_blobs_to_stream(proc.stdin, meta_blob_iter):
             pass
+        if profile:
+            profile.stop()
 
     t3 = time.monotonic()
     if verbosity >= 1:
         click.echo(f"Closed in {(t3-t2):.0f}s")
 
 
+def _profiled_iter_feature_blobs(feature_encoder, features, profile):
+    """
+    Generator. Yields the same (path, data) tuples as dataset.import_iter_feature_blobs,
+    but times each step of the encoding - see ImportProfile.
+    """
+    for feature in features:
+        yield feature_encoder.encode_feature_profiled(feature, profile)
+
+
+def _record_positions(positioned_features, positions):
+    """Generator. Yields each feature from the given (position, feature) tuples, and appends its position to positions."""
+    for position, feature in positioned_features:
+        positions.append(position)
+        yield feature
+
+
+# The ImportFeatureEncoder used by the current worker process - see _parallel_iter_feature_blobs.
+_worker_feature_encoder = None
+
+
+def _init_encoding_worker(feature_encoder):
+    global _worker_feature_encoder
+    _worker_feature_encoder = feature_encoder
+
+
+def _encode_feature_chunk(features):
+    return _worker_feature_encoder.encode_features(features)
+
+
+def _parallel_iter_feature_blobs(feature_encoder, features, settings):
+    """
+    Generator. Yields the same (path, data) tuples as dataset.import_iter_feature_blobs, in the same order,
+    but the features are sent in chunks to a pool of worker processes to be encoded.
+    Reading features from the source and writing to git-fast-import still happens in this process.
+    """
+    num_processes = settings.num_processes
+    with ProcessPoolExecutor(
+        max_workers=num_processes,
+        initializer=_init_encoding_worker,
+        initargs=(feature_encoder,),
+    ) as executor:
+        # Keep every worker busy, but don't read the whole source into memory.
+        encoded_chunks = bounded_ordered_map(
+            executor,
+            _encode_feature_chunk,
+            chunk(features, settings.chunk_size),
+            max_pending=num_processes * 2,
+        )
+        for encoded_chunk in encoded_chunks:
+            yield from encoded_chunk
+
+
 def write_blob_to_stream(stream, blob_path, blob_data):
     stream.write(f"M 644 inline {blob_path}\ndata {len(blob_data)}\n".encode("utf8"))
     stream.write(blob_data)
@@ -482,6 +1051,10 @@ def copy_existing_blob_to_stream(stream, blob_path, blob_sha):
     stream.write(f"M 644 {blob_sha} {blob_path}\n".encode("utf8"))
 
 
+def copy_existing_tree_to_stream(stream, tree_path, tree_sha):
+    stream.write(f"M 040000 {tree_sha} {tree_path}\n".encode("utf8"))
+
+
 def generate_header(repo, sources, message, branch, from_commit):
     if message is None:
         message = generate_message(sources)
@@ -2,13 +2,18 @@ import os
 import subprocess
 
 import click
+import sqlalchemy as sa
 
 from .cli_util import tool_environment, KartCommand
 from .exceptions import NO_WORKING_COPY, NotFound
-from .geometry import normalise_gpkg_geom
+from .geometry import normalise_gpkg_geoms
 from .sqlalchemy.gpkg import Db_GPKG
+from .utils import chunk
 from kart.working_copy import WorkingCopyTreeMismatch
 
+# How many features are compared with the working copy at once.
+CHUNK_SIZE = 1000
+
 
 def _fsck_reset(repo, working_copy, dataset_paths):
     commit = repo.head_commit
@@ -163,41 +168,69 @@ def fsck(ctx, reset_datasets, fsck_args):
                 click.echo("Checking features...")
                 feature_err_count = 0
                 geom_col = dataset.geom_column_name
-                for feature, blob in dataset.features_plus_blobs():
-                    h_verify = os.path.basename(dataset.encode_1pk_to_path(feature[pk]))
-                    if blob.name != h_verify:
-                        has_err = True
-                        click.secho(
-                            f"✘ Hash mismatch for feature '{feature[pk]}': repo says {blob.name} but should be {h_verify}",
-                            fg="red",
+                pk_column = table_wc.quote(pk)
+                stmt = sa.text(
+                    f"SELECT * FROM {table_wc.table_identifier(dataset)} WHERE {pk_column} IN :pks;"
+                ).bindparams(sa.bindparam("pks", expanding=True))
+
+                # Working-copy rows are read and normalised in batches, rather than one query per feature.
+                for batch in chunk(dataset.features_plus_blobs(), CHUNK_SIZE):
+                    rows = sess.execute(
+                        stmt, {"pks": [feature[pk] for feature, blob in batch]}
+                    )
+                    db_objs = {}
+                    for row in rows:
+                        db_obj = dict(row)
+                        db_objs[db_obj[pk]] = db_obj
+                    if geom_col is not None:
+                        geoms = normalise_gpkg_geoms(
+                            db_obj[geom_col] for db_obj in db_objs.values()
                         )
+                        for db_obj, geom in zip(db_objs.values(), geoms):
+                            db_obj[geom_col] = geom
 
-                    f = sess.execute(
-                        f"SELECT * FROM {table_wc.table_identifier(dataset)} WHERE {table_wc.quote(pk)}=:pk;",
-                        {"pk": feature[pk]},
-                    )
-                    db_obj = dict(f.fetchone())
-                    if db_obj is not None and geom_col is not None:
-                        db_obj[geom_col] = normalise_gpkg_geom(db_obj[geom_col])
-                    if db_obj != feature:
-                        s_old = set(feature.items())
-                        s_new = set(db_obj.items())
-                        diff_add = dict(s_new - s_old)
-                        diff_del = dict(s_old - s_new)
-                        all_keys = sorted(set(diff_del.keys()) | set(diff_add.keys()))
-
-                        has_err = True
-                        click.secho(
-                            f"✘ Mismatch between repository and working-copy for feature {pk}={feature[pk]}: fields: {', '.join(all_keys)}",
-                            fg="red",
+                    for feature, blob in batch:
+                        h_verify = os.path.basename(
+                            dataset.encode_1pk_to_path(feature[pk])
                         )
+                        if blob.name != h_verify:
+                            has_err = True
+                            click.secho(
+                                f"✘ Hash mismatch for feature '{feature[pk]}': repo says {blob.name} but should be {h_verify}",
+                                fg="red",
+                            )
 
-                        feature_err_count += 1
-                        if feature_err_count == 100:
+                        db_obj = db_objs.get(feature[pk])
+                        if db_obj is None:
+                            has_err = True
                             click.secho(
-                                "! More than 100 errors, stopping for now.", fg="yellow"
+                                f"✘ Feature {pk}={feature[pk]} is missing from the working-copy",
+                                fg="red",
                             )
+                            feature_err_count += 1
+                        elif db_obj != feature:
+                            s_old = set(feature.items())
+                            s_new = set(db_obj.items())
+                            diff_add = dict(s_new - s_old)
+                            diff_del = dict(s_old - s_new)
+                            all_keys = sorted(
+                                set(diff_del.keys()) | set(diff_add.keys())
+                            )
+
+                            has_err = True
+                            click.secho(
+                                f"✘ Mismatch between repository and working-copy for feature {pk}={feature[pk]}: fields: {', '.join(all_keys)}",
+                                fg="red",
+                            )
+                            feature_err_count += 1
+
+                        if feature_err_count >= 100:
                             break
+                    if feature_err_count >= 100:
+                        click.secho(
+                            "! More than 100 errors, stopping for now.", fg="yellow"
+                        )
+                        break
 
         if has_err:
             raise click.Abort()
@@ -1,4 +1,5 @@
 import binascii
+import itertools
 import json
 import math
 import re
@@ -7,6 +8,11 @@ from enum import IntEnum
 
 from osgeo import ogr, osr
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from .cli_util import StringFromFile
 from .exceptions import GeometryError
 
@@ -106,6 +112,10 @@ class Geometry(bytes):
     """
     Contains a geometry in Kart's chosen format - StandardGeoPackageBinary.
     See "Geometry encoding" section in DATASETS_v2.md for more information.
+
+    Geometry is a bytes subclass, so that it can be passed straight to anything that accepts bytes - such as a GPKG
+    working copy - but the header, flags and envelope are only parsed when needed, and the conversions to WKB / EWKB
+    work on a memoryview of the WKB rather than copying it first, so that the geometry is only copied once.
     """
 
     @classmethod
@@ -150,7 +160,19 @@ class Geometry(bytes):
 
     def with_crs_id(self, crs_id):
         crs_id_bytes = struct.pack("<i", crs_id)
-        return Geometry.of(self[:4] + crs_id_bytes + self[8:])
+        if self[4:8] == crs_id_bytes:
+            return self
+        view = memoryview(self)
+        return Geometry(b"".join((view[:4], crs_id_bytes, view[8:])))
+
+    @property
+    def wkb_offset(self):
+        """The offset of the WKB within this geometry - that is, the size of the header and envelope."""
+        return 8 + gpkg_envelope_size(self.flags)
+
+    def wkb_view(self):
+        """Returns a memoryview of the WKB within this geometry, without copying it. The WKB may be big-endian."""
+        return memoryview(self)[self.wkb_offset :]
 
     @property
     def flags(self):
@@ -201,7 +223,7 @@ class Geometry(bytes):
         Returns the envelope as a tuple of 4, 6, or 8 values, or None if no envelope is stored.
         The tuple ordering is (min-x, max-x, min-y, max-y, min-z?, max-z?, min-m?, max-m?) - ? values may be missing.
         If only_2d is True, then only (min-x, max-x, min-y, max-y) is returned, even if more values are present.
-        if calculate_if_missing is True then the entire geometry is loaded into OGR in order to calculate the envelope.
+        If calculate_if_missing is True then the envelope is calculated from the WKB if none is stored - see wkb_envelope.
         """
         return geom_envelope(
             self, only_2d=only_2d, calculate_if_missing=calculate_if_missing
@@ -287,21 +309,69 @@ def _desired_gpkg_envelope_type(flags, wkb_buffer, wkb_offset=0):
     wkb_is_le, geom_type = _wkb_endianness_and_geometry_type(
         wkb_buffer, wkb_offset=wkb_offset
     )
-    flat_geom_type = ogr.GT_Flatten(geom_type)
-    if flat_geom_type == ogr.wkbPoint:
+    flat_geom_type, has_z, has_m = _wkb_type_and_dimensions(geom_type)
+    if flat_geom_type == 1:
         # is this a point? if so, we don't *want* an envelope
         # it makes them significantly bigger (29 --> 61 bytes)
         # and is unnecessary - any optimisation that can use a bbox
         # can just trivially parse the point itself
         return GPKG_ENVELOPE_NONE
     else:
-        has_z = ogr.GT_HasZ(geom_type)
         if has_z:
             return GPKG_ENVELOPE_XYZ
         else:
             return GPKG_ENVELOPE_XY
 
 
+# The flags of every normalised GPKG geometry, mapped to the offset of its WKB, and to what the WKB must then contain -
+# None for empty geometries, or else (is_point, has_z).
+_NORMALISED_GPKG_FLAGS = {
+    _GPKG_LE_BIT | _GPKG_EMPTY_BIT: (8, None),
+    _GPKG_LE_BIT: (8, (True, None)),
+    _GPKG_LE_BIT | (GPKG_ENVELOPE_XY << 1): (40, (False, False)),
+    _GPKG_LE_BIT | (GPKG_ENVELOPE_XYZ << 1): (56, (False, True)),
+}
+
+
+def is_normalised_gpkg_geom(gpkg_geom):
+    """
+    Returns True if the given gpkg geometry is already in the form that normalise_gpkg_geom returns, in which case
+    normalise_gpkg_geom would return it unmodified. Only the header and the first bytes of the WKB are read.
+    """
+    if gpkg_geom[:3] != b"GP\x00" or gpkg_geom[4:8] != b"\x00\x00\x00\x00":
+        return False
+    wkb_offset, want = _NORMALISED_GPKG_FLAGS.get(gpkg_geom[3], (None, False))
+    if wkb_offset is None or len(gpkg_geom) < wkb_offset + 5:
+        return False
+    if gpkg_geom[wkb_offset] != 1:
+        return False
+    if want is None:
+        return True
+    want_point, want_z = want
+    geom_type, has_z, has_m = _wkb_type_and_dimensions(
+        struct.unpack_from("<I", gpkg_geom, wkb_offset + 1)[0]
+    )
+    if want_point:
+        return geom_type == 1
+    return geom_type != 1 and has_z == want_z
+
+
+def normalise_gpkg_geoms(gpkg_geoms):
+    """
+    Given an iterable of gpkg geometries (or Nones), returns a list of them normalised - see normalise_gpkg_geom.
+    Only the header of each geometry is checked, unless it needs to be rewritten.
+    """
+    result = []
+    for gpkg_geom in gpkg_geoms:
+        if gpkg_geom is None:
+            result.append(None)
+        elif isinstance(gpkg_geom, Geometry) and is_normalised_gpkg_geom(gpkg_geom):
+            result.append(gpkg_geom)
+        else:
+            result.append(normalise_gpkg_geom(gpkg_geom))
+    return result
+
+
 def normalise_gpkg_geom(gpkg_geom):
     """
     Checks to see if the given gpkg geometry:
@@ -314,6 +384,9 @@ def normalise_gpkg_geom(gpkg_geom):
     """
     if gpkg_geom is None:
         return None
+    if is_normalised_gpkg_geom(gpkg_geom):
+        return Geometry.of(gpkg_geom)
+
     flags = _validate_gpkg_geom(gpkg_geom)
     want_envelope_type = None
 
@@ -338,9 +411,14 @@ def normalise_gpkg_geom(gpkg_geom):
             if gpkg_geom[4:8] == b"\x00\x00\x00\x00":
                 return Geometry.of(gpkg_geom)
             else:
-                return Geometry.of(gpkg_geom[:4] + b"\x00\x00\x00\x00" + gpkg_geom[8:])
+                view = memoryview(gpkg_geom)
+                return Geometry(b"".join((view[:4], b"\x00\x00\x00\x00", view[8:])))
 
-    # roundtrip it, the envelope and LE-ness are done by ogr_to_gpkg_geom
+    # Rewrite it - the envelope and LE-ness are done by _wkb_to_gpkg_geom_without_ogr, or by ogr_to_gpkg_geom.
+    wkb_offset = 8 + gpkg_envelope_size(flags)
+    result = _wkb_to_gpkg_geom_without_ogr(memoryview(gpkg_geom)[wkb_offset:])
+    if result is not None:
+        return result
     return ogr_to_gpkg_geom(
         gpkg_geom_to_ogr(gpkg_geom),
         _add_envelope_type=want_envelope_type,
@@ -356,15 +434,29 @@ def gpkg_geom_to_wkb(gpkg_geom):
     """
     if gpkg_geom is None:
         return None
+    wkb = _gpkg_geom_to_wkb_view(gpkg_geom)
+    return wkb if isinstance(wkb, bytes) else bytes(wkb)
+
+
+def _gpkg_geom_to_wkb_view(gpkg_geom):
+    """
+    Returns the little-endian ISO WKB for the given geometry - as a memoryview into the geometry if it is already
+    little-endian, which avoids a copy, or as bytes if it had to be converted.
+    """
     flags = _validate_gpkg_geom(gpkg_geom)
 
     wkb_offset = 8 + gpkg_envelope_size(flags)
-    wkb = gpkg_geom[wkb_offset:]
+    wkb = memoryview(gpkg_geom)[wkb_offset:]
 
     if wkb[0] == 0:
         # Force little-endian
-        geom = ogr.CreateGeometryFromWkb(wkb)
-        wkb = geom.ExportToIsoWkb(ogr.wkbNDR)
+        le_wkb = bytearray()
+        try:
+            _append_as_le_iso_wkb(wkb, 0, le_wkb)
+            wkb = bytes(le_wkb)
+        except _UnsupportedWkbType:
+            geom = ogr.CreateGeometryFromWkb(bytes(wkb))
+            wkb = geom.ExportToIsoWkb(ogr.wkbNDR)
     return wkb
 
 
@@ -372,11 +464,9 @@ def gpkg_geom_to_hex_wkb(gpkg_geom):
     """
     Returns the hex-encoded little-endian WKB for the given geometry.
     """
-    wkb = gpkg_geom_to_wkb(gpkg_geom)
-    if wkb is None:
+    if gpkg_geom is None:
         return None
-    else:
-        return binascii.hexlify(wkb).decode("ascii").upper()
+    return _gpkg_geom_to_wkb_view(gpkg_geom).hex().upper()
 
 
 def parse_gpkg_geom(gpkg_geom):
@@ -436,10 +526,130 @@ def wkb_to_gpkg_geom(wkb, **kwargs):
     if wkb is None:
         return None
 
-    ogr_geom = ogr.CreateGeometryFromWkb(wkb)
+    if not kwargs:
+        gpkg_geom = _wkb_to_gpkg_geom_without_ogr(wkb)
+        if gpkg_geom is not None:
+            return gpkg_geom
+
+    ogr_geom = ogr.CreateGeometryFromWkb(bytes(wkb))
     return ogr_to_gpkg_geom(ogr_geom, **kwargs)
 
 
+def wkbs_to_gpkg_geoms(wkbs):
+    """
+    Given an iterable of well-known-binary bytestrings (or Nones), returns a list of GPKG Geometry objects -
+    the same as calling wkb_to_gpkg_geom on each one.
+    """
+    return [wkb_to_gpkg_geom(wkb) for wkb in wkbs]
+
+
+# GPKG headers for little-endian geometries with srs_id=0, as made by ogr_to_gpkg_geom.
+_GPKG_HEADER = struct.pack("<ccBBi", b"G", b"P", 0, _GPKG_LE_BIT, 0)
+_GPKG_EMPTY_HEADER = struct.pack(
+    "<ccBBi", b"G", b"P", 0, _GPKG_LE_BIT | _GPKG_EMPTY_BIT, 0
+)
+_GPKG_XY_ENVELOPE_HEADER = struct.pack(
+    "<ccBBi", b"G", b"P", 0, _GPKG_LE_BIT | (GPKG_ENVELOPE_XY << 1), 0
+)
+_GPKG_XYZ_ENVELOPE_HEADER = struct.pack(
+    "<ccBBi", b"G", b"P", 0, _GPKG_LE_BIT | (GPKG_ENVELOPE_XYZ << 1), 0
+)
+
+
+def _wkb_to_gpkg_geom_without_ogr(wkb):
+    """
+    Returns the same GPKG geometry as ogr_to_gpkg_geom(ogr.CreateGeometryFromWkb(wkb)), but without creating an OGR
+    geometry. The WKB can be ISO WKB, extended WKB or EWKB (any SRID is dropped), in either byte order.
+    Returns None if the geometry can't be converted this way - eg, it is curved, or the WKB is malformed - in which case
+    the caller should use OGR, which also reports any error.
+    """
+    try:
+        try:
+            runs = []
+            end = _find_wkb_coordinate_runs(wkb, 0, runs)
+        except _UnsupportedWkbType:
+            # Not little-endian ISO WKB - convert it, and try again.
+            iso_wkb = bytearray()
+            if _append_as_le_iso_wkb(wkb, 0, iso_wkb) != len(wkb):
+                return None
+            wkb = bytes(iso_wkb)
+            runs = []
+            end = _find_wkb_coordinate_runs(wkb, 0, runs)
+    except (_UnsupportedWkbType, struct.error, IndexError):
+        return None
+    if end != len(wkb):
+        return None
+
+    if not runs:
+        return Geometry(_GPKG_EMPTY_HEADER + wkb)
+
+    geom_type, has_z, has_m = _wkb_type_and_dimensions(
+        struct.unpack_from("<I", wkb, 1)[0]
+    )
+    if geom_type == 1:
+        # Points never get envelopes.
+        return Geometry(_GPKG_HEADER + wkb)
+
+    bounds = [math.inf, -math.inf] * 4
+    for pos, num_points, num_dims, run_has_z in runs:
+        axes = (0, 1) + (2,) * run_has_z + (3,) * (num_dims - 2 - run_has_z)
+        _add_coordinates_to_bounds(wkb, pos, num_points, "<", axes, bounds)
+
+    num_values = 6 if has_z else 4
+    envelope = bounds[:num_values]
+    if not all(math.isfinite(v) for v in envelope):
+        return None
+    header = _GPKG_XYZ_ENVELOPE_HEADER if has_z else _GPKG_XY_ENVELOPE_HEADER
+    return Geometry(header + struct.pack(f"<{num_values}d", *envelope) + wkb)
+
+
+def _append_as_le_iso_wkb(buf, pos, out):
+    """
+    Appends the WKB geometry at the given position in buf to the bytearray out, as little-endian ISO WKB.
+    The geometry can be ISO WKB, extended WKB or EWKB (any SRID is dropped), in either byte order.
+    Returns the position just after the geometry.
+    """
+    bo = "<" if buf[pos] else ">"
+    (wkb_type,) = struct.unpack_from(f"{bo}I", buf, pos + 1)
+    geom_type, has_z, has_m = _wkb_type_and_dimensions(wkb_type)
+    pos += 5
+    if wkb_type & 0x20000000:
+        # EWKB SRID.
+        pos += 4
+    out += struct.pack("<BI", 1, geom_type + 1000 * has_z + 2000 * has_m)
+    num_dims = 2 + has_z + has_m
+
+    if geom_type == 1:
+        return _append_as_le_doubles(buf, pos, num_dims, bo, out)
+
+    (count,) = struct.unpack_from(f"{bo}I", buf, pos)
+    out += struct.pack("<I", count)
+    pos += 4
+    if geom_type in _WKB_LINESTRING_TYPES:
+        return _append_as_le_doubles(buf, pos, count * num_dims, bo, out)
+    elif geom_type in _WKB_POLYGON_TYPES:
+        for i in range(count):
+            (num_points,) = struct.unpack_from(f"{bo}I", buf, pos)
+            out += struct.pack("<I", num_points)
+            pos = _append_as_le_doubles(buf, pos + 4, num_points * num_dims, bo, out)
+        return pos
+    elif geom_type in _WKB_COLLECTION_TYPES:
+        for i in range(count):
+            pos = _append_as_le_iso_wkb(buf, pos, out)
+        return pos
+
+    raise _UnsupportedWkbType(geom_type)
+
+
+def _append_as_le_doubles(buf, pos, count, bo, out):
+    end = pos + 8 * count
+    if bo == "<":
+        out += buf[pos:end]
+    else:
+        out += struct.pack(f"<{count}d", *struct.unpack_from(f">{count}d", buf, pos))
+    return end
+
+
 def hex_wkb_to_gpkg_geom(hex_wkb, **kwargs):
     """Given a hex-encoded well-known-binary bytestring, returns a GPKG Geometry object."""
     if hex_wkb is None:
@@ -568,14 +778,12 @@ def gpkg_geom_to_ewkb(gpkg_geom):
     ewkb_geom_type |= 0x40000000 * has_m
     ewkb_geom_type |= 0x20000000 * (crs_id > 0)
 
-    ewkb = struct.pack(f"{bo}BI", int(wkb_is_le), ewkb_geom_type)
-
     if crs_id > 0:
-        ewkb += struct.pack(f"{bo}I", crs_id)
-
-    ewkb += gpkg_geom[(wkb_offset + 5) :]
+        ewkb_header = struct.pack(f"{bo}BII", int(wkb_is_le), ewkb_geom_type, crs_id)
+    else:
+        ewkb_header = struct.pack(f"{bo}BI", int(wkb_is_le), ewkb_geom_type)
 
-    return ewkb
+    return b"".join((ewkb_header, memoryview(gpkg_geom)[(wkb_offset + 5) :]))
 
 
 def hex_ewkb_to_gpkg_geom(hex_ewkb):
@@ -586,7 +794,21 @@ def hex_ewkb_to_gpkg_geom(hex_ewkb):
     if hex_ewkb is None:
         return None
 
-    ewkb = bytes.fromhex(hex_ewkb)
+    return ewkb_to_gpkg_geom(bytes.fromhex(hex_ewkb))
+
+
+def ewkb_to_gpkg_geom(ewkb):
+    """
+    Parse PostGIS EWKB to GeoPackage geometry
+    https://github.com/postgis/postgis/blob/master/doc/ZMSgeoms.txt
+    """
+    if ewkb is None:
+        return None
+
+    gpkg_geom = _wkb_to_gpkg_geom_without_ogr(ewkb)
+    if gpkg_geom is not None:
+        return gpkg_geom
+
     is_le = struct.unpack_from("B", ewkb)[0]
     bo = _bo(is_le)
 
@@ -645,14 +867,12 @@ def geom_envelope(gpkg_geom, only_2d=False, calculate_if_missing=False):
     This is a shortcut to avoid instantiating a full OGR geometry if possible.
 
     Returns a 4-tuple (minx, maxx, miny, maxy), or None if the geometry is empty.
+    If only_2d is False, the tuple also contains the Z and M ranges that are stored in the envelope, if any.
+    If calculate_if_missing is True and no envelope is stored (as is always the case for points), the envelope is
+    calculated from the WKB - see wkb_envelope.
 
     http://www.geopackage.org/spec/#gpb_format
     """
-    if calculate_if_missing and not only_2d:
-        raise NotImplementedError(
-            "calculate_if_missing is only supported for 2D envelopes - set only_2d to True also"
-        )
-
     if gpkg_geom is None:
         return None
 
@@ -683,12 +903,7 @@ def geom_envelope(gpkg_geom, only_2d=False, calculate_if_missing=False):
     if envelope_format == "":
         if not calculate_if_missing:
             return None
-        ogr_geom = gpkg_geom_to_ogr(gpkg_geom)
-        if ogr_geom.IsEmpty():
-            # envelope is apparently (0, 0, 0, 0), thanks OGR :/
-            return None
-        else:
-            return ogr_geom.GetEnvelope()
+        return wkb_envelope(gpkg_geom, wkb_offset=8, only_2d=only_2d)
 
     if only_2d:
         # First 4 doubles are always the 2D ones.
@@ -704,6 +919,248 @@ def geom_envelope(gpkg_geom, only_2d=False, calculate_if_missing=False):
         return envelope
 
 
+class _UnsupportedWkbType(ValueError):
+    pass
+
+
+# Geometry types which wkb_envelope can handle, other than points.
+_WKB_LINESTRING_TYPES = frozenset((2,))  # LineString
+_WKB_POLYGON_TYPES = frozenset((3, 17))  # Polygon, Triangle
+# Multi*, GeometryCollection, PolyhedralSurface, TIN:
+_WKB_COLLECTION_TYPES = frozenset((4, 5, 6, 7, 15, 16))
+
+# Where numpy is available, it is used for coordinate sequences at least this long.
+_NUMPY_MIN_POINTS = 32
+
+
+def wkb_envelope(wkb, wkb_offset=0, only_2d=False):
+    """
+    Calculates the envelope of the WKB geometry at the given offset in the given buffer, straight from the WKB - which
+    is much quicker than loading it into OGR. Returns None if the geometry is empty.
+
+    Like a GPKG envelope, the result is (min-x, max-x, min-y, max-y), followed by (min-z, max-z) if the geometry has Z
+    values, and then by (min-m, max-m) if the geometry has M values - unless only_2d is True. ISO WKB and the
+    Z and M flags of extended WKB are both understood. Curved geometries are handed to OGR, since the envelope of an
+    arc isn't the envelope of its control points.
+    """
+    bounds = [math.inf, -math.inf] * 4  # min-x, max-x, min-y, max-y, min-z, ...
+    try:
+        _add_wkb_to_bounds(wkb, wkb_offset, bounds)
+    except _UnsupportedWkbType:
+        return _ogr_wkb_envelope(wkb, wkb_offset, only_2d)
+
+    if bounds[0] == math.inf:
+        return None
+    has_z = bounds[4] != math.inf
+    has_m = bounds[6] != math.inf
+    if only_2d or not (has_z or has_m):
+        return tuple(bounds[:4])
+    return tuple(bounds[:4] + bounds[4:6] * has_z + bounds[6:8] * has_m)
+
+
+def _ogr_wkb_envelope(wkb, wkb_offset, only_2d):
+    ogr_geom = ogr.CreateGeometryFromWkb(bytes(memoryview(wkb)[wkb_offset:]))
+    if ogr_geom.IsEmpty():
+        # envelope is apparently (0, 0, 0, 0), thanks OGR :/
+        return None
+    if ogr_geom.Is3D() and not only_2d:
+        return ogr_geom.GetEnvelope3D()
+    return ogr_geom.GetEnvelope()
+
+
+def _wkb_type_and_dimensions(wkb_type):
+    """Given an ISO or extended WKB geometry type, returns (flat geometry type, has_z, has_m)."""
+    has_z = bool(wkb_type & 0x80000000)
+    has_m = bool(wkb_type & 0x40000000)
+    iso_type = wkb_type & 0xFFFF
+    iso_zm = iso_type // 1000
+    return iso_type % 1000, has_z or iso_zm in (1, 3), has_m or iso_zm in (2, 3)
+
+
+def _add_wkb_to_bounds(buf, pos, bounds):
+    """
+    Expands bounds to include every coordinate of the WKB geometry at the given position in buf.
+    Returns the position just after the geometry.
+    """
+    bo = "<" if buf[pos] else ">"
+    (wkb_type,) = struct.unpack_from(f"{bo}I", buf, pos + 1)
+    geom_type, has_z, has_m = _wkb_type_and_dimensions(wkb_type)
+    pos += 5
+    # Which of x, y, z, m each coordinate value is.
+    axes = (0, 1) + (2,) * has_z + (3,) * has_m
+
+    if geom_type == 1:
+        values = struct.unpack_from(f"{bo}{len(axes)}d", buf, pos)
+        # POINT EMPTY is stored as POINT(NaN NaN).
+        if not (math.isnan(values[0]) and math.isnan(values[1])):
+            _add_values_to_bounds(values, axes, bounds)
+        return pos + 8 * len(axes)
+
+    (count,) = struct.unpack_from(f"{bo}I", buf, pos)
+    pos += 4
+    if geom_type in _WKB_LINESTRING_TYPES:
+        return _add_coordinates_to_bounds(buf, pos, count, bo, axes, bounds)
+    elif geom_type in _WKB_POLYGON_TYPES:
+        for i in range(count):
+            (num_points,) = struct.unpack_from(f"{bo}I", buf, pos)
+            pos = _add_coordinates_to_bounds(buf, pos + 4, num_points, bo, axes, bounds)
+        return pos
+    elif geom_type in _WKB_COLLECTION_TYPES:
+        for i in range(count):
+            pos = _add_wkb_to_bounds(buf, pos, bounds)
+        return pos
+
+    raise _UnsupportedWkbType(geom_type)
+
+
+def _add_coordinates_to_bounds(buf, pos, num_points, bo, axes, bounds):
+    """Expands bounds to include the given number of coordinates found at pos. Returns the position after them."""
+    num_dims = len(axes)
+    num_values = num_points * num_dims
+    if num_points == 0:
+        return pos
+    if numpy is not None and num_points >= _NUMPY_MIN_POINTS:
+        coords = numpy.frombuffer(
+            buf, dtype=f"{bo}f8", count=num_values, offset=pos
+        ).reshape(num_points, num_dims)
+        _add_ranges_to_bounds(
+            coords.min(axis=0).tolist(), coords.max(axis=0).tolist(), axes, bounds
+        )
+    else:
+        values = struct.unpack_from(f"{bo}{num_values}d", buf, pos)
+        if num_points == 1:
+            _add_values_to_bounds(values, axes, bounds)
+        else:
+            columns = [values[i::num_dims] for i in range(num_dims)]
+            _add_ranges_to_bounds(
+                [min(c) for c in columns], [max(c) for c in columns], axes, bounds
+            )
+    return pos + 8 * num_values
+
+
+def _add_values_to_bounds(values, axes, bounds):
+    _add_ranges_to_bounds(values, values, axes, bounds)
+
+
+def _add_ranges_to_bounds(mins, maxs, axes, bounds):
+    for axis, lo, hi in zip(axes, mins, maxs):
+        if lo < bounds[2 * axis]:
+            bounds[2 * axis] = lo
+        if hi > bounds[2 * axis + 1]:
+            bounds[2 * axis + 1] = hi
+
+
+def transform_gpkg_geoms(gpkg_geoms, transform):
+    """
+    Reprojects many GPKG geometries using the given osr.CoordinateTransformation. The coordinates of all the geometries
+    are transformed with a single call to transform.TransformPoints, and written back into a copy of each WKB - which is
+    much quicker than creating an OGR geometry and calling Transform for every geometry.
+
+    Returns a list with one item for each of the given geometries. The reprojected geometries have no envelope, so are
+    only suitable for output. Where a geometry can't be reprojected this way - it is curved, it isn't little-endian
+    ISO WKB, or some of its points couldn't be transformed - the item is None instead, and the caller should reproject
+    that geometry using OGR, which also reports any error. Geometries that are None are returned as None.
+    """
+    gpkg_geoms = list(gpkg_geoms)
+    all_runs = []
+    points = []
+    for gpkg_geom in gpkg_geoms:
+        runs = None
+        if gpkg_geom is not None:
+            runs = []
+            try:
+                _find_wkb_coordinate_runs(
+                    gpkg_geom, 8 + gpkg_envelope_size(gpkg_geom[3]), runs
+                )
+            except _UnsupportedWkbType:
+                runs = None
+            else:
+                for pos, num_points, num_dims, has_z in runs:
+                    values = struct.unpack_from(
+                        f"<{num_points * num_dims}d", gpkg_geom, pos
+                    )
+                    z_values = (
+                        values[2::num_dims] if has_z else itertools.repeat(0.0)
+                    )
+                    points.extend(
+                        zip(values[0::num_dims], values[1::num_dims], z_values)
+                    )
+        all_runs.append(runs)
+
+    try:
+        transformed = transform.TransformPoints(points) if points else []
+    except RuntimeError:
+        # Some points couldn't be transformed - leave it to OGR to report which geometry.
+        return [None] * len(gpkg_geoms)
+
+    result = []
+    i = 0
+    for gpkg_geom, runs in zip(gpkg_geoms, all_runs):
+        if runs is None:
+            result.append(None)
+            continue
+        wkb_offset = 8 + gpkg_envelope_size(gpkg_geom[3])
+        flags = _GPKG_LE_BIT | (gpkg_geom[3] & _GPKG_EMPTY_BIT)
+        buf = bytearray(struct.pack("<ccBBi", b"G", b"P", 0, flags, 0))
+        buf += memoryview(gpkg_geom)[wkb_offset:]
+        shift = 8 - wkb_offset
+        ok = True
+        for pos, num_points, num_dims, has_z in runs:
+            pos += shift
+            for x, y, z in transformed[i : i + num_points]:
+                if not (math.isfinite(x) and math.isfinite(y)):
+                    ok = False
+                if has_z:
+                    struct.pack_into("<ddd", buf, pos, x, y, z)
+                else:
+                    struct.pack_into("<dd", buf, pos, x, y)
+                pos += 8 * num_dims
+            i += num_points
+        result.append(Geometry(buf) if ok else None)
+    return result
+
+
+def _find_wkb_coordinate_runs(buf, pos, runs):
+    """
+    Appends (position, number of points, values per point, has_z) to runs for every sequence of coordinates in the
+    little-endian ISO WKB geometry at the given position in buf. Returns the position just after the geometry.
+    """
+    byte_order, wkb_type = struct.unpack_from("<BI", buf, pos)
+    if byte_order != 1 or wkb_type > 0xFFFF:
+        raise _UnsupportedWkbType(wkb_type)
+    geom_type, has_z, has_m = _wkb_type_and_dimensions(wkb_type)
+    num_dims = 2 + has_z + has_m
+    pos += 5
+
+    if geom_type == 1:
+        x, y = struct.unpack_from("<dd", buf, pos)
+        # POINT EMPTY is stored as POINT(NaN NaN).
+        if not (math.isnan(x) and math.isnan(y)):
+            runs.append((pos, 1, num_dims, has_z))
+        return pos + 8 * num_dims
+
+    (count,) = struct.unpack_from("<I", buf, pos)
+    pos += 4
+    if geom_type in _WKB_LINESTRING_TYPES:
+        if count:
+            runs.append((pos, count, num_dims, has_z))
+        return pos + 8 * num_dims * count
+    elif geom_type in _WKB_POLYGON_TYPES:
+        for i in range(count):
+            (num_points,) = struct.unpack_from("<I", buf, pos)
+            pos += 4
+            if num_points:
+                runs.append((pos, num_points, num_dims, has_z))
+            pos += 8 * num_dims * num_points
+        return pos
+    elif geom_type in _WKB_COLLECTION_TYPES:
+        for i in range(count):
+            pos = _find_wkb_coordinate_runs(buf, pos, runs)
+        return pos
+
+    raise _UnsupportedWkbType(geom_type)
+
+
 def ring_as_wkt(*points):
     return "(" + ",".join(f"{x} {y}" for x, y in points) + ")"
 
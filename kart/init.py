@@ -1,11 +1,10 @@
 import os
-import warnings
 from pathlib import Path
 
 import click
 
 
-from .cli_util import StringFromFile, RemovalInKart013Warning, KartCommand
+from .cli_util import StringFromFile, KartCommand
 from .core import check_git_user
 from .dataset_util import validate_dataset_paths
 from .exceptions import InvalidOperation
@@ -73,9 +72,10 @@ from .working_copy import PartType
 )
 @click.option(
     "--num-processes",
-    help="Deprecated (no longer used)",
-    default=None,
     hidden=True,
+    type=click.INT,
+    default=None,
+    help="Number of worker processes to use when encoding features (advanced users only)",
 )
 @click.option(
     "--spatial-filter",
@@ -100,12 +100,6 @@ def init(
     Initialise a new repository and optionally import data.
     DIRECTORY must be empty. Defaults to the current directory.
     """
-    if num_processes is not None:
-        warnings.warn(
-            "--num-processes is deprecated and will be removed in Kart 0.13.",
-            RemovalInKart013Warning,
-        )
-
     if directory is None:
         directory = os.curdir
     repo_path = Path(directory).resolve()
@@ -146,7 +140,9 @@ def init(
         fast_import_tables(
             repo,
             sources,
-            settings=FastImportSettings(max_delta_depth=max_delta_depth),
+            settings=FastImportSettings(
+                max_delta_depth=max_delta_depth, num_processes=num_processes
+            ),
             from_commit=None,
             message=message,
         )
@@ -112,18 +112,22 @@ class JsonDiffWriter(BaseDiffWriter):
         if "feature" not in ds_diff:
             return
 
-        old_transform, new_transform = self.get_geometry_transforms(ds_path, ds_diff)
-        for key, delta in self.filtered_ds_feature_deltas(ds_path, ds_diff):
+        need_old = None
+        if self.patch_type == "minimal":
+            # Minimal patches only include the old version of deleted features.
+            need_old = lambda delta: not delta.new
+
+        for key, delta, old_value, new_value in self.reprojected_ds_feature_deltas(
+            ds_path, ds_diff, need_old=need_old
+        ):
             delta_as_json = {}
 
             if delta.old:
                 if self.patch_type == "full" or not delta.new:
-                    delta_as_json["-"] = feature_as_json(
-                        delta.old_value, delta.old_key, old_transform
-                    )
+                    delta_as_json["-"] = feature_as_json(old_value, delta.old_key)
 
             if delta.new:
-                feature = feature_as_json(delta.new_value, delta.new_key, new_transform)
+                feature = feature_as_json(new_value, delta.new_key)
                 if delta.old and self.patch_type == "minimal":
                     # mark feature updates using a different key, otherwise they can
                     # be easily confused with inserts, since minimal-style patches don't
@@ -213,6 +217,8 @@ class JsonLinesDiffWriter(BaseDiffWriter):
       {"type": "feature", "dataset": dataset-path, "change": {"-/+": old/new-value}}
     """
 
+    stream_feature_deltas = True
+
     @classmethod
     def _check_output_path(cls, repo, output_path):
         if isinstance(output_path, Path) and output_path.is_dir():
@@ -330,18 +336,15 @@ class JsonLinesDiffWriter(BaseDiffWriter):
         if "feature" not in ds_diff:
             return
 
-        old_transform, new_transform = self.get_geometry_transforms(ds_path, ds_diff)
         obj = {"type": "feature", "dataset": ds_path, "change": None}
-        for key, delta in self.filtered_ds_feature_deltas(ds_path, ds_diff):
+        for key, delta, old_value, new_value in self.reprojected_ds_feature_deltas(
+            ds_path, ds_diff
+        ):
             change = {}
             if delta.old:
-                change["-"] = feature_as_json(
-                    delta.old_value, delta.old_key, old_transform
-                )
+                change["-"] = feature_as_json(old_value, delta.old_key)
             if delta.new:
-                change["+"] = feature_as_json(
-                    delta.new_value, delta.new_key, new_transform
-                )
+                change["+"] = feature_as_json(new_value, delta.new_key)
             obj["change"] = change
             self.dump(obj)
 
@@ -413,8 +416,7 @@ class GeojsonDiffWriter(BaseDiffWriter):
                 "Need to specify a directory via --output for GeoJSON with more than one dataset",
                 param_hint="--output",
             )
-        for ds_path in self.all_ds_paths:
-            ds_diff = self.get_dataset_diff(ds_path)
+        for ds_path, ds_diff in self.get_dataset_diffs():
             if not ds_diff:
                 continue
 
@@ -454,24 +456,12 @@ class GeojsonDiffWriter(BaseDiffWriter):
         if "feature" not in ds_diff:
             return
 
-        old_transform, new_transform = self.get_geometry_transforms(ds_path, ds_diff)
-
-        for key, delta in self.filtered_ds_feature_deltas(ds_path, ds_diff):
+        for key, delta, old_value, new_value in self.reprojected_ds_feature_deltas(
+            ds_path, ds_diff
+        ):
             if delta.old:
                 change_type = "U-" if delta.new else "D"
-                yield feature_as_geojson(
-                    delta.old_value,
-                    delta.old_key,
-                    ds_path,
-                    change_type,
-                    old_transform,
-                )
+                yield feature_as_geojson(old_value, delta.old_key, ds_path, change_type)
             if delta.new:
                 change_type = "U+" if delta.old else "I"
-                yield feature_as_geojson(
-                    delta.new_value,
-                    delta.new_key,
-                    ds_path,
-                    change_type,
-                    new_transform,
-                )
+                yield feature_as_geojson(new_value, delta.new_key, ds_path, change_type)
@@ -0,0 +1,78 @@
+import logging
+import threading
+from collections import OrderedDict
+
+L = logging.getLogger("kart.parsed_blob_cache")
+
+
+class ParsedBlobCache:
+    """
+    A process-wide cache of objects parsed from blobs - legends, schemas, CRS definitions and path-structures - keyed
+    by the kind of object and the blob's OID. Datasets are loaded afresh for every commit, so per-dataset caches don't
+    help when the same dataset is visited at many different commits (eg during `kart log --with-feature-count`, or a
+    long merge) - but these blobs rarely change, so with this cache, each distinct blob is parsed once per process.
+
+    Parsed objects are shared between every dataset that uses the same blob, so they must not be modified.
+    The cache holds at most max_entries objects - the least recently used are evicted first.
+    Counts of hits and misses for each kind of object are kept - see stats(). These are logged at debug level (eg with
+    `kart -vv`) when each command finishes.
+    """
+
+    DEFAULT_MAX_ENTRIES = 1024
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = {}
+        self.misses = {}
+
+    def get(self, kind, blob, parse):
+        """
+        Returns parse(blob.data), parsing it only if no object of the given kind has already been parsed from a blob
+        with the same OID.
+        """
+        key = (kind, blob.id)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits[kind] = self.hits.get(kind, 0) + 1
+                return self._entries[key]
+
+        # Parse outside the lock - at worst, two threads parse the same blob at once.
+        result = parse(blob.data)
+        with self._lock:
+            self.misses[kind] = self.misses.get(kind, 0) + 1
+            self._entries[key] = result
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits.clear()
+            self.misses.clear()
+
+    def stats(self):
+        """Returns {kind: {"hits": n, "misses": n}} for every kind of object requested so far, plus the cache size."""
+        with self._lock:
+            kinds = sorted(set(self.hits) | set(self.misses))
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "kinds": {
+                    kind: {
+                        "hits": self.hits.get(kind, 0),
+                        "misses": self.misses.get(kind, 0),
+                    }
+                    for kind in kinds
+                },
+            }
+
+    def log_stats(self):
+        if L.isEnabledFor(logging.DEBUG):
+            L.debug("Parsed blob cache: %s", self.stats())
+
+
+PARSED_BLOB_CACHE = ParsedBlobCache()
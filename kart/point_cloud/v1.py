@@ -5,7 +5,13 @@ import os
 from kart.base_dataset import BaseDataset, MetaItemDefinition, MetaItemFileType
 from kart.core import find_blobs_in_tree
 from kart.decorators import allow_classmethod
-from kart.diff_structs import DatasetDiff, DeltaDiff, Delta, KeyValue
+from kart.diff_structs import (
+    DatasetDiff,
+    DeltaDiff,
+    Delta,
+    KeyValue,
+    StreamingDeltaDiff,
+)
 from kart.key_filters import DatasetKeyFilter, FeatureKeyFilter
 from kart.list_of_conflicts import ListOfConflicts, InvalidNewValue
 from kart.lfs_util import (
@@ -205,20 +211,41 @@ class PointCloudV1(BaseDataset):
         oid, size = get_hash_and_size_of_file(path)
         return {"name": path.name, **tile_info, "oid": f"sha256:{oid}", "size": size}
 
-    def diff(self, other, ds_filter=DatasetKeyFilter.MATCH_ALL, reverse=False):
+    def diff(
+        self,
+        other,
+        ds_filter=DatasetKeyFilter.MATCH_ALL,
+        reverse=False,
+        *,
+        streaming=False,
+    ):
         """
         Generates a Diff from self -> other.
         If reverse is true, generates a diff from other -> self.
+        If streaming is true, the tile diff is a StreamingDeltaDiff.
         """
-        ds_diff = super().diff(other, ds_filter=ds_filter, reverse=reverse)
+        ds_diff = super().diff(
+            other, ds_filter=ds_filter, reverse=reverse, streaming=streaming
+        )
         tile_filter = ds_filter.get("tile", ds_filter.child_type())
-        ds_diff["tile"] = DeltaDiff(self.diff_tile(other, tile_filter, reverse=reverse))
+        delta_diff_class = StreamingDeltaDiff if streaming else DeltaDiff
+        ds_diff["tile"] = delta_diff_class(
+            self.diff_tile(other, tile_filter, reverse=reverse, streaming=streaming)
+        )
         return ds_diff
 
-    def diff_tile(self, other, tile_filter=FeatureKeyFilter.MATCH_ALL, reverse=False):
+    def diff_tile(
+        self,
+        other,
+        tile_filter=FeatureKeyFilter.MATCH_ALL,
+        reverse=False,
+        *,
+        streaming=False,
+    ):
         """
         Yields tile deltas from self -> other, but only for tile that match the tile_filter.
         If reverse is true, yields tile deltas from other -> self.
+        If streaming is true, the deltas are yielded as the tile trees are walked - see diff_subtree.
         """
         yield from self.diff_subtree(
             other,
@@ -227,6 +254,7 @@ class PointCloudV1(BaseDataset):
             key_decoder_method="tilename_from_path",
             value_decoder_method="get_tile_summary_promise_from_blob_path",
             reverse=reverse,
+            streaming=streaming,
         )
 
     def diff_to_working_copy(
@@ -56,6 +56,8 @@ class KartRepoFiles:
     MERGED_TREE = "MERGED_TREE"
     # A sqlite table that maps each feature SHA to its EPSG:4326 envelope. Used for spatial filtered clones.
     FEATURE_ENVELOPES = "feature_envelopes.db"
+    # The state of an interrupted `kart import --resumable`, which is used to continue it from where it left off.
+    IMPORT_STATE = "IMPORT_STATE"
 
 
 class KartRepoState(Enum):
@@ -98,6 +100,9 @@ class KartConfigKeys:
     KART_SPATIALFILTER_REFERENCE = "kart.spatialfilter.reference"
     KART_SPATIALFILTER_OBJECTID = "kart.spatialfilter.objectid"
 
+    # Memory budget of the decoded-feature cache, which is disabled if this isn't set - see DecodedFeatureCache.
+    KART_FEATURECACHE_MAXBYTES = "kart.featurecache.maxbytes"
+
     # This variable was also renamed, but when tidy-style repos were added - not during rebranding.
     CORE_BARE = "core.bare"  # Newer repos use the standard "core.bare" variable.
     SNO_WORKINGCOPY_BARE = (
@@ -207,6 +212,7 @@ class KartRepo(pygit2.Repository):
 
         self.working_copy = WorkingCopy(self)
 
+
     def __repr__(self):
         return f"KartRepo({self.path!r})"
 
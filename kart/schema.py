@@ -1,4 +1,5 @@
 import functools
+import operator
 import re
 import uuid
 from collections import namedtuple
@@ -305,6 +306,46 @@ class Schema:
         """
         return {c.name: raw_dict.get(c.id, None) for c in self.columns}
 
+    def legend_projection(self, legend):
+        """
+        Returns a function that takes the (pk_values, non_pk_values) of a feature stored using the given legend, and
+        returns a tuple of the feature's values in this schema's column order - the same values as
+        feature_from_raw_dict(legend.value_tuples_to_raw_dict(pk_values, non_pk_values)), but without building any
+        dicts. Columns that aren't in the legend are None.
+        Compiling a projection is much slower than using one, so keep the result - see TableV3.get_row_projection.
+        """
+        legend_columns = legend.pk_columns + legend.non_pk_columns
+        positions = {column_id: i for i, column_id in enumerate(legend_columns)}
+        # Columns that aren't in the legend read a None, which is appended to the legend's values.
+        filler_index = len(legend_columns)
+        indices = [positions.get(c.id, filler_index) for c in self.columns]
+        needs_filler = filler_index in indices
+
+        if len(indices) == 1:
+            (index,) = indices
+
+            def project(pk_values, non_pk_values):
+                return ((*pk_values, *non_pk_values, None)[index],)
+
+        elif needs_filler:
+            getter = operator.itemgetter(*indices)
+
+            def project(pk_values, non_pk_values):
+                return getter((*pk_values, *non_pk_values, None))
+
+        elif indices == list(range(len(legend_columns))):
+
+            def project(pk_values, non_pk_values):
+                return (*pk_values, *non_pk_values)
+
+        else:
+            getter = operator.itemgetter(*indices)
+
+            def project(pk_values, non_pk_values):
+                return getter((*pk_values, *non_pk_values))
+
+        return project
+
     def feature_to_raw_dict(self, feature):
         """
         Takes a feature - either a dict of values keyed by column name,
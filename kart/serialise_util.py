@@ -3,6 +3,7 @@ import hashlib
 import json
 import logging
 import struct
+import threading
 
 import msgpack
 
@@ -16,7 +17,8 @@ _EXTENSION_G = ord("G")
 
 def _msg_pack_default(obj):
     if isinstance(obj, Geometry):
-        return msgpack.ExtType(_EXTENSION_G, bytes(obj))
+        # Geometry is a bytes subclass, so there's no need to copy it.
+        return msgpack.ExtType(_EXTENSION_G, obj)
     if isinstance(obj, tuple):
         return list(obj)
     return obj
@@ -30,14 +32,53 @@ def _msg_unpack_ext_hook(code, data):
         return msgpack.ExtType(code, data)
 
 
+# Creating a msgpack Packer allocates its buffer, and msgpack.packb creates a new Packer every time it is called - so
+# instead, each thread keeps its own Packers and reuses them. (msgpack.unpackb doesn't create an Unpacker, so
+# there's nothing to reuse when unpacking.)
+_packers = threading.local()
+
+
+def _get_packer():
+    try:
+        return _packers.packer
+    except AttributeError:
+        packer = _packers.packer = msgpack.Packer(
+            use_bin_type=True,
+            strict_types=True,
+            default=_msg_pack_default,
+            autoreset=True,
+        )
+        return packer
+
+
+def _get_scalars_packer():
+    try:
+        return _packers.scalars_packer
+    except AttributeError:
+        packer = _packers.scalars_packer = msgpack.Packer(
+            use_bin_type=True, autoreset=True
+        )
+        return packer
+
+
 def msg_pack(data):
     """data (any type) -> bytes"""
-    return msgpack.packb(
-        data,
-        use_bin_type=True,
-        strict_types=True,
-        default=_msg_pack_default,
-    )
+    return _get_packer().pack(data)
+
+
+def msg_pack_many(items):
+    """Iterable of data (any type) -> list of bytes. The same as calling msg_pack on each item, but faster."""
+    pack = _get_packer().pack
+    return [pack(data) for data in items]
+
+
+def msg_pack_scalars(values):
+    """
+    List or tuple of scalar values -> bytes. The same as msg_pack(values), but only for ints, floats, bools, strs,
+    bytes and None - not Geometry. Tuples are packed as they are rather than being converted to lists first, and no
+    callback is needed - this is used for primary key values.
+    """
+    return _get_scalars_packer().pack(values)
 
 
 def msg_unpack(bytestring_or_memoryview):
@@ -47,6 +88,13 @@ def msg_unpack(bytestring_or_memoryview):
     )
 
 
+def msg_unpack_many(items):
+    """Iterable of bytes/memoryview -> list of data. The same as calling msg_unpack on each item, but faster."""
+    unpackb = msgpack.unpackb
+    ext_hook = _msg_unpack_ext_hook
+    return [unpackb(data, raw=False, ext_hook=ext_hook) for data in items]
+
+
 # json_pack and json_unpack have the same signature and capabilities as msg_pack and msg_unpack,
 # but their storage format is less compact and more human-readable.
 def json_pack(data):
@@ -67,6 +67,13 @@ from .repo import KartRepoState
         "Otherwise, the feature count will be approximated with varying levels of accuracy."
     ),
 )
+@click.option(
+    "--num-processes",
+    hidden=True,
+    type=click.INT,
+    default=None,
+    help="Number of worker processes to use when diffing more than one dataset (advanced users only)",
+)
 @click.argument("refish", default="HEAD", required=False)
 @click.argument("filters", nargs=-1)
 def show(
@@ -80,6 +87,7 @@ def show(
     only_feature_count,
     refish,
     filters,
+    num_processes,
 ):
     """
     Show the given commit, or HEAD
@@ -111,7 +119,13 @@ def show(
     repo = ctx.obj.get_repo(allowed_states=KartRepoState.ALL_STATES)
     diff_writer_class = BaseDiffWriter.get_diff_writer_class(output_type)
     diff_writer = diff_writer_class(
-        repo, commit_spec, filters, output_path, json_style=fmt, target_crs=crs
+        repo,
+        commit_spec,
+        filters,
+        output_path,
+        json_style=fmt,
+        target_crs=crs,
+        num_processes=num_processes,
     )
     diff_writer.include_target_commit_as_header()
     diff_writer.write_diff()
@@ -573,12 +573,13 @@ class SpatialFilter:
         # Quick check - envelope intersects envelope?
         if self.filter_env is not None:
             try:
-                # Don't call envelope() with calculate_if_missing=True - calculating the envelope
-                # involves loading it into OGR, which we don't want to do twice (see below).
-                feature_env = feature_geometry.envelope(only_2d=True)
+                # Envelope might not be stored (it never is for POINT geometries) - if so, it is calculated straight
+                # from the WKB, so that features outside the filter never need to be loaded into OGR.
+                feature_env = feature_geometry.envelope(
+                    only_2d=True, calculate_if_missing=True
+                )
 
-                # Envelope might be missing (for POINT geometries, or, for unknown reasons).
-                # In this case, we use OGR to calculate it, but we keep the OGR geometry too.
+                # Envelope of an empty geometry is None - let OGR deal with it, but keep the OGR geometry too.
                 if feature_env is None:
                     feature_ogr = feature_geometry.to_ogr()
                     feature_env = feature_ogr.GetEnvelope()
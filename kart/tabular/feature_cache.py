@@ -0,0 +1,117 @@
+import logging
+import sys
+import threading
+from collections import OrderedDict
+
+L = logging.getLogger("kart.tabular.feature_cache")
+
+
+class DecodedFeatureCache:
+    """
+    A process-wide cache of decoded features, keyed by (feature blob OID, primary key values, target schema) - see
+    TableV3.get_feature_row. Diffs, apply, conflict checks and working-copy diffs often decode the same feature blobs
+    more than once - and in helper mode (see `kart helper`) the same process serves many commands - so this saves
+    decoding them again. The legend a feature was stored with is part of the blob's contents, so is covered by its OID.
+
+    Features are stored as tuples of values in schema column order, so they can be shared safely - a new dict is built
+    for each caller that wants one.
+
+    The cache is opt-in, and is bounded by the approximate number of bytes of memory used by the cached features - set
+    the kart.featurecache.maxbytes config variable to enable it (git size suffixes such as 64m are allowed). Once it is
+    full, the least recently used features are evicted first. See stats() for hit, miss and eviction counts - these are
+    logged at debug level (eg with `kart -vv`) when each command finishes, including commands run by `kart helper`.
+    """
+
+    # Rough cost of each entry, on top of the values themselves - the key and the dict slot that holds it.
+    ENTRY_OVERHEAD = 200
+
+    def __init__(self, max_bytes=0):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def configure(self, max_bytes):
+        """Sets the memory budget of the cache - evicting features if it is now too full. Zero disables the cache."""
+        with self._lock:
+            self.max_bytes = max(max_bytes or 0, 0)
+            self._evict()
+
+    def configure_from_repo(self, repo):
+        from kart.repo import KartConfigKeys
+
+        key = KartConfigKeys.KART_FEATURECACHE_MAXBYTES
+        config = repo.config
+        self.configure(config.get_int(key) if key in config else 0)
+
+    @classmethod
+    def row_size(cls, row):
+        """Returns the approximate number of bytes of memory used by the given feature row."""
+        return (
+            cls.ENTRY_OVERHEAD
+            + sys.getsizeof(row)
+            + sum(sys.getsizeof(value) for value in row)
+        )
+
+    def get(self, key):
+        """Returns the feature row stored with the given key, or None if there isn't one."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, row):
+        size = self.row_size(row)
+        with self._lock:
+            if size > self.max_bytes:
+                return
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self.bytes -= old_entry[1]
+            self._entries[key] = (row, size)
+            self.bytes += size
+            self._evict()
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self._entries:
+            key, (row, size) = self._entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+            self.evicted_bytes += size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self.hits = self.misses = self.evictions = self.evicted_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "evictedBytes": self.evicted_bytes,
+            }
+
+    def log_stats(self):
+        if self.enabled and L.isEnabledFor(logging.DEBUG):
+            L.debug("Decoded feature cache: %s", self.stats())
+
+
+DECODED_FEATURE_CACHE = DecodedFeatureCache()
@@ -1,7 +1,12 @@
 import json
 
 from kart.exceptions import InvalidOperation
-from kart.geometry import Geometry, ogr_to_hex_wkb
+from kart.geometry import (
+    Geometry,
+    ogr_to_gpkg_geom,
+    ogr_to_hex_wkb,
+    transform_gpkg_geoms,
+)
 from kart.utils import ungenerator
 
 
@@ -95,3 +100,46 @@ def feature_as_geojson(
             f["properties"][k] = v
 
     return f
+
+
+def reproject_features(rows_and_pk_values, geometry_transform):
+    """
+    Given a list of (row, pk_value) pairs, returns a list of the rows with every geometry reprojected using
+    geometry_transform. The geometries of all the rows are reprojected together - see transform_gpkg_geoms - so
+    reprojecting a few thousand rows at a time is much quicker than reprojecting them one at a time.
+    The returned geometries are only suitable for output, eg by feature_as_json or feature_as_geojson.
+    """
+    if geometry_transform is None:
+        return [row for row, pk_value in rows_and_pk_values]
+
+    geom_keys = []
+    geoms = []
+    for row, pk_value in rows_and_pk_values:
+        keys = [k for k, v in row.items() if isinstance(v, Geometry)]
+        geom_keys.append(keys)
+        geoms.extend(row[k] for k in keys)
+
+    reprojected = iter(transform_gpkg_geoms(geoms, geometry_transform))
+
+    result = []
+    for (row, pk_value), keys in zip(rows_and_pk_values, geom_keys):
+        if keys:
+            row = dict(row)
+            for k in keys:
+                geom = next(reprojected)
+                if geom is None:
+                    geom = _reproject_with_ogr(row[k], pk_value, geometry_transform)
+                row[k] = geom
+        result.append(row)
+    return result
+
+
+def _reproject_with_ogr(geom, pk_value, geometry_transform):
+    ogr_geom = geom.to_ogr()
+    try:
+        ogr_geom.Transform(geometry_transform)
+    except RuntimeError as e:
+        raise InvalidOperation(
+            f"Can't reproject geometry with ID '{pk_value}' into target CRS"
+        ) from e
+    return ogr_to_gpkg_geom(ogr_geom)
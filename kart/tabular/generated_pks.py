@@ -0,0 +1,232 @@
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+HASH_SIZE = 20
+
+
+def _pks_to_bytes(pks):
+    # Generated PKs are always stored little-endian, whatever the native byte-order.
+    if sys.byteorder == "big":
+        pks = array("Q", pks)
+        pks.byteswap()
+    return pks.tobytes()
+
+
+def _pks_from_bytes(data):
+    pks = array("Q")
+    pks.frombytes(data)
+    if sys.byteorder == "big":
+        pks.byteswap()
+    return pks
+
+
+class GeneratedPks:
+    """
+    The mapping {generated primary key -> hash of feature contents} stored by PkGeneratingTableImportSource.
+    Rather than a dict, this is stored as two parallel arrays - the primary keys in ascending order, as uint64s,
+    and the raw 20-byte feature hashes - which takes a small fraction of the memory a dict of this size would need.
+
+    Primary keys are generally assigned in ascending order, so appending a new primary key is cheap. Looking up or
+    overwriting the hash of an existing primary key is a binary search.
+
+    Although the feature hashes are stored in binary, they are accepted and returned as hex strings, which is how
+    Schema.hash_feature returns them.
+
+    When committed, the mapping is split into chunks, each containing the primary keys in a range of CHUNK_SIZE
+    consecutive keys - so that on reimport, any chunk that is unchanged is the same blob as before. Each chunk is:
+    a header (magic number and entry count), then the primary keys as little-endian uint64s, then the hashes.
+    """
+
+    CHUNK_BITS = 16
+    CHUNK_SIZE = 1 << CHUNK_BITS
+
+    CHUNK_MAGIC = b"KGPK"
+    CHUNK_HEADER = struct.Struct("<4sI")
+
+    def __init__(self, pks=None, hashes=None):
+        self._pks = pks if pks is not None else array("Q")
+        self._hashes = hashes if hashes is not None else bytearray()
+        assert len(self._hashes) == len(self._pks) * HASH_SIZE
+
+    @classmethod
+    def from_dict(cls, generated_primary_keys):
+        """
+        Loads the mapping as stored in the original JSON format - {primary key -> hex hash}, where the primary
+        keys are strings, since they are JSON object keys.
+        """
+        result = cls()
+        for pk, feature_hash in sorted(
+            (int(pk), feature_hash)
+            for pk, feature_hash in generated_primary_keys.items()
+        ):
+            result._pks.append(pk)
+            result._hashes += bytes.fromhex(feature_hash)
+        return result
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        """Loads the mapping from the given chunks - see to_chunks. Chunks must be supplied in order."""
+        result = cls()
+        for data in chunks:
+            magic, count = cls.CHUNK_HEADER.unpack_from(data)
+            if magic != cls.CHUNK_MAGIC:
+                raise ValueError("Invalid generated-pks chunk")
+            pks_start = cls.CHUNK_HEADER.size
+            hashes_start = pks_start + count * 8
+            result._pks += _pks_from_bytes(data[pks_start:hashes_start])
+            result._hashes += data[hashes_start : hashes_start + count * HASH_SIZE]
+        return result
+
+    @classmethod
+    def chunk_name(cls, pk):
+        return f"{pk >> cls.CHUNK_BITS:08x}"
+
+    def to_chunks(self):
+        """Returns a dict {chunk name -> chunk data}, where the chunk names sort in primary key order."""
+        result = {}
+        pks = self._pks
+        start = 0
+        while start < len(pks):
+            name = self.chunk_name(pks[start])
+            chunk_end = ((pks[start] >> self.CHUNK_BITS) + 1) << self.CHUNK_BITS
+            end = bisect_left(pks, chunk_end, start)
+            result[name] = b"".join(
+                [
+                    self.CHUNK_HEADER.pack(self.CHUNK_MAGIC, end - start),
+                    _pks_to_bytes(pks[start:end]),
+                    self._hashes[start * HASH_SIZE : end * HASH_SIZE],
+                ]
+            )
+            start = end
+        return result
+
+    def __len__(self):
+        return len(self._pks)
+
+    @property
+    def max_pk(self):
+        return self._pks[-1] if self._pks else None
+
+    def pk_at(self, i):
+        return self._pks[i]
+
+    def raw_hash_at(self, i):
+        return bytes(self._hashes[i * HASH_SIZE : (i + 1) * HASH_SIZE])
+
+    def _index(self, pk):
+        i = bisect_left(self._pks, pk)
+        if i < len(self._pks) and self._pks[i] == pk:
+            return i
+        return None
+
+    def __contains__(self, pk):
+        return self._index(pk) is not None
+
+    def __getitem__(self, pk):
+        i = self._index(pk)
+        if i is None:
+            raise KeyError(pk)
+        return self.raw_hash_at(i).hex()
+
+    def get(self, pk, default=None):
+        i = self._index(pk)
+        return self.raw_hash_at(i).hex() if i is not None else default
+
+    def __setitem__(self, pk, feature_hash):
+        raw_hash = bytes.fromhex(feature_hash)
+        pks = self._pks
+        if not pks or pk > pks[-1]:
+            pks.append(pk)
+            self._hashes += raw_hash
+            return
+        i = bisect_right(pks, pk)
+        if i > 0 and pks[i - 1] == pk:
+            self._hashes[(i - 1) * HASH_SIZE : i * HASH_SIZE] = raw_hash
+        else:
+            pks.insert(i, pk)
+            self._hashes[i * HASH_SIZE : i * HASH_SIZE] = raw_hash
+
+    def items(self):
+        """Yields (primary key, hex hash) in primary key order."""
+        for i, pk in enumerate(self._pks):
+            yield pk, self.raw_hash_at(i).hex()
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def unassigned_pks_index(self):
+        """Returns an UnassignedPks index of every primary key in this mapping, looked up by feature hash."""
+        return UnassignedPks(self)
+
+
+class UnassignedPks:
+    """
+    The inverse of GeneratedPks - {feature hash -> [primary keys]} - but only containing primary keys that have not
+    yet been reassigned during the current import. Since more than one feature can have the same contents, more than
+    one primary key can have the same hash, in which case they are reassigned lowest first.
+
+    This is an open-addressing hash table built out of arrays, indexing into the GeneratedPks it was built from:
+    - each slot holds the index of the first entry with a particular hash (plus one, so that zero means empty),
+      and the index of the next entry with that hash that is still unassigned (or zero, if there are none left).
+    - entries with the same hash are chained together in primary key order.
+    The hashes are SHA-1 hashes, so the table can be addressed with their leading bytes directly.
+
+    The GeneratedPks is not copied, so while this index is in use, new primary keys may be appended to it, but the
+    hashes of existing primary keys must not be changed.
+    """
+
+    def __init__(self, generated_pks):
+        self.generated_pks = generated_pks
+        self._hashes = generated_pks._hashes
+        n = len(generated_pks)
+        capacity = 8
+        while capacity < n * 2:
+            capacity *= 2
+        self._mask = capacity - 1
+        self._slot_keys = array("I", [0]) * capacity
+        self._slot_heads = array("I", [0]) * capacity
+        self._next = array("I", [0]) * n
+
+        # Insert in reverse, so that each chain of entries with the same hash ends up in primary key order.
+        for i in range(n - 1, -1, -1):
+            slot = self._find_slot(self._raw_hash(i))
+            if self._slot_keys[slot]:
+                self._next[i] = self._slot_heads[slot]
+            else:
+                self._slot_keys[slot] = i + 1
+            self._slot_heads[slot] = i + 1
+
+    def _raw_hash(self, i):
+        return self._hashes[i * HASH_SIZE : (i + 1) * HASH_SIZE]
+
+    def _find_slot(self, raw_hash):
+        """Returns the slot containing the given hash - or, if it is not present, the empty slot where it would go."""
+        slot = int.from_bytes(raw_hash[:8], "little") & self._mask
+        while True:
+            key = self._slot_keys[slot]
+            if not key or self._raw_hash(key - 1) == raw_hash:
+                return slot
+            slot = (slot + 1) & self._mask
+
+    def pop(self, feature_hash):
+        """
+        Returns the lowest unassigned primary key for a feature with the given hex hash, and marks it as assigned.
+        Returns None if there is no such primary key.
+        """
+        slot = self._find_slot(bytes.fromhex(feature_hash))
+        head = self._slot_heads[slot]
+        if not head:
+            return None
+        self._slot_heads[slot] = self._next[head - 1]
+        return self.generated_pks.pk_at(head - 1)
+
+    def unassigned_pks(self):
+        """Returns the set of all primary keys that are still unassigned."""
+        result = set()
+        for head in self._slot_heads:
+            while head:
+                result.add(self.generated_pks.pk_at(head - 1))
+                head = self._next[head - 1]
+        return result
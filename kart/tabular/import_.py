@@ -1,4 +1,5 @@
-import warnings
+import contextlib
+
 import click
 from osgeo import gdal
 
@@ -8,7 +9,6 @@ from kart.cli_util import (
     MutexOption,
     StringFromFile,
     call_and_exit_flag,
-    RemovalInKart013Warning,
     KartCommand,
 )
 from kart.core import check_git_user
@@ -16,6 +16,7 @@ from kart.dataset_util import validate_dataset_paths
 from kart.exceptions import InvalidOperation
 from kart.fast_import import FastImportSettings, ReplaceExisting, fast_import_tables
 from kart.key_filters import RepoKeyFilter
+from kart.tabular.import_profile import ImportProfile
 from kart.tabular.import_source import TableImportSource
 from kart.tabular.ogr_import_source import FORMAT_TO_OGR_MAP
 from kart.tabular.pk_generation import PkGeneratingTableImportSource
@@ -30,6 +31,7 @@ def list_import_formats(ctx):
     click.echo("PostgreSQL: postgresql://HOST/DBNAME[/DBSCHEMA]")
     click.echo("SQL Server: mssql://HOST/DBNAME[/DBSCHEMA]")
     click.echo("MySQL: mysql://HOST[/DBNAME]")
+    click.echo("Kart repository: kart:PATH[@REF[:DATASET]]")
 
     ogr_types = set()
     for prefix, ogr_driver_name in FORMAT_TO_OGR_MAP.items():
@@ -187,11 +189,46 @@ def any_at_all(iterable):
     default=True,
     help="Whether to create a working copy once the import is finished, if no working copy exists yet.",
 )
+@click.option(
+    "--resumable",
+    is_flag=True,
+    default=False,
+    help=(
+        "Regularly save the progress of the import, so that if it is interrupted, running the same command again "
+        "continues the import from where it left off, rather than starting over."
+    ),
+)
+@click.option(
+    "--profile",
+    "profile_path",
+    type=click.Path(dir_okay=False, writable=True),
+    help=(
+        "Write a JSON report to the given file of how long the import spent in each stage - reading from the source, "
+        "encoding features, writing to git, etc - and of the sizes of the blobs written."
+    ),
+)
+@click.option(
+    "--optimise",
+    is_flag=True,
+    default=False,
+    help=(
+        "Once the import is complete, repack the repository and write a commit-graph and reachability bitmaps. "
+        "This takes extra time, but makes the repository smaller, and faster to clone, fetch and diff."
+    ),
+)
 @click.option(
     "--num-processes",
-    help="Deprecated (no longer used)",
+    hidden=True,
+    type=click.INT,
     default=None,
+    help="Number of worker processes to use when encoding features (advanced users only)",
+)
+@click.option(
+    "--max-concurrent-sources",
     hidden=True,
+    type=click.INT,
+    default=None,
+    help="Maximum number of tables to import at once, when importing more than one table (advanced users only)",
 )
 def import_(
     ctx,
@@ -209,7 +246,11 @@ def import_(
     allow_empty,
     max_delta_depth,
     do_checkout,
+    resumable,
+    profile_path,
+    optimise,
     num_processes,
+    max_concurrent_sources,
 ):
     """
     Import data into a repository.
@@ -223,17 +264,15 @@ def import_(
 
     $ kart import GPKG:my.gpkg [table1[:new_name1]] [table2[:new_name2]]
 
+    To import datasets from another Kart repository, use
+
+    $ kart import kart:path/to/repo[@REF] [dataset1[:new_name1]]
+
     To show available tables in the import data, use
 
     $ kart import --list GPKG:my.gpkg
     """
 
-    if num_processes is not None:
-        warnings.warn(
-            "--num-processes is deprecated and will be removed in Kart 0.13.",
-            RemovalInKart013Warning,
-        )
-
     if output_format == "json" and not do_list:
         raise click.UsageError(
             "Illegal usage: '--output-format=json' only supports --list"
@@ -331,17 +370,29 @@ def import_(
     replace_existing_enum = (
         ReplaceExisting.GIVEN if replace_existing else ReplaceExisting.DONT_REPLACE
     )
-    fast_import_tables(
-        repo,
-        import_sources,
-        settings=FastImportSettings(max_delta_depth=max_delta_depth),
-        verbosity=ctx.obj.verbosity + 1,
-        message=message,
-        replace_existing=replace_existing_enum,
-        from_commit=repo.head_commit,
-        replace_ids=replace_ids,
-        allow_empty=allow_empty,
-    )
+    profile = ImportProfile() if profile_path else None
+    try:
+        with profile.activate() if profile else contextlib.nullcontext():
+            fast_import_tables(
+                repo,
+                import_sources,
+                settings=FastImportSettings(
+                    max_delta_depth=max_delta_depth,
+                    num_processes=num_processes,
+                    max_concurrent_sources=max_concurrent_sources,
+                    optimise=optimise,
+                ),
+                verbosity=ctx.obj.verbosity + 1,
+                message=message,
+                replace_existing=replace_existing_enum,
+                from_commit=repo.head_commit,
+                replace_ids=replace_ids,
+                allow_empty=allow_empty,
+                resumable=resumable,
+            )
+    finally:
+        if profile:
+            profile.dump(profile_path)
 
     # During imports we can keep old changes since they won't conflict with newly imported datasets.
     parts_to_create = [PartType.TABULAR] if do_checkout else []
@@ -0,0 +1,264 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# The ImportProfile that is currently recording, if any - see ImportProfile.activate.
+_active_profile = None
+
+
+def active_import_profile():
+    """Returns the ImportProfile that is currently recording, or None if the current import isn't being profiled."""
+    return _active_profile
+
+
+class BlobSizeHistogram:
+    """Counts blobs by size, in power-of-two buckets."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        # Bucket n contains blobs of size [2**(n-1), 2**n) - bucket 0 contains empty blobs.
+        self.buckets = {}
+
+    def add(self, size):
+        self.count += 1
+        self.total += size
+        self.min = size if self.min is None else min(self.min, size)
+        self.max = size if self.max is None else max(self.max, size)
+        bucket = size.bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def merge(self, other):
+        """Adds the blobs counted by another histogram to this one."""
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+
+    @staticmethod
+    def _bucket_label(bucket):
+        if bucket == 0:
+            return "0"
+        return f"{2 ** (bucket - 1)}-{2 ** bucket - 1}"
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "totalBytes": self.total,
+            "minBytes": self.min,
+            "maxBytes": self.max,
+            "meanBytes": round(self.total / self.count, 1) if self.count else None,
+            "histogram": {
+                self._bucket_label(b): self.buckets[b] for b in sorted(self.buckets)
+            },
+        }
+
+
+class ImportProfile:
+    """
+    Records how long an import spends in each stage - reading from the source, adapting values, generating primary keys,
+    encoding features, writing to git-fast-import, and so on - as well as histograms of the sizes of the blobs written.
+    See `kart import --profile`.
+
+    Stages can be nested, and time is only counted towards the innermost stage - so, for instance, time spent reading a
+    feature from the source while generating its primary key is counted as reading, not as generating the primary key.
+    This lets the stages be timed wherever they happen to be, without any one stage having to know about the others.
+
+    Profiling adds some overhead to each stage, so code that is timed should only check once whether there is an
+    active_import_profile(), rather than once per feature.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stage_seconds = {}
+        self.stage_calls = {}
+        self.blob_sizes = {}
+        self.feature_count = 0
+        # Set if the repository is optimised after the import - see optimise_repo_after_import.
+        self.repo_optimisation = None
+        self._start_time = None
+        self._end_time = None
+
+    @contextmanager
+    def activate(self):
+        """Contextmanager. Makes this the active_import_profile() while the import runs."""
+        global _active_profile
+        prev_profile = _active_profile
+        _active_profile = self
+        self._start_time = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self._end_time = time.perf_counter()
+            _active_profile = prev_profile
+
+    def __getstate__(self):
+        # A profile is pickled to send it from a worker process back to the main process - see merge.
+        # The lock and the per-thread stacks of stages can't be pickled, and aren't needed once the worker is done.
+        state = self.__dict__.copy()
+        del state["_lock"]
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def merge(self, other):
+        """
+        Adds the stage timings, feature count and blob sizes recorded by another profile - such as the profile of a
+        source that was imported by a worker process - to this one. Stages which ran at the same time in several
+        processes can add up to more than the total time of the import.
+        """
+        with self._lock:
+            for stage, seconds in other.stage_seconds.items():
+                self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+            for stage, calls in other.stage_calls.items():
+                self.stage_calls[stage] = self.stage_calls.get(stage, 0) + calls
+            self.feature_count += other.feature_count
+            for kind, other_histogram in other.blob_sizes.items():
+                histogram = self.blob_sizes.get(kind)
+                if histogram is None:
+                    histogram = self.blob_sizes[kind] = BlobSizeHistogram()
+                histogram.merge(other_histogram)
+
+    def _stack(self):
+        # Each thread has its own stack of nested stages - (stage, time the stage was last resumed).
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def _add(self, stage, seconds):
+        with self._lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    def start(self, stage):
+        """Starts timing the given stage, pausing the stage that is currently being timed (if any)."""
+        now = time.perf_counter()
+        stack = self._stack()
+        if stack:
+            outer_stage, resumed_at = stack[-1]
+            self._add(outer_stage, now - resumed_at)
+        stack.append((stage, now))
+        with self._lock:
+            self.stage_calls[stage] = self.stage_calls.get(stage, 0) + 1
+
+    def stop(self):
+        """Stops timing the current stage, and resumes timing the stage it interrupted (if any)."""
+        now = time.perf_counter()
+        stack = self._stack()
+        stage, resumed_at = stack.pop()
+        self._add(stage, now - resumed_at)
+        if stack:
+            stack[-1] = (stack[-1][0], now)
+
+    @contextmanager
+    def stage(self, stage):
+        """Contextmanager. Times the body as the given stage."""
+        self.start(stage)
+        try:
+            yield
+        finally:
+            self.stop()
+
+    def timed(self, stage, fn):
+        """Returns a function that behaves like fn, but times each call as the given stage."""
+
+        def _timed(*args, **kwargs):
+            self.start(stage)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.stop()
+
+        return _timed
+
+    def timed_iter(self, stage, iterable):
+        """Generator. Yields from iterable, timing the production of each item as the given stage."""
+        it = iter(iterable)
+        while True:
+            self.start(stage)
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                self.stop()
+            yield item
+
+    def record_feature(self, blob_data):
+        """Counts a feature as imported, and adds its size to the feature blob size histogram (if it was written)."""
+        with self._lock:
+            self.feature_count += 1
+        if isinstance(blob_data, bytes):
+            self.record_blob_size("feature", len(blob_data))
+
+    def record_blob_sizes(self, kind, blobs):
+        """Generator. Yields the given (path, data) tuples, adding the size of each blob to the blob size histograms."""
+        for path, data in blobs:
+            self.record_blob_size(kind, len(data))
+            yield path, data
+
+    def record_blob_size(self, kind, size):
+        """Adds a blob of the given kind (eg "feature" or "meta") and size to the blob size histograms."""
+        with self._lock:
+            histogram = self.blob_sizes.get(kind)
+            if histogram is None:
+                histogram = self.blob_sizes[kind] = BlobSizeHistogram()
+            histogram.add(size)
+
+    def to_dict(self):
+        end_time = self._end_time or time.perf_counter()
+        total_seconds = end_time - self._start_time if self._start_time else 0.0
+        stages = {
+            stage: {
+                "seconds": round(seconds, 3),
+                "calls": self.stage_calls.get(stage, 0),
+                "percent": round(100 * seconds / total_seconds, 1)
+                if total_seconds
+                else None,
+            }
+            for stage, seconds in sorted(
+                self.stage_seconds.items(), key=lambda item: -item[1]
+            )
+        }
+        # Time that wasn't spent in any particular stage - eg, setting up the import.
+        other_seconds = total_seconds - sum(self.stage_seconds.values())
+        stages["other"] = {
+            "seconds": round(max(other_seconds, 0.0), 3),
+            "calls": None,
+            "percent": round(100 * other_seconds / total_seconds, 1)
+            if total_seconds
+            else None,
+        }
+        result = {
+            "totalSeconds": round(total_seconds, 3),
+            "features": self.feature_count,
+            "featuresPerSecond": round(self.feature_count / total_seconds)
+            if total_seconds
+            else None,
+            "stages": stages,
+            "blobSizes": {
+                kind: histogram.to_dict()
+                for kind, histogram in sorted(self.blob_sizes.items())
+            },
+        }
+        if self.repo_optimisation:
+            result["repoOptimisation"] = self.repo_optimisation
+        return result
+
+    def dump(self, path):
+        """Writes this profile as JSON to the given path."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write("\n")
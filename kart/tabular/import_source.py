@@ -1,3 +1,5 @@
+import itertools
+
 import click
 
 from kart.exceptions import NO_TABLE, NotFound
@@ -27,6 +29,11 @@ class TableImportSource:
     def open(cls, full_spec, table=None):
         from kart.sqlalchemy import DbType
 
+        from .kart_import_source import KartTableImportSource
+
+        if KartTableImportSource.is_kart_spec(full_spec):
+            return KartTableImportSource.open(full_spec, table=table)
+
         spec = cls._remove_unnecessary_prefix(str(full_spec))
 
         db_type = DbType.from_spec(spec)
@@ -56,6 +63,14 @@ class TableImportSource:
                 )
         list_of_conflicts.check_sources_are_importable(import_sources)
 
+    def __getstate__(self):
+        """
+        TableImportSources are pickled to send them to worker processes when several are imported at once - see
+        fast_import._import_sources_concurrently. Subclasses which hold resources that can't be pickled (eg a file
+        handle, a DB connection or a repository) should leave them out, and reopen them in __setstate__.
+        """
+        return self.__dict__.copy()
+
     def check_fully_specified(self):
         """
         Some TableImportSources can be constructed only partially specified, but they will not work as an import source
@@ -184,6 +199,19 @@ class TableImportSource:
         """
         raise NotImplementedError()
 
+    def resumable_features(self, position=None):
+        """
+        Like features(), but yields (position, feature) tuples, so that an interrupted import can be resumed -
+        calling resumable_features(position) yields only the features that come after the feature at that position.
+        Positions are JSON-serialisable. By default, a position is a row offset, which relies on features() yielding
+        features in the same order every time, and which means skipped features are still read from the source.
+        Subclasses should override this if they can do better.
+        """
+        start = position or 0
+        features = itertools.islice(self.features(), start, None)
+        for i, feature in enumerate(features, start=start + 1):
+            yield i, feature
+
     @property
     def feature_count(self):
         """Returns the number of features in self.features"""
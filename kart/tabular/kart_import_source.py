@@ -0,0 +1,267 @@
+import functools
+import subprocess
+import sys
+
+import click
+
+from kart.cli_util import tool_environment
+from kart.core import find_blobs_with_paths_in_tree
+from kart.exceptions import (
+    NO_IMPORT_SOURCE,
+    NO_TABLE,
+    NotFound,
+    NotYetImplemented,
+    SubprocessError,
+)
+from kart.output_util import dump_json_output
+
+from .import_source import TableImportSource
+
+
+class KartTableImportSource(TableImportSource):
+    """
+    TableImportSource that imports a table dataset from another local Kart repository:
+
+    kart:PATH[@REF[:DATASET]]
+
+    Where the dataset can be imported without changing its schema or the way feature paths are encoded, the existing
+    feature blobs are reused as they are - the objects are copied from the other repository in a single pack, and
+    git-fast-import is told to reference them by OID, rather than every feature being decoded and re-encoded.
+    """
+
+    PREFIX = "KART:"
+
+    @classmethod
+    def is_kart_spec(cls, spec):
+        return str(spec).upper().startswith(cls.PREFIX)
+
+    @classmethod
+    def open(cls, spec, table=None):
+        from kart.repo import KartRepo
+
+        spec = str(spec)
+        location = spec[len(cls.PREFIX) :]
+        ref = "HEAD"
+        if "@" in location:
+            location, ref_and_dataset = location.rsplit("@", 1)
+            ref, _, dataset_path = ref_and_dataset.partition(":")
+            ref = ref or "HEAD"
+            if dataset_path and table is None:
+                table = dataset_path
+
+        try:
+            repo = KartRepo(location)
+        except NotFound:
+            raise NotFound(
+                f"Couldn't find a Kart repository at '{location}'",
+                exit_code=NO_IMPORT_SOURCE,
+            )
+
+        structure = repo.structure(ref)
+        return KartTableImportSource(
+            spec, repo=repo, ref=ref, structure=structure, dataset_path=table
+        )
+
+    def __init__(
+        self,
+        original_spec,
+        *,
+        repo,
+        ref,
+        structure,
+        dataset_path,
+        dest_path=None,
+        meta_overrides=None,
+    ):
+        self.original_spec = original_spec
+        self.repo = repo
+        self.ref = ref
+        self.structure = structure
+        self.dataset_path = dataset_path
+        if dest_path:
+            self.dest_path = dest_path
+        self.meta_overrides = {
+            k: v for k, v in (meta_overrides or {}).items() if v is not None
+        }
+        # Set once the existing feature blobs are being reused - see feature_iter_with_reused_blobs.
+        self.reusing_feature_blobs = False
+
+    def __getstate__(self):
+        # Repositories can't be pickled - the repository is reopened when this source is unpickled.
+        state = super().__getstate__()
+        state["repo"] = str(self.repo.gitdir_path)
+        state["structure"] = (self.structure.commit or self.structure.tree).id.hex
+        return state
+
+    def __setstate__(self, state):
+        from kart.repo import KartRepo
+
+        self.__dict__.update(state)
+        self.repo = KartRepo(state["repo"], validate=False)
+        self.structure = self.repo.structure(state["structure"])
+
+    @property
+    def source_name(self):
+        return f"{self.repo.workdir_path}@{self.ref}"
+
+    def __str__(self):
+        if self.dataset_path:
+            return f"{self.source_name}:{self.dataset_path}"
+        return self.source_name
+
+    def import_source_desc(self):
+        return f"Import from {self} to {self.dest_path}/"
+
+    def aggregate_import_source_desc(self, import_sources):
+        if len(import_sources) == 1:
+            return next(iter(import_sources)).import_source_desc()
+
+        desc = f"Import {len(import_sources)} datasets from {self.source_name}:"
+        for source in import_sources:
+            if source.dest_path == source.dataset_path:
+                desc += f"\n * {source.dataset_path}/"
+            else:
+                desc += f"\n * {source.dest_path} (from {source.dataset_path})"
+        return desc
+
+    def default_dest_path(self):
+        return self._normalise_dataset_path(self.dataset_path)
+
+    @functools.lru_cache(maxsize=1)
+    def get_tables(self):
+        datasets = self.structure.datasets(filter_dataset_type="table")
+        if self.dataset_path is not None:
+            ds = datasets.get(self.dataset_path)
+            datasets = [ds] if ds is not None else []
+        return {ds.path: ds.get_meta_item("title") for ds in datasets}
+
+    def print_table_list(self, do_json=False):
+        tables = self.get_tables()
+        if do_json:
+            dump_json_output({"kart.tables/v1": tables}, sys.stdout)
+        else:
+            click.secho("Datasets found:", bold=True)
+            for table_name, title in tables.items():
+                if title:
+                    click.echo(f"  {table_name} - {title}")
+                else:
+                    click.echo(f"  {table_name}")
+        return tables
+
+    def clone_for_table(
+        self, table, *, dest_path=None, primary_key=None, meta_overrides={}
+    ):
+        table = self._normalise_dataset_path(table)
+        if table not in self.get_tables():
+            raise NotFound(f"Dataset '{table}' not found", exit_code=NO_TABLE)
+
+        result = KartTableImportSource(
+            self.original_spec,
+            repo=self.repo,
+            ref=self.ref,
+            structure=self.structure,
+            dataset_path=table,
+            dest_path=dest_path,
+            meta_overrides={**self.meta_overrides, **meta_overrides},
+        )
+        if primary_key is not None and primary_key != result.dataset.primary_key:
+            raise NotYetImplemented(
+                "Sorry, changing the primary key isn't supported when importing from a Kart repository"
+            )
+        return result
+
+    @property
+    @functools.lru_cache(maxsize=1)
+    def dataset(self):
+        return self.structure.datasets(filter_dataset_type="table")[self.dataset_path]
+
+    def meta_items(self):
+        from kart.base_dataset import MetaItemVisibility
+
+        dataset = self.dataset
+        # Hidden meta-items - such as generated primary keys - belong with the dataset, so they are imported too.
+        meta_items = dict(dataset.meta_items(min_visibility=MetaItemVisibility.HIDDEN))
+        if self.reusing_feature_blobs:
+            # Reused features may have been written with any of the dataset's legends, not just the current one.
+            meta_items.update(dataset.get_meta_items_matching(dataset.LEGEND))
+        return {**meta_items, **self.meta_overrides}
+
+    def attachment_items(self):
+        dataset = self.dataset
+        for obj in dataset.tree:
+            if obj.type_str == "blob" and obj.name not in dataset.ATTACHMENT_META_ITEMS:
+                yield obj.name, obj.data
+
+    def align_schema_to_existing_schema(self, existing_schema):
+        aligned_schema = existing_schema.align_to_self(self.schema)
+        self.meta_overrides["schema.json"] = aligned_schema.to_column_dicts()
+        assert self.schema == aligned_schema
+
+    @functools.lru_cache(maxsize=1)
+    def crs_definitions(self):
+        return self.dataset.crs_definitions()
+
+    def features(self):
+        return self.dataset.features()
+
+    @property
+    def feature_count(self):
+        return self.dataset.feature_count
+
+    def can_reuse_feature_blobs(self, new_dataset):
+        """
+        Returns True if the existing feature blobs can be imported into new_dataset as they are - that is, if the
+        features will be encoded with the same schema, and at the same paths, as they already are.
+        """
+        dataset = self.dataset
+        return (
+            type(new_dataset) is type(dataset)
+            and self.schema == dataset.schema
+            and new_dataset.feature_path_encoder.to_dict()
+            == dataset.feature_path_encoder.to_dict()
+        )
+
+    def feature_iter_with_reused_blobs(self, new_dataset, feature_ids=None):
+        """
+        Generator. Copies the feature objects to the repository of new_dataset, and then yields
+        (full_path, blob_oid_hex) for every feature - see can_reuse_feature_blobs.
+        """
+        assert feature_ids is None
+        feature_tree = self.dataset.feature_tree
+        if feature_tree is None:
+            return
+        self._copy_objects(feature_tree.id.hex, new_dataset.repo)
+        self.reusing_feature_blobs = True
+        feature_path_prefix = new_dataset.ensure_full_path(new_dataset.FEATURE_PATH)
+        for path, blob in find_blobs_with_paths_in_tree(feature_tree):
+            yield feature_path_prefix + path, blob.id.hex
+
+    def _copy_objects(self, tree_oid, dest_repo):
+        """Copies the given tree and everything it contains from this repository to dest_repo, as a single pack."""
+        if dest_repo.gitdir_path.resolve() == self.repo.gitdir_path.resolve():
+            return
+        env = tool_environment()
+        pack_objects = subprocess.Popen(
+            ["git", "-C", str(self.repo.gitdir_path), "pack-objects"]
+            + ["--revs", "--stdout", "-q"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+        )
+        index_pack = subprocess.Popen(
+            ["git", "-C", str(dest_repo.gitdir_path), "index-pack", "--stdin"],
+            stdin=pack_objects.stdout,
+            stdout=subprocess.DEVNULL,
+            env=env,
+        )
+        pack_objects.stdout.close()
+        pack_objects.stdin.write(f"{tree_oid}\n".encode("utf8"))
+        pack_objects.stdin.close()
+        pack_objects.wait()
+        index_pack.wait()
+        for p in (pack_objects, index_pack):
+            if p.returncode != 0:
+                raise SubprocessError(
+                    f"Error copying objects from {self.repo.workdir_path}: {p.args[3]} failed",
+                    exit_code=p.returncode,
+                )
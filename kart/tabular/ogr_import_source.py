@@ -16,11 +16,12 @@ from kart.exceptions import (
     NotFound,
     NotYetImplemented,
 )
-from kart.geometry import ogr_to_gpkg_geom
+from kart.geometry import ogr_to_gpkg_geom, wkbs_to_gpkg_geoms
 from kart.output_util import dump_json_output
 from kart.schema import ColumnSchema, Schema
 from kart.utils import chunk, ungenerator
 
+from .import_profile import active_import_profile
 from .import_source import TableImportSource
 
 # This defines what formats are allowed, as well as mapping
@@ -37,6 +38,21 @@ FORMAT_TO_OGR_MAP = {
 LOCAL_PATH_FORMATS = set(FORMAT_TO_OGR_MAP.keys()) - {"PG"}
 
 
+@functools.lru_cache(maxsize=1)
+def gdal_supports_arrow_batches():
+    """
+    True if this GDAL can read layers as batches of columns using Layer.GetArrowStreamAsNumPy
+    (which requires GDAL >= 3.6, and numpy).
+    """
+    if not hasattr(ogr.Layer, "GetArrowStreamAsNumPy"):
+        return False
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
 class OgrTableImportSource(TableImportSource):
     """
     Imports from an OGR source, currently from a whitelist of formats.
@@ -61,6 +77,20 @@ class OgrTableImportSource(TableImportSource):
 
     DEFAULT_GEOMETRY_COLUMN_NAME = "geom"
 
+    # Column types that read the same from an Arrow batch as they do from an OGR feature. Layers with any other
+    # type of column (eg timestamps, which OGR formats as strings but Arrow does not) are read a feature at a time.
+    ARROW_BATCH_DATA_TYPES = {
+        "blob",
+        "boolean",
+        "date",
+        "float",
+        "geometry",
+        "integer",
+        "numeric",
+        "text",
+    }
+    ARROW_BATCH_SIZE = 10_000
+
     @classmethod
     def _all_subclasses(cls):
         for sub in cls.__subclasses__():
@@ -234,10 +264,28 @@ class OgrTableImportSource(TableImportSource):
             meta_overrides=meta_overrides,
         )
 
+    def __getstate__(self):
+        # OGR datasources can't be pickled - the datasource is reopened when this source is unpickled.
+        state = super().__getstate__()
+        del state["ds"]
+        state.pop("_ogrlayer", None)
+        state["driver"] = self.driver.ShortName
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.ds = self._ogr_open(self.ogr_source, allowed_drivers=[self.driver])
+        self.driver = self.ds.GetDriver()
+
     @property
-    @functools.lru_cache(maxsize=1)
     def ogrlayer(self):
-        return self.ds.GetLayerByName(self.table)
+        # Cached per instance rather than with functools.lru_cache, which would share one cache entry between
+        # every instance - each instance can have a datasource of its own.
+        try:
+            return self._ogrlayer
+        except AttributeError:
+            self._ogrlayer = self.ds.GetLayerByName(self.table)
+            return self._ogrlayer
 
     def get_tables(self):
         """
@@ -375,8 +423,131 @@ class OgrTableImportSource(TableImportSource):
         l.ResetReading()
 
     def features(self):
+        profile = active_import_profile()
+        arrow_batches = self._arrow_batches()
+        if arrow_batches is not None:
+            batches, batch_keys = arrow_batches
+            to_kart_features = self._arrow_batch_to_kart_features
+            if profile:
+                batches = profile.timed_iter("read", batches)
+                to_kart_features = profile.timed("adapt", to_kart_features)
+            for batch in batches:
+                yield from to_kart_features(batch, batch_keys)
+            return
+
+        to_kart_feature = self._ogr_feature_to_kart_feature
+        if profile:
+            to_kart_feature = profile.timed("adapt", to_kart_feature)
         for ogr_feature in self._iter_ogr_features():
-            yield self._ogr_feature_to_kart_feature(ogr_feature)
+            yield to_kart_feature(ogr_feature)
+
+    def _can_read_arrow_batches(self):
+        if not gdal_supports_arrow_batches():
+            return False
+        ld = self.layer_defn
+        for i in range(ld.GetFieldCount()):
+            field_defn = ld.GetFieldDefn(i)
+            # Arrow returns these as float32s, rather than the doubles that OGR returns.
+            if field_defn.GetSubType() == ogr.OFSTFloat32:
+                return False
+            # GetArrowStreamAsNumPy returns plain numpy arrays for numbers, dates and booleans, without their
+            # validity bitmaps - so NULLs would be read as 0, 0.0, 1970-01-01 or False. Strings and blobs are
+            # returned as arrays of objects, with None for NULL.
+            if field_defn.IsNullable() and field_defn.GetType() not in (
+                ogr.OFTString,
+                ogr.OFTBinary,
+            ):
+                return False
+        return all(col.data_type in self.ARROW_BATCH_DATA_TYPES for col in self.schema)
+
+    def _arrow_batches(self):
+        """
+        Reads this layer as a stream of Arrow batches - each batch being a dict of numpy arrays, one per column -
+        which is much faster than creating an OGR feature per row. Returns a tuple (batches, batch_keys), where
+        batch_keys maps each column name to its key in each batch - or returns None if this layer can't be read
+        in batches, in which case features must be read one at a time.
+        """
+        if not self._can_read_arrow_batches():
+            return None
+
+        l = self.ogrlayer
+        l.ResetReading()
+        options = [
+            f"MAX_FEATURES_IN_BATCH={self.ARROW_BATCH_SIZE}",
+            "GEOMETRY_ENCODING=WKB",
+            f"INCLUDE_FID={'YES' if self.use_ogc_fid_as_pk else 'NO'}",
+        ]
+        try:
+            stream = iter(l.GetArrowStreamAsNumPy(options=options))
+            first_batch = next(stream, None)
+        except (RuntimeError, ImportError):
+            l.ResetReading()
+            return None
+
+        if first_batch is None:
+            return iter(()), {}
+        batch_keys = self._arrow_batch_keys(first_batch)
+        if batch_keys is None:
+            # The stream must be released before the layer can be read any other way.
+            del stream
+            l.ResetReading()
+            return None
+
+        def _batches():
+            try:
+                yield first_batch
+                yield from stream
+            finally:
+                l.ResetReading()
+
+        return _batches(), batch_keys
+
+    def _arrow_batch_keys(self, batch):
+        ld = self.layer_defn
+        field_names = {ld.GetFieldDefn(i).GetName() for i in range(ld.GetFieldCount())}
+        fid_key = None
+        if self.use_ogc_fid_as_pk:
+            fid_key = self.ogrlayer.GetFIDColumn() or "OGC_FID"
+        # The Arrow names of the geometry columns don't necessarily match our names for them, but they are in order.
+        geom_keys = [k for k in batch if k not in field_names and k != fid_key]
+        if len(geom_keys) != len(self.geometry_column_names):
+            return None
+
+        batch_keys = dict(zip(self.geometry_column_names, geom_keys))
+        for name in self.field_adapter_map:
+            if name == self.primary_key and self.use_ogc_fid_as_pk:
+                batch_keys[name] = fid_key
+            elif name not in batch_keys:
+                batch_keys[name] = name
+            if batch_keys[name] not in batch:
+                return None
+        return batch_keys
+
+    def _arrow_batch_to_kart_features(self, batch, batch_keys):
+        names = []
+        columns = []
+        for name, adapter in self.field_adapter_map.items():
+            # tolist() converts numpy values to the equivalent Python values. Only string and blob columns can contain
+            # None, since only layers where every other field is NOT NULL are read in batches.
+            values = batch[batch_keys[name]].tolist()
+            if name in self.geometry_column_names:
+                if adapter is ogr_util.adapt_ogr_geometry:
+                    values = wkbs_to_gpkg_geoms(values)
+                else:
+                    values = [
+                        adapter(ogr.CreateGeometryFromWkb(v)) if v is not None else None
+                        for v in values
+                    ]
+            elif adapter is ogr_util.ensure_str:
+                # Depending on the GDAL version, strings may be returned as bytes.
+                values = [
+                    v.decode("utf-8") if isinstance(v, bytes) else v for v in values
+                ]
+            else:
+                values = [adapter(v) for v in values]
+            names.append(name)
+            columns.append(values)
+        return [dict(zip(names, row)) for row in zip(*columns)]
 
     def _ogr_sql_quote_literal(self, x):
         # OGR follows normal SQL92 string literal quoting rules.
@@ -2,7 +2,10 @@ import pygit2
 
 from .v2 import TableV2
 from .v3 import TableV3
+from .generated_pks import GeneratedPks
+from .import_profile import active_import_profile
 from .import_source import TableImportSource
+from kart.exceptions import InvalidOperation, UNSUPPORTED_VERSION
 from kart.schema import Schema, ColumnSchema
 
 
@@ -27,7 +30,7 @@ class PkGeneratingTableImportSource(TableImportSource):
 
     >>> {primary key -> feature hash}
 
-    This is stored in $DATASET_PATH/meta/generated-pks.json, along with the column-schema of the new primary key::
+    The column-schema of the new primary key is stored in $DATASET_PATH/meta/generated-pks.json::
 
       {
         "primaryKeySchema": {
@@ -37,14 +40,19 @@ class PkGeneratingTableImportSource(TableImportSource):
           "primaryKeyIndex": 0,
           "size": 64
         },
-        "generatedPrimaryKeys": {
-          "1": "181e23cf3a3c5e74254707687c4be2b5b02dbf63",
-          "2": "021ac25fcf4dafc72053f84d2b87ec5662adcb83",
-          "3": "8e775122edbdd367c8d383fffeabf6580de485fd",
-          ...
-        }
+        "generatedPrimaryKeys": {"Generated primary keys are stored in meta/generated-pks/ - ...": ""},
+        "generatedPrimaryKeysVersion": 1,
+        "generatedPrimaryKeysCount": 12345
       }
 
+    The mapping itself is stored in a compact binary format in $DATASET_PATH/meta/generated-pks/, split into chunks
+    so that chunks which haven't changed since the last import are not rewritten - see GeneratedPks.
+    Older imports stored the mapping in generated-pks.json itself, as "generatedPrimaryKeys": {"1": "181e23cf...", ...}
+    - this is still read, but is rewritten in the newer format the next time the data is reimported. Versions of Kart
+    that only know the older format would fail with a KeyError if "generatedPrimaryKeys" was missing, so it is kept as
+    a placeholder whose only key can't be parsed as a primary key - they stop with a ValueError containing
+    LEGACY_READER_MESSAGE, rather than reimporting as if no primary keys had ever been generated.
+
     During a reimport, if similarity_detection_limit is set to some X > 0, and the import results in a number
     of inserts + deletes[1] that is less than X, then these inserts and deletes will be searched to see if we can
     find some inserts that are similar (not identical) to the deletes. These matching new features will be
@@ -61,6 +69,13 @@ class PkGeneratingTableImportSource(TableImportSource):
 
     GENERATED_PKS_ITEM = "generated-pks.json"
     GENERATED_PKS_PATH = "meta/" + GENERATED_PKS_ITEM
+    GENERATED_PKS_DIRNAME = "generated-pks"
+    GENERATED_PKS_DIR_PATH = "meta/" + GENERATED_PKS_DIRNAME
+    GENERATED_PKS_VERSION = 1
+    LEGACY_READER_MESSAGE = (
+        "Generated primary keys are stored in meta/generated-pks/ - "
+        "upgrade Kart to reimport this dataset"
+    )
 
     DEFAULT_PK_COL = {
         "id": ColumnSchema.new_id(),
@@ -107,7 +122,7 @@ class PkGeneratingTableImportSource(TableImportSource):
             self.prev_dest_schema = None
             self.pk_col = self.DEFAULT_PK_COL
             self.primary_key = self.pk_col["name"]
-            self.pk_to_hash = {}
+            self.pk_to_hash = GeneratedPks()
             self.first_new_pk = 1
 
             self.similarity_detection_limit = 0
@@ -124,14 +139,10 @@ class PkGeneratingTableImportSource(TableImportSource):
         self.primary_key = self.pk_col["name"]
 
         # The primary-key of an imported feature -> hash of feature contents, for every feature ever imported.
-        self.pk_to_hash = {
-            # JSON has string-keys - generated primary keys are integers.
-            int(pk): feature_hash
-            for pk, feature_hash in data["generatedPrimaryKeys"].items()
-        }
+        self.pk_to_hash = self._load_generated_pks(self.prev_dest_dataset, data)
 
         # First primary key to use if we can't find a historical but unassigned one.
-        self.first_new_pk = max(self.pk_to_hash) + 1 if self.pk_to_hash else 1
+        self.first_new_pk = self.pk_to_hash.max_pk + 1 if self.pk_to_hash else 1
 
         # The number of inserts, deletes, previous- and current-feature-count, are related by the given formula:
         # prev-FC + inserts - deletes = curr-FC
@@ -146,19 +157,39 @@ class PkGeneratingTableImportSource(TableImportSource):
                 max(self.similarity_detection_limit + feature_count_delta, 0) // 2
             )
 
+    def _load_generated_pks(self, dataset, data):
+        version = data.get("generatedPrimaryKeysVersion")
+        if version is None:
+            # Stored in the original JSON format.
+            return GeneratedPks.from_dict(data["generatedPrimaryKeys"])
+
+        if version != self.GENERATED_PKS_VERSION:
+            raise InvalidOperation(
+                f"Unsupported generated-pks version {version} in dataset {self.dest_path}. "
+                "Upgrade Kart to reimport this dataset.",
+                exit_code=UNSUPPORTED_VERSION,
+            )
+        try:
+            chunks_tree = dataset.meta_tree / self.GENERATED_PKS_DIRNAME
+        except KeyError:
+            return GeneratedPks()
+        return GeneratedPks.from_chunks(
+            memoryview(blob) for blob in sorted(chunks_tree, key=lambda b: b.name)
+        )
+
     def _prev_import_dest_tree(self):
         """Returns the dataset tree that was created the last time this datasource was imported."""
         if not self.repo.head_tree:
             return None
 
-        current_pks_blob = self._get_generated_pks_blob(self.repo.head_tree)
-        if current_pks_blob is None:
+        current_pks_oids = self._get_generated_pks_oids(self.repo.head_tree)
+        if current_pks_oids is None:
             return None
 
         prev_import_commit = None
         try:
             for commit in self.repo.walk(self.repo.head_commit.id):
-                if self._get_generated_pks_blob(commit) == current_pks_blob:
+                if self._get_generated_pks_oids(commit) == current_pks_oids:
                     prev_import_commit = commit
                 else:
                     # We've reached the commit before the previous import
@@ -172,27 +203,38 @@ class PkGeneratingTableImportSource(TableImportSource):
             # This means similarity detection works subtly differently.
             return self.repo.head_tree / self.dest_path
 
-    def _get_generated_pks_blob(self, commit_or_tree):
+    def _get_generated_pks_oids(self, commit_or_tree):
+        """
+        Returns the OIDs of generated-pks.json and of the generated-pks/ tree (or None if there is no such tree),
+        which together identify the generated primary key mapping of a particular import.
+        """
         root_tree = commit_or_tree.peel(pygit2.Tree)
         try:
             dataset = self.repo.dataset_class(
                 root_tree / self.dest_path, self.dest_path, self.repo
             )
-            return dataset.inner_tree / self.GENERATED_PKS_PATH
+            json_blob = dataset.inner_tree / self.GENERATED_PKS_PATH
         except KeyError:
             return None
+        try:
+            chunks_tree = dataset.inner_tree / self.GENERATED_PKS_DIR_PATH
+        except KeyError:
+            chunks_tree = None
+        return json_blob.id, chunks_tree.id if chunks_tree is not None else None
 
     def to_dict(self):
         return {
             "primaryKeySchema": self.pk_col,
-            "generatedPrimaryKeys": self.pk_to_hash,
+            "generatedPrimaryKeys": {self.LEGACY_READER_MESSAGE: ""},
+            "generatedPrimaryKeysVersion": self.GENERATED_PKS_VERSION,
+            "generatedPrimaryKeysCount": len(self.pk_to_hash),
         }
 
-    def _invert_pk_map(self, pk_to_hash):
-        result = {}
-        for pk, h in pk_to_hash.items():
-            result.setdefault(h, [])
-            result[h].append(pk)
+    def generated_pks_meta_items(self):
+        """Returns generated-pks.json and the chunks of the generated primary key mapping, as meta-items."""
+        result = {self.GENERATED_PKS_ITEM: self.to_dict()}
+        for name, data in self.pk_to_hash.to_chunks().items():
+            result[f"{self.GENERATED_PKS_DIRNAME}/{name}"] = data
         return result
 
     def _is_schema_similar_to_last_import(self):
@@ -205,13 +247,24 @@ class PkGeneratingTableImportSource(TableImportSource):
         return True
 
     def features(self):
+        profile = active_import_profile()
+        if profile is None:
+            return self._features_with_generated_pks(self.delegate.features())
+        return profile.timed_iter(
+            "generate-pks",
+            self._features_with_generated_pks(
+                profile.timed_iter("read", self.delegate.features())
+            ),
+        )
+
+    def _features_with_generated_pks(self, delegate_features):
         # Next primary key to use if we can't find a historical but unassigned one in hash_to_unassigned_pks.
         next_new_pk = self.first_new_pk
 
-        # Subset of hash_to_pks - only contains primary keys that have not yet been assigned during the current import.
-        # Meaning, if we need a primary key for a feature, we should first check this dict to find a historical one that
+        # Inverse of pk_to_hash - only contains primary keys that have not yet been assigned during the current import.
+        # Meaning, if we need a primary key for a feature, we should first check this index to find a historical one that
         # hasn't yet been assigned to a feature during this import, and reassign it to the current feature.
-        hash_to_unassigned_pks = self._invert_pk_map(self.pk_to_hash)
+        hash_to_unassigned_pks = self.pk_to_hash.unassigned_pks_index()
 
         # Features that we couldn't reassign PKs to - so far they are inserts, but if we can find some similar deletes
         # once we know the full list of inserts and deletes, then we can reassign PKs from the deletes, so that they
@@ -222,12 +275,11 @@ class PkGeneratingTableImportSource(TableImportSource):
         if not self._is_schema_similar_to_last_import():
             buffered_insert_limit = 0
 
-        for orig_feature in self.delegate.features():
+        for orig_feature in delegate_features:
             feature = {self.primary_key: None, **orig_feature}
             feature_hash = self.schema.hash_feature(feature, without_pk=True)
 
-            pks = hash_to_unassigned_pks.get(feature_hash)
-            reassigned_pk = pks.pop(0) if pks else None
+            reassigned_pk = hash_to_unassigned_pks.pop(feature_hash)
 
             if reassigned_pk is not None:
                 # This feature is exactly the same as a historical one that had a PK,
@@ -378,9 +430,7 @@ class PkGeneratingTableImportSource(TableImportSource):
         )
 
     def _find_deleted_features(self, hash_to_unassigned_pks):
-        unassigned_pks = set()
-        for pks in hash_to_unassigned_pks.values():
-            unassigned_pks.update(pks)
+        unassigned_pks = hash_to_unassigned_pks.unassigned_pks()
 
         filtered_dataset_class = {2: FilteredTableV2, 3: FilteredTableV3}[
             self.repo.table_dataset_version
@@ -394,6 +444,25 @@ class PkGeneratingTableImportSource(TableImportSource):
         )
         return list(filtered_ds.features())
 
+    def __getstate__(self):
+        # Repositories can't be pickled, and the generated primary keys can be reloaded rather than pickled - this
+        # is unpickled by reopening the repository and initialising it again. So, pickling is only supported before
+        # the import starts.
+        return {
+            "delegate": self.delegate,
+            "repo_path": str(self.repo.gitdir_path),
+            "similarity_detection_limit": self.similarity_detection_limit,
+        }
+
+    def __setstate__(self, state):
+        from kart.repo import KartRepo
+
+        self.__init__(
+            state["delegate"],
+            KartRepo(state["repo_path"], validate=False),
+            similarity_detection_limit=state["similarity_detection_limit"],
+        )
+
     def check_fully_specified(self):
         self.delegate.check_fully_specified()
 
@@ -410,6 +479,8 @@ class PkGeneratingTableImportSource(TableImportSource):
             return self._schema_with_pk.to_column_dicts()
         elif name == self.GENERATED_PKS_ITEM:
             return self.to_dict()
+        elif name.startswith(self.GENERATED_PKS_DIRNAME + "/"):
+            return self.generated_pks_meta_items().get(name)
         else:
             return self.delegate.get_meta_item(name, missing_ok=missing_ok)
 
@@ -417,7 +488,7 @@ class PkGeneratingTableImportSource(TableImportSource):
         return {
             **self.delegate.meta_items(),
             "schema.json": self._schema_with_pk.to_column_dicts(),
-            self.GENERATED_PKS_ITEM: self.to_dict(),
+            **self.generated_pks_meta_items(),
         }
 
     def align_schema_to_existing_schema(self, existing_schema):
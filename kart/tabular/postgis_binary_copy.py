@@ -0,0 +1,255 @@
+import decimal
+import queue
+import struct
+import threading
+
+import sqlalchemy
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.types import TEXT
+
+from kart.geometry import ewkb_to_gpkg_geom
+from kart.sqlalchemy.adapter.postgis import NumericType
+
+
+def _decode_bool(data):
+    return data[0] != 0
+
+
+def _decode_int(data):
+    return int.from_bytes(data, "big", signed=True)
+
+
+def _decode_float(data):
+    return struct.unpack(">d", data)[0]
+
+
+def _decode_text(data):
+    return data.decode("utf-8")
+
+
+def _decode_text_as_float(data):
+    return float(data.decode("utf-8"))
+
+
+def _decode_numeric(data, _numeric_type=NumericType()):
+    return _numeric_type.python_postread(decimal.Decimal(data.decode("utf-8")))
+
+
+def _decode_geometry(data):
+    return ewkb_to_gpkg_geom(data)
+
+
+class PostgisBinaryCopyReader:
+    """
+    Reads rows from a PostGIS table using COPY (SELECT ...) TO STDOUT (FORMAT binary), which is much faster than
+    fetching them through a cursor - the rows are sent in a compact binary form, and each field is decoded directly
+    into the value Kart expects, rather than being converted by psycopg2 and then again by the adapter's
+    ConverterTypes. Geometries arrive as EWKB - the binary form of the PostGIS geometry type - and are converted
+    straight to GPKG geometry.
+
+    Each column is selected in whichever form is quickest to decode while still giving exactly the same values as
+    reading through SQLAlchemy: most types are decoded from their binary form, but types where Kart reads a
+    particular text representation (dates, times, numerics, single-precision floats, etc) are selected as text.
+
+    psycopg2 only supports COPY by writing to a file-like object, so the COPY runs on a background thread which
+    parses the rows as they arrive and hands them over in batches - only a few batches are read ahead.
+    """
+
+    SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+    HEADER = struct.Struct(">11sii")
+    FIELD_COUNT = struct.Struct(">h")
+    FIELD_LENGTH = struct.Struct(">i")
+
+    BATCH_SIZE = 10000
+    READ_AHEAD_BATCHES = 4
+
+    def __init__(self, engine, schema, table_def):
+        self.engine = engine
+        self.schema = schema
+        self.table_def = table_def
+        self.column_names = [col.name for col in schema]
+        self._select_columns = []
+        self._decoders = []
+        for col in schema:
+            select_column, decoder = self._select_column_and_decoder(col)
+            self._select_columns.append(select_column)
+            self._decoders.append(decoder)
+
+    def _select_column_and_decoder(self, col):
+        column = self.table_def.c[col.name]
+        data_type = col.data_type
+        if data_type == "boolean":
+            return column, _decode_bool
+        elif data_type == "integer":
+            return column, _decode_int
+        elif data_type == "float":
+            if col.extra_type_info.get("size") == 32:
+                # Decoding the binary float4 would give a different value to the one psycopg2 parses from text.
+                return sqlalchemy.cast(column, TEXT), _decode_text_as_float
+            return column, _decode_float
+        elif data_type == "blob":
+            return column, bytes
+        elif data_type == "geometry":
+            return column, _decode_geometry
+        elif data_type == "numeric":
+            return sqlalchemy.cast(column, TEXT), _decode_numeric
+        elif data_type == "text":
+            return sqlalchemy.cast(column, TEXT), _decode_text
+        else:
+            # Dates, times, timestamps and intervals are already read as text by the adapter's ConverterTypes.
+            return column, _decode_text
+
+    def copy_sql(self, where=None, order_by=None):
+        query = sqlalchemy.select(*self._select_columns).select_from(self.table_def)
+        if where is not None:
+            query = query.where(where)
+        if order_by is not None:
+            query = query.order_by(order_by)
+        select_sql = query.compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+        return f"COPY ({select_sql}) TO STDOUT (FORMAT binary)"
+
+    def feature_batches(self, where=None, order_by=None, snapshot=None):
+        """
+        Generator. Yields lists of features - dicts of {column-name: value} - optionally filtered and ordered by
+        the given SQLAlchemy clauses. If snapshot is set, the rows are read from that exported snapshot - see
+        pg_export_snapshot().
+        """
+        copy_sql = self.copy_sql(where=where, order_by=order_by)
+        batches = queue.Queue(maxsize=self.READ_AHEAD_BATCHES)
+        stop = threading.Event()
+        end_of_rows = object()
+        parser = _BinaryCopyParser(self, batches, stop)
+
+        def _copy():
+            try:
+                with self.engine.connect() as conn:
+                    dbapi_conn = conn.connection
+                    dbapi_conn.set_client_encoding("UTF8")
+                    with dbapi_conn.cursor() as cursor:
+                        if snapshot is not None:
+                            # These must come before the first query of the transaction.
+                            cursor.execute(
+                                "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ"
+                            )
+                            cursor.execute("SET TRANSACTION SNAPSHOT %s", (snapshot,))
+                        cursor.copy_expert(copy_sql, parser)
+                parser.finish()
+                result = end_of_rows
+            except Exception as e:
+                result = e
+            try:
+                parser.put(result)
+            except _CopyStopped:
+                pass
+
+        thread = threading.Thread(target=_copy, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = batches.get()
+                if item is end_of_rows:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield [dict(zip(self.column_names, row)) for row in item]
+        finally:
+            stop.set()
+            thread.join()
+
+
+class _CopyStopped(Exception):
+    pass
+
+
+class _BinaryCopyParser:
+    """
+    File-like object that psycopg2 writes the output of a binary COPY to. Parses complete rows as they arrive,
+    and puts them in the given queue in batches.
+    """
+
+    def __init__(self, reader, batches, stop):
+        self.reader = reader
+        self.decoders = reader._decoders
+        self.batches = batches
+        self.stop = stop
+        self._buffer = bytearray()
+        self._header_read = False
+        self._rows = []
+
+    def put(self, item):
+        while not self.stop.is_set():
+            try:
+                self.batches.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+        raise _CopyStopped()
+
+    def write(self, data):
+        if self.stop.is_set():
+            # Raising here aborts the COPY.
+            raise _CopyStopped()
+        self._buffer += data
+        self._parse()
+        if len(self._rows) >= self.reader.BATCH_SIZE:
+            rows, self._rows = self._rows, []
+            self.put(rows)
+
+    def finish(self):
+        self._parse()
+        if self._buffer:
+            raise ValueError("Unexpected data at end of COPY")
+        if self._rows:
+            rows, self._rows = self._rows, []
+            self.put(rows)
+
+    def _parse(self):
+        buf = self._buffer
+        pos = 0
+        end = len(buf)
+        if not self._header_read:
+            if end < self.reader.HEADER.size:
+                return
+            signature, flags, extension_length = self.reader.HEADER.unpack_from(buf)
+            if signature != self.reader.SIGNATURE:
+                raise ValueError("Unexpected COPY format")
+            pos = self.reader.HEADER.size + extension_length
+            self._header_read = True
+
+        field_count_unpack = self.reader.FIELD_COUNT.unpack_from
+        field_length_unpack = self.reader.FIELD_LENGTH.unpack_from
+        decoders = self.decoders
+        rows = self._rows
+        while pos + 2 <= end:
+            (field_count,) = field_count_unpack(buf, pos)
+            if field_count == -1:
+                # End of COPY trailer.
+                pos += 2
+                break
+            p = pos + 2
+            fields = []
+            for i in range(field_count):
+                if p + 4 > end:
+                    break
+                (length,) = field_length_unpack(buf, p)
+                p += 4
+                if length == -1:
+                    fields.append(None)
+                    continue
+                if p + length > end:
+                    break
+                fields.append(bytes(buf[p : p + length]))
+                p += length
+            if len(fields) < field_count:
+                # This row hasn't fully arrived yet.
+                break
+            rows.append(
+                [
+                    decoder(data) if data is not None else None
+                    for decoder, data in zip(decoders, fields)
+                ]
+            )
+            pos = p
+        del buf[:pos]
@@ -5,7 +5,7 @@ import click
 from osgeo import osr
 
 from kart import crs_util
-from kart.diff_structs import Delta, DeltaDiff, DatasetDiff
+from kart.diff_structs import Delta, DeltaDiff, DatasetDiff, StreamingDeltaDiff
 from kart.exceptions import PATCH_DOES_NOT_APPLY, InvalidOperation, NotYetImplemented
 from kart.key_filters import DatasetKeyFilter, FeatureKeyFilter
 from kart.promisor_utils import fetch_promised_blobs, object_is_promised
@@ -30,7 +30,7 @@ class RichTableDataset(TableDataset):
 
     def features_plus_blobs(self):
         for blob in self.feature_blobs():
-            yield self.get_feature(path=blob.name, data=memoryview(blob)), blob
+            yield self.get_feature_from_blob(blob), blob
 
     def features_with_crs_ids(
         self, spatial_filter=SpatialFilter.MATCH_ALL, log_progress=False
@@ -162,15 +162,28 @@ class RichTableDataset(TableDataset):
                 f"Can't reproject dataset {self.path!r} into target CRS: {e}"
             )
 
-    def diff(self, other, ds_filter=DatasetKeyFilter.MATCH_ALL, reverse=False):
+    def diff(
+        self,
+        other,
+        ds_filter=DatasetKeyFilter.MATCH_ALL,
+        reverse=False,
+        *,
+        streaming=False,
+    ):
         """
         Generates a Diff from self -> other.
         If reverse is true, generates a diff from other -> self.
+        If streaming is true, the feature diff is a StreamingDeltaDiff.
         """
-        ds_diff = super().diff(other, ds_filter=ds_filter, reverse=reverse)
+        ds_diff = super().diff(
+            other, ds_filter=ds_filter, reverse=reverse, streaming=streaming
+        )
         feature_filter = ds_filter.get("feature", ds_filter.child_type())
-        ds_diff["feature"] = DeltaDiff(
-            self.diff_feature(other, feature_filter, reverse=reverse)
+        delta_diff_class = StreamingDeltaDiff if streaming else DeltaDiff
+        ds_diff["feature"] = delta_diff_class(
+            self.diff_feature(
+                other, feature_filter, reverse=reverse, streaming=streaming
+            )
         )
         return ds_diff
 
@@ -187,11 +200,17 @@ class RichTableDataset(TableDataset):
         return table_wc.diff_dataset_to_working_copy(self, ds_filter)
 
     def diff_feature(
-        self, other, feature_filter=FeatureKeyFilter.MATCH_ALL, reverse=False
+        self,
+        other,
+        feature_filter=FeatureKeyFilter.MATCH_ALL,
+        reverse=False,
+        *,
+        streaming=False,
     ):
         """
         Yields feature deltas from self -> other, but only for features that match the feature_filter.
         If reverse is true, yields feature deltas from other -> self.
+        If streaming is true, the deltas are yielded as the feature trees are walked - see diff_subtree.
         """
         yield from self.diff_subtree(
             other,
@@ -199,7 +218,9 @@ class RichTableDataset(TableDataset):
             key_filter=feature_filter,
             key_decoder_method="decode_path_to_1pk",
             value_decoder_method="get_feature_promise_from_path",
+            key_encoder_method="encode_filter_key_to_path",
             reverse=reverse,
+            streaming=streaming,
         )
 
     def get_feature_promise_from_path(self, feature_path):
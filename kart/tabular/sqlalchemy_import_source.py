@@ -1,6 +1,10 @@
+import contextlib
 import functools
 import os
+import queue
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import click
 
@@ -13,6 +17,7 @@ from kart.utils import chunk, ungenerator
 from sqlalchemy.orm import sessionmaker
 
 from .import_source import TableImportSource
+from .postgis_binary_copy import PostgisBinaryCopyReader
 
 
 class SqlAlchemyTableImportSource(TableImportSource):
@@ -23,6 +28,19 @@ class SqlAlchemyTableImportSource(TableImportSource):
 
     CURSOR_SIZE = 10000
 
+    # Large PostGIS tables with a single integer primary key are read in ranges of primary keys, several ranges at
+    # once, each over its own connection - databases can generally deliver more rows per second this way. Every
+    # connection reads from the same exported snapshot, so the import sees the table as it was at a single moment,
+    # just as a single query would - see _exported_snapshot. Other databases have no way of sharing a snapshot
+    # between connections, so their tables are always read with a single query.
+    READ_CONNECTIONS = 4
+    # The table is split into this many ranges per connection, so that one slow range doesn't hold up the others.
+    RANGES_PER_READ_CONNECTION = 4
+    # Tables with a smaller range of primary key values than this are read with a single query.
+    MIN_PK_RANGE_FOR_RANGE_READS = 100_000
+    # How many batches of CURSOR_SIZE rows each range can read ahead of the range that is currently being imported.
+    RANGE_READ_AHEAD_BATCHES = 4
+
     @classmethod
     def open(cls, spec, table=None):
         db_type = DbType.from_spec(spec)
@@ -61,7 +79,12 @@ class SqlAlchemyTableImportSource(TableImportSource):
 
         engine = db_type.class_.create_engine(connect_url)
         return SqlAlchemyTableImportSource(
-            spec, db_type=db_type, engine=engine, db_schema=db_schema, table=table
+            spec,
+            db_type=db_type,
+            engine=engine,
+            connect_url=connect_url,
+            db_schema=db_schema,
+            table=table,
         )
 
     @classmethod
@@ -81,6 +104,7 @@ class SqlAlchemyTableImportSource(TableImportSource):
         *,
         db_type,
         engine,
+        connect_url,
         db_schema,
         table,
         dest_path=None,
@@ -90,6 +114,8 @@ class SqlAlchemyTableImportSource(TableImportSource):
         self.db_type = db_type
         self.db_class = db_type.class_
         self.engine = engine
+        # The URL the engine was created from - so that the engine can be recreated when this source is unpickled.
+        self.connect_url = connect_url
 
         self.db_schema = db_schema
         self.table = table
@@ -99,6 +125,16 @@ class SqlAlchemyTableImportSource(TableImportSource):
             k: v for k, v in (meta_overrides or {}).items() if v is not None
         }
 
+    def __getstate__(self):
+        # Engines can't be pickled - a new engine is created when this source is unpickled.
+        state = super().__getstate__()
+        del state["engine"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.engine = self.db_class.create_engine(self.connect_url)
+
     @property
     def source_name(self):
         """Returns the container the user specified to find the table or table(s) inside."""
@@ -215,6 +251,7 @@ class SqlAlchemyTableImportSource(TableImportSource):
             self.original_spec,
             db_type=self.db_type,
             engine=self.engine,
+            connect_url=self.connect_url,
             db_schema=db_schema,
             table=table,
             dest_path=dest_path,
@@ -287,14 +324,175 @@ class SqlAlchemyTableImportSource(TableImportSource):
         table_def = self.db_type.adapter.table_def_for_schema(
             schema, db_schema=self.db_schema, table_name=self.table
         )
+
+        pk_ranges = None
+        if self._can_read_pk_ranges(schema):
+            with self._exported_snapshot() as (conn, snapshot):
+                pk_ranges = self._pk_ranges(conn, schema, table_def)
+                if pk_ranges:
+                    yield from self._features_in_pk_ranges(
+                        schema, table_def, pk_ranges, snapshot=snapshot
+                    )
+        if pk_ranges:
+            return
+
+        for batch in self._feature_batches(schema, table_def):
+            yield from batch
+
+    def _feature_batches(
+        self, schema, table_def, *, where=None, order_by=None, snapshot=None
+    ):
+        """
+        Generator. Yields lists of features read from the table, optionally filtered and ordered by the given
+        SQLAlchemy clauses, and optionally from the given exported snapshot (PostGIS only).
+        """
+        if self.db_type is DbType.POSTGIS:
+            reader = PostgisBinaryCopyReader(self.engine, schema, table_def)
+            yield from reader.feature_batches(
+                where=where, order_by=order_by, snapshot=snapshot
+            )
+            return
+
+        assert snapshot is None
+
         query = sqlalchemy.select(table_def.columns).select_from(table_def)
+        if where is not None:
+            query = query.where(where)
+        if order_by is not None:
+            query = query.order_by(order_by)
         with self.engine.connect() as conn:
             r = (
                 conn.execution_options(stream_results=True)
                 .execute(query)
                 .yield_per(self.CURSOR_SIZE)
             )
-            yield from self._resultset_as_dicts(r)
+            yield from chunk(self._resultset_as_dicts(r), self.CURSOR_SIZE)
+
+    def _can_read_pk_ranges(self, schema):
+        if self.db_type is not DbType.POSTGIS or self.READ_CONNECTIONS <= 1:
+            return False
+        pk_columns = schema.pk_columns
+        return len(pk_columns) == 1 and pk_columns[0].data_type == "integer"
+
+    @contextlib.contextmanager
+    def _exported_snapshot(self):
+        """
+        Contextmanager. Starts a REPEATABLE READ transaction and exports its snapshot, and yields (conn, snapshot_id).
+        Until the context exits, other transactions can import the snapshot, and so see exactly the same data as conn.
+        PostGIS only.
+        """
+        # The transaction is rolled back when the connection is returned to the pool.
+        with self.engine.connect() as conn:
+            conn.execute(
+                sqlalchemy.text("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            )
+            snapshot = conn.scalar(sqlalchemy.text("SELECT pg_export_snapshot()"))
+            yield conn, snapshot
+
+    def _pk_ranges(self, conn, schema, table_def):
+        """
+        Splits the table into ranges of primary key values - [(min_pk, max_pk), ...], with each min and max inclusive
+        - which can be read separately and concurrently, or returns None if the table should be read all at once.
+        The table is read using the given connection, which should be the one that exported the snapshot that the
+        ranges will be read from.
+        """
+        pk_col = table_def.c[schema.pk_columns[0].name]
+        query = sqlalchemy.select(
+            sqlalchemy.func.min(pk_col), sqlalchemy.func.max(pk_col)
+        ).select_from(table_def)
+        min_pk, max_pk = conn.execute(query).first()
+        if min_pk is None or max_pk - min_pk + 1 < self.MIN_PK_RANGE_FOR_RANGE_READS:
+            return None
+
+        num_ranges = self.READ_CONNECTIONS * self.RANGES_PER_READ_CONNECTION
+        range_size = max((max_pk - min_pk + 1) // num_ranges, 1)
+        result = []
+        start = min_pk
+        while start <= max_pk:
+            end = min(start + range_size - 1, max_pk)
+            if len(result) == num_ranges - 1:
+                end = max_pk
+            result.append((start, end))
+            start = end + 1
+        return result
+
+    def _features_in_pk_ranges(self, schema, table_def, pk_ranges, *, snapshot):
+        """
+        Generator. Reads each of the given primary key ranges over its own connection from the given exported
+        snapshot, several at once, and yields the features from each range in turn - so that features are yielded
+        in primary key order.
+        Each range can only read a few batches ahead of the range that is currently being yielded, so that memory
+        use is bounded no matter how quickly the database delivers rows.
+        """
+        pk_col = table_def.c[schema.pk_columns[0].name]
+        range_queues = [
+            queue.Queue(maxsize=self.RANGE_READ_AHEAD_BATCHES) for r in pk_ranges
+        ]
+        stop = threading.Event()
+        end_of_range = object()
+
+        def _put(range_queue, item):
+            while not stop.is_set():
+                try:
+                    range_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def _read_range(pk_range, range_queue):
+            if stop.is_set():
+                return
+            try:
+                for batch in self._feature_batches(
+                    schema,
+                    table_def,
+                    where=pk_col.between(*pk_range),
+                    order_by=pk_col,
+                    snapshot=snapshot,
+                ):
+                    if not _put(range_queue, batch):
+                        return
+                _put(range_queue, end_of_range)
+            except Exception as e:
+                _put(range_queue, e)
+
+        with ThreadPoolExecutor(max_workers=self.READ_CONNECTIONS) as executor:
+            try:
+                for pk_range, range_queue in zip(pk_ranges, range_queues):
+                    executor.submit(_read_range, pk_range, range_queue)
+                for range_queue in range_queues:
+                    while True:
+                        item = range_queue.get()
+                        if item is end_of_range:
+                            break
+                        if isinstance(item, Exception):
+                            raise item
+                        yield from item
+            finally:
+                # Stop any reads that are still running, if we didn't read everything (eg, the import failed).
+                stop.set()
+
+    def resumable_features(self, position=None):
+        # Where possible, resume from a primary key value rather than a row offset -
+        # that way, features that were already imported don't have to be read again.
+        schema = Schema.from_column_dicts(self.meta_items_from_db().get("schema.json"))
+        pk_columns = schema.pk_columns
+        if len(pk_columns) != 1 or pk_columns[0].data_type not in ("integer", "text"):
+            yield from super().resumable_features(position)
+            return
+
+        pk_name = pk_columns[0].name
+        table_def = self.db_type.adapter.table_def_for_schema(
+            schema, db_schema=self.db_schema, table_name=self.table
+        )
+        pk_col = table_def.c[pk_name]
+        where = pk_col > position if position is not None else None
+        for batch in self._feature_batches(
+            schema, table_def, where=where, order_by=pk_col
+        ):
+            for feature in batch:
+                yield feature[pk_name], feature
 
     def _resultset_as_dicts(self, resultset):
         for row in resultset:
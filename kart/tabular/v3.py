@@ -16,6 +16,7 @@ from kart.exceptions import (
     InvalidOperation,
     NotYetImplemented,
 )
+from kart.parsed_blob_cache import PARSED_BLOB_CACHE
 from kart.schema import Legend, Schema
 from kart.serialise_util import (
     b64decode_str,
@@ -24,9 +25,15 @@ from kart.serialise_util import (
     json_pack,
     json_unpack,
     msg_pack,
+    msg_pack_many,
     msg_unpack,
+    msg_unpack_many,
 )
+from kart.spatial_filter import SpatialFilter
+from kart.utils import chunk
+from .feature_cache import DECODED_FEATURE_CACHE
 from .v3_paths import PathEncoder
+from .v3_reimport import ReplacedFeatureComparer
 from .rich_table_dataset import RichTableDataset
 
 
@@ -48,6 +55,58 @@ class SchemaJsonFileType:
 SchemaJsonFileType.INSTANCE = SchemaJsonFileType()
 
 
+class ImportFeatureEncoder:
+    """
+    Encodes features the same way as TableV3.encode_feature, for a particular dataset path and schema.
+    Unlike a dataset, this doesn't hold a reference to the repo, so it can be pickled and sent to worker processes
+    - this lets an import encode features on more than one CPU at a time.
+    """
+
+    def __init__(self, feature_path_prefix, schema, path_encoder):
+        self.feature_path_prefix = feature_path_prefix
+        self.schema = schema
+        self.legend = schema.legend
+        self.legend_hash = schema.legend.hexhash()
+        self.path_encoder = path_encoder
+
+    def encode_feature(self, feature):
+        raw_dict = self.schema.feature_to_raw_dict(feature)
+        pk_values, non_pk_values = self.legend.raw_dict_to_value_tuples(raw_dict)
+        path = self.feature_path_prefix + self.path_encoder.encode_pks_to_path(
+            pk_values
+        )
+        return path, msg_pack([self.legend_hash, non_pk_values])
+
+    def encode_features(self, features):
+        """Returns a list of (path, data) tuples, one for each of the given features."""
+        feature_to_raw_dict = self.schema.feature_to_raw_dict
+        raw_dict_to_value_tuples = self.legend.raw_dict_to_value_tuples
+        encode_pks_to_path = self.path_encoder.encode_pks_to_path
+        legend_hash = self.legend_hash
+        paths = []
+        values = []
+        for feature in features:
+            pk_values, non_pk_values = raw_dict_to_value_tuples(
+                feature_to_raw_dict(feature)
+            )
+            paths.append(self.feature_path_prefix + encode_pks_to_path(pk_values))
+            values.append([legend_hash, non_pk_values])
+        return list(zip(paths, msg_pack_many(values)))
+
+    def encode_feature_profiled(self, feature, profile):
+        """Like encode_feature, but times each step of the encoding - see ImportProfile."""
+        with profile.stage("encode-values"):
+            raw_dict = self.schema.feature_to_raw_dict(feature)
+            pk_values, non_pk_values = self.legend.raw_dict_to_value_tuples(raw_dict)
+        with profile.stage("encode-path"):
+            path = self.feature_path_prefix + self.path_encoder.encode_pks_to_path(
+                pk_values
+            )
+        with profile.stage("encode-msgpack"):
+            data = msg_pack([self.legend_hash, non_pk_values])
+        return path, data
+
+
 class TableV3(RichTableDataset):
     """
     - Uses messagePack to serialise features.
@@ -96,6 +155,11 @@ class TableV3(RichTableDataset):
     GENERATED_PKS = MetaItemDefinition(
         "generated-pks.json", MetaItemFileType.JSON, MetaItemVisibility.HIDDEN
     )
+    GENERATED_PKS_CHUNK = MetaItemDefinition(
+        re.compile(r"generated-pks/(.*)"),
+        MetaItemFileType.BYTES,
+        MetaItemVisibility.HIDDEN,
+    )
     # How primary keys are converted to feature paths:
     PATH_STRUCTURE = MetaItemDefinition(
         "path-structure.json", MetaItemFileType.JSON, MetaItemVisibility.INTERNAL_ONLY
@@ -114,6 +178,7 @@ class TableV3(RichTableDataset):
         SCHEMA_JSON,
         BaseDataset.CRS_DEFINITIONS,
         GENERATED_PKS,
+        GENERATED_PKS_CHUNK,
         PATH_STRUCTURE,
         LEGEND,
     )
@@ -123,6 +188,9 @@ class TableV3(RichTableDataset):
     # designed after table.v3 don't do this.
     ATTACHMENT_META_ITEMS = ("metadata.xml",)
 
+    # How many feature blobs features_as_rows decodes at a time.
+    FEATURE_ROWS_BATCH_SIZE = 1000
+
     @functools.lru_cache()
     def get_meta_item(self, meta_item_path, missing_ok=True):
         # Handle meta-items stored in the attachment area:
@@ -136,6 +204,16 @@ class TableV3(RichTableDataset):
 
         return super().get_meta_item(meta_item_path, missing_ok=missing_ok)
 
+    @property
+    def schema(self):
+        if not hasattr(self, "_schema"):
+            blob = self.get_blob_at(self.SCHEMA_PATH, missing_ok=True)
+            if blob is not None:
+                self._schema = PARSED_BLOB_CACHE.get("schema", blob, Schema.loads)
+            else:
+                self._schema = super().schema
+        return self._schema
+
     @functools.lru_cache(maxsize=1)
     def crs_definitions(self):
         """Returns {identifier: definition} dict for all CRS definitions in this dataset."""
@@ -148,8 +226,8 @@ class TableV3(RichTableDataset):
     @functools.lru_cache()
     def get_legend(self, legend_hash):
         """Load the legend with the given hash from this dataset."""
-        path = self.LEGEND_PATH + legend_hash
-        return Legend.loads(self.get_data_at(path))
+        blob = self.get_blob_at(self.LEGEND_PATH + legend_hash)
+        return PARSED_BLOB_CACHE.get("legend", blob, Legend.loads)
 
     def encode_legend(self, legend):
         """
@@ -171,15 +249,27 @@ class TableV3(RichTableDataset):
         """
         return self.ensure_full_path(self.SCHEMA_PATH), schema.dumps()
 
-    def get_raw_feature_dict(self, pk_values=None, *, path=None, data=None):
+    def get_row_projection(self, legend_hash):
         """
-        Gets the feature with the given primary key(s) / at the given "full" path.
-        The result is a "raw" feature dict, values are keyed by column ID,
-        and contains exactly those values that are actually stored in the tree,
-        which might not be the same values that are now in the schema.
-        To get a feature consistent with the current schema, call get_feature.
+        Returns a function that converts the (pk_values, non_pk_values) of a feature stored with the given legend
+        into a tuple of values in this dataset's schema column order - see Schema.legend_projection.
+        """
+        result = self._row_projections.get(legend_hash)
+        if result is None:
+            result = self.schema.legend_projection(self.get_legend(legend_hash))
+            self._row_projections[legend_hash] = result
+        return result
+
+    @functools.cached_property
+    def _row_projections(self):
+        # Kept per instance, since the projection depends on this dataset's schema.
+        return {}
+
+    def _find_feature(self, pk_values=None, *, path=None, data=None):
+        """
+        Returns (pk_values, data) for the given feature - see get_raw_feature_dict for how the feature is specified.
+        If data wasn't supplied, it is the feature's blob.
         """
-
         # The caller must supply at least one of (pk_values, path) so we know which
         # feature is meant. We can infer whichever one is missing from the one supplied.
         # If the caller knows both already, they can supply both, to avoid redundant work.
@@ -197,22 +287,68 @@ class TableV3(RichTableDataset):
                 rel_path = self.ensure_rel_path(path)
             else:
                 rel_path = self.encode_pks_to_path(pk_values, relative=True)
-            data = self.get_data_at(rel_path, as_memoryview=True)
-        elif getattr(data, "type", None) == pygit2.GIT_OBJ_BLOB:
+            data = self.get_blob_at(rel_path)
+        return pk_values, data
+
+    def _get_feature_value_tuples(self, pk_values=None, *, path=None, data=None):
+        """
+        Gets the (legend_hash, pk_values, non_pk_values) stored for the given feature. See get_raw_feature_dict
+        for how the feature is specified.
+        """
+        pk_values, data = self._find_feature(pk_values, path=path, data=data)
+        if getattr(data, "type", None) == pygit2.GIT_OBJ_BLOB:
             # Data is a blob - open a memoryview on it.
             data = memoryview(data)
 
         legend_hash, non_pk_values = msg_unpack(data)
+        return legend_hash, pk_values, non_pk_values
+
+    def get_raw_feature_dict(self, pk_values=None, *, path=None, data=None):
+        """
+        Gets the feature with the given primary key(s) / at the given "full" path.
+        The result is a "raw" feature dict, values are keyed by column ID,
+        and contains exactly those values that are actually stored in the tree,
+        which might not be the same values that are now in the schema.
+        To get a feature consistent with the current schema, call get_feature.
+        """
+        legend_hash, pk_values, non_pk_values = self._get_feature_value_tuples(
+            pk_values, path=path, data=data
+        )
         legend = self.get_legend(legend_hash)
         return legend.value_tuples_to_raw_dict(pk_values, non_pk_values)
 
+    def get_feature_row(self, pk_values=None, *, path=None, data=None):
+        """
+        Like get_feature, but returns a tuple of the feature's values in schema column order, rather than a dict.
+        """
+        pk_values, data = self._find_feature(pk_values, path=path, data=data)
+        return self._decode_feature_row(pk_values, data)
+
+    def _decode_feature_row(self, pk_values, data):
+        is_blob = getattr(data, "type", None) == pygit2.GIT_OBJ_BLOB
+        # Only features supplied as blobs can be cached, since the cache is keyed by blob OID.
+        cache_key = None
+        if is_blob and DECODED_FEATURE_CACHE.enabled:
+            cache_key = (data.id, tuple(pk_values), self.schema)
+            row = DECODED_FEATURE_CACHE.get(cache_key)
+            if row is not None:
+                return row
+
+        if is_blob:
+            data = memoryview(data)
+        legend_hash, non_pk_values = msg_unpack(data)
+        row = self.get_row_projection(legend_hash)(pk_values, non_pk_values)
+        if cache_key is not None:
+            DECODED_FEATURE_CACHE.put(cache_key, row)
+        return row
+
     def get_feature(self, pk_values=None, *, path=None, data=None):
         """
         Gets the feature with the given primary key(s) / at the given "full" path.
         The result is a dict of values keyed by column name.
         """
-        raw_dict = self.get_raw_feature_dict(pk_values=pk_values, path=path, data=data)
-        return self.schema.feature_from_raw_dict(raw_dict)
+        row = self.get_feature_row(pk_values, path=path, data=data)
+        return dict(zip(self._column_names, row))
 
     def feature_blobs(self):
         """
@@ -222,6 +358,68 @@ class TableV3(RichTableDataset):
             return
         yield from find_blobs_in_tree(self.inner_tree / self.FEATURE_PATH)
 
+    @functools.cached_property
+    def _column_names(self):
+        return tuple(c.name for c in self.schema.columns)
+
+    def get_feature_from_blob(self, feature_blob):
+        # Same result as get_feature(path=feature_blob.name, data=feature_blob), but only builds one dict.
+        pk_values = self.decode_path_to_pks(feature_blob.name)
+        row = self._decode_feature_row(pk_values, feature_blob)
+        return dict(zip(self._column_names, row))
+
+    def feature_rows_from_blobs(self, feature_blobs):
+        """
+        Decodes the given feature blobs, and returns a list containing a tuple of values in schema column order for
+        each feature - see get_feature_row. Raises a KeyError if any of the blobs are missing (eg in a partial clone).
+        """
+        decode_path_to_pks = self.decode_path_to_pks
+        get_row_projection = self.get_row_projection
+        projections = {}
+        feature_blobs = list(feature_blobs)
+        unpacked = msg_unpack_many(memoryview(blob) for blob in feature_blobs)
+        result = []
+        for blob, (legend_hash, non_pk_values) in zip(feature_blobs, unpacked):
+            pk_values = decode_path_to_pks(blob.name)
+            project = projections.get(legend_hash)
+            if project is None:
+                project = projections[legend_hash] = get_row_projection(legend_hash)
+            result.append(project(pk_values, non_pk_values))
+        return result
+
+    def features_as_rows(self, spatial_filter=SpatialFilter.MATCH_ALL):
+        """
+        Like features(), but yields a tuple of values in schema column order for each feature, rather than a dict -
+        so zip(schema.columns, row) matches each value with its column. This is much cheaper than building dicts,
+        and so is better suited to reading whole datasets.
+        """
+        spatial_filter = spatial_filter.transform_for_dataset(self)
+        geom_index = None
+        if not spatial_filter.match_all and self.geom_column_name:
+            geom_index = self._column_names.index(self.geom_column_name)
+
+        for blobs in chunk(self.feature_blobs(), self.FEATURE_ROWS_BATCH_SIZE):
+            try:
+                rows = self.feature_rows_from_blobs(blobs)
+            except KeyError as e:
+                if not spatial_filter.feature_is_prefiltered(e):
+                    raise
+                # Some of these features aren't present - decode the ones that are, one at a time.
+                rows = []
+                for blob in blobs:
+                    try:
+                        rows += self.feature_rows_from_blobs([blob])
+                    except KeyError as e:
+                        if not spatial_filter.feature_is_prefiltered(e):
+                            raise
+
+            for row in rows:
+                if geom_index is not None:
+                    geometry = row[geom_index]
+                    if geometry is not None and not spatial_filter.matches(geometry):
+                        continue
+                yield row
+
     @property
     @functools.lru_cache(maxsize=1)
     def feature_path_encoder(self):
@@ -234,9 +432,15 @@ class TableV3(RichTableDataset):
             else:
                 return PathEncoder.GENERAL_ENCODER
         # Otherwise, load the path-structure meta-item.
-        path_structure = self.get_meta_item("path-structure.json", missing_ok=True)
-        if path_structure is not None:
-            return PathEncoder.get(**path_structure)
+        blob = self.get_blob_at(
+            self.PATH_STRUCTURE.path, missing_ok=True, from_tree=self.meta_tree
+        )
+        if blob is not None:
+            return PARSED_BLOB_CACHE.get(
+                "path-structure",
+                blob,
+                lambda data: PathEncoder.get(**json_unpack(data)),
+            )
         return PathEncoder.LEGACY_ENCODER
 
     def decode_path_to_pks(self, path):
@@ -291,6 +495,25 @@ class TableV3(RichTableDataset):
             raise ValueError(f"Expected a single pk value, got {pk_value}")
         return self.encode_pks_to_path((pk_value,), relative=relative)
 
+    def encode_filter_key_to_path(self, key):
+        """
+        Given a key from a feature key filter - a single pk value, which is generally the text the user supplied -
+        returns the relative path the feature would be found at. Raises a ValueError if this can't be worked out.
+        """
+        if len(self.schema.pk_columns) != 1:
+            # Keys for features with more than one pk value are joined by commas, which can be ambiguous.
+            raise ValueError(f"Can't encode {key!r}: expected a single pk column")
+        return self.encode_pks_to_path(self.schema.sanitise_pks(key), relative=True)
+
+    def import_feature_encoder(self, schema):
+        """
+        Returns an ImportFeatureEncoder that encodes features with the given schema into this dataset,
+        producing the same paths and data as encode_feature(feature, schema).
+        """
+        return ImportFeatureEncoder(
+            self.ensure_full_path(self.FEATURE_PATH), schema, self.feature_path_encoder
+        )
+
     def import_iter_meta_blobs(self, repo, source):
         # The source schema is a meta item.
         # The legend of said schema is not a meta item, but must also be written.
@@ -337,6 +560,17 @@ class TableV3(RichTableDataset):
                 blob.data,
             )
 
+    def import_feature_comparer(
+        self, replacing_dataset, schema, *, skip_unchanged=False
+    ):
+        """
+        Returns a ReplacedFeatureComparer that encodes features with the given schema into this dataset,
+        and finds which of them are unchanged from the features in replacing_dataset.
+        """
+        return ReplacedFeatureComparer(
+            self, replacing_dataset, schema, skip_unchanged=skip_unchanged
+        )
+
     def import_iter_feature_blobs(
         self, repo, resultset, source, replacing_dataset=None
     ):
@@ -355,34 +589,10 @@ class TableV3(RichTableDataset):
             # This optimisation is useful in the following situations:
             #  * a column was added but some values remain NULL (example above)
             #  * a column was dropped, and some rows have no other values changed
-            for feature in resultset:
-                try:
-                    pk_values = (feature[replacing_dataset.primary_key],)
-                    rel_path = self.encode_pks_to_path(
-                        pk_values, relative=True, schema=schema
-                    )
-                    existing_data = replacing_dataset.get_data_at(
-                        rel_path, as_memoryview=True
-                    )
-                except KeyError:
-                    # this feature isn't in the dataset we're replacing
-                    yield self.encode_feature(feature, schema)
-                    continue
-
-                existing_feature_raw_dict = replacing_dataset.get_raw_feature_dict(
-                    pk_values, data=existing_data
-                )
-                # This adapts the existing feature to the new schema
-                existing_feature = schema.feature_from_raw_dict(
-                    existing_feature_raw_dict
-                )
-                if existing_feature == feature:
-                    # Nothing changed? No need to rewrite the feature blob
-                    yield self.encode_pks_to_path(
-                        pk_values, schema=schema
-                    ), existing_data
-                else:
-                    yield self.encode_feature(feature, schema)
+            #
+            # Unchanged features are yielded as (path, existing_blob_oid) - see ReplacedFeatureComparer.
+            comparer = self.import_feature_comparer(replacing_dataset, schema)
+            yield from comparer.iter_feature_blobs(resultset)
         else:
             for feature in resultset:
                 yield self.encode_feature(feature, schema)
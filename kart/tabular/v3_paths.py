@@ -7,7 +7,7 @@ from collections import defaultdict
 import pygit2
 
 from kart.exceptions import NotYetImplemented
-from kart.serialise_util import b64encode_str, b64hash, hexhash, msg_pack
+from kart.serialise_util import b64encode_str, b64hash, hexhash, msg_pack_scalars
 from kart.utils import chunk
 
 L = logging.getLogger("kart.tabular.v3_paths")
@@ -157,7 +157,7 @@ class PathEncoder:
         return b64encode_str(packed_pk)
 
     def encode_filename(self, pk_values):
-        return self._encode_file_name_from_packed_pk(msg_pack(pk_values))
+        return self._encode_file_name_from_packed_pk(msg_pack_scalars(pk_values))
 
     def to_dict(self):
         return {
@@ -199,7 +199,7 @@ class MsgpackHashPathEncoder(PathEncoder):
         Given some pk values, returns the path the feature should be written to.
         pk_values should be a list or tuple of pk values.
         """
-        packed_pk = msg_pack(pk_values)
+        packed_pk = msg_pack_scalars(pk_values)
         pk_hash = self._hash(packed_pk)
 
         parts = [
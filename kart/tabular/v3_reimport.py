@@ -0,0 +1,149 @@
+import pygit2
+
+from kart.serialise_util import msg_pack, msg_unpack
+from kart.utils import chunk
+
+
+class ReplacedFeatureComparer:
+    """
+    During an import that replaces an existing dataset, finds the newly imported features that are unchanged from the
+    features at the same path in the dataset being replaced - even if the schema has changed in a compatible way
+    (ie, columns were added or removed, but the primary key is the same) - so that the existing blobs can be reused.
+
+    Rather than looking up and decoding each old feature as each new feature arrives, new features are handled in
+    batches. Each batch is sorted into tree order and grouped by the tree that would contain them, so that each old
+    tree is visited once per batch. The features are compared by blob OID, rather than by decoding the old feature:
+    - if the old blob has the same OID as the newly encoded feature, the feature is unchanged.
+    - otherwise, the old blob's values are rearranged to match the new legend (without building any dicts), and are
+      re-encoded and hashed - the feature is unchanged if this hash matches the newly encoded feature's OID.
+
+    If skip_unchanged is set, the import is building on top of the existing feature tree, rather than a cleared one -
+    so unchanged features need not be written at all. In this mode, the entries seen in each old tree are recorded,
+    so that once every new feature has been compared, the features which are no longer present can be deleted -
+    see iter_deleted_paths.
+    """
+
+    BATCH_SIZE = 10_000
+
+    def __init__(self, new_dataset, replacing_dataset, schema, *, skip_unchanged=False):
+        self.new_dataset = new_dataset
+        self.schema = schema
+        # Full path of the feature tree, without a trailing slash.
+        self.feature_path_prefix = new_dataset.ensure_full_path(
+            new_dataset.FEATURE_PATH
+        ).rstrip("/")
+        self.replacing_dataset = replacing_dataset
+        self.old_feature_tree = replacing_dataset.feature_tree
+        self.legend_hash = schema.legend.hexhash()
+        self.non_pk_columns = schema.legend.non_pk_columns
+        # Old legend hash -> for each new non-pk column, its index in the old legend's non-pk values (or None).
+        self._projections = {}
+        self.skip_unchanged = skip_unchanged
+        # Tree path -> bitmask of which entries of that old tree have been seen. Only used if skip_unchanged.
+        self._seen = {}
+
+    def _projection(self, old_legend_hash):
+        projection = self._projections.get(old_legend_hash)
+        if projection is None:
+            old_legend = self.replacing_dataset.get_legend(old_legend_hash)
+            old_indices = {c: i for i, c in enumerate(old_legend.non_pk_columns)}
+            projection = [old_indices.get(c) for c in self.non_pk_columns]
+            self._projections[old_legend_hash] = projection
+        return projection
+
+    def _reencoded_oid(self, old_blob):
+        """Returns the OID the old feature would have if it were encoded with the new legend."""
+        legend_hash, non_pk_values = msg_unpack(memoryview(old_blob))
+        if legend_hash == self.legend_hash:
+            return old_blob.id
+        non_pk_values = [
+            non_pk_values[i] if i is not None else None
+            for i in self._projection(legend_hash)
+        ]
+        return pygit2.hash(msg_pack([self.legend_hash, non_pk_values]))
+
+    def _old_tree(self, tree_path):
+        if self.old_feature_tree is None or not tree_path:
+            return self.old_feature_tree
+        try:
+            return self.old_feature_tree / tree_path
+        except KeyError:
+            return None
+
+    def compare_batch(self, encoded_features):
+        """
+        Given a list of (full_path, data) tuples for newly encoded features, returns a list of the same length
+        and order, where each unchanged feature is replaced by (full_path, old_blob_oid) - or by (full_path, None)
+        if skip_unchanged is set, since the old blob is already in place.
+        """
+        result = list(encoded_features)
+        prefix_len = len(self.feature_path_prefix) + 1
+
+        trees = {}
+        for i, (path, data) in enumerate(result):
+            tree_path, _, name = path[prefix_len:].rpartition("/")
+            trees.setdefault(tree_path, []).append((i, name))
+
+        for tree_path in sorted(trees):
+            old_tree = self._old_tree(tree_path)
+            if old_tree is None:
+                # None of these features are in the dataset we're replacing.
+                continue
+            old_entries = {obj.name: (j, obj) for j, obj in enumerate(old_tree)}
+            seen = self._seen.get(tree_path, 0)
+            for i, name in trees[tree_path]:
+                if name not in old_entries:
+                    continue
+                j, old_blob = old_entries[name]
+                seen |= 1 << j
+                path, data = result[i]
+                new_oid = pygit2.hash(data)
+                if old_blob.id != new_oid:
+                    try:
+                        reencoded_oid = self._reencoded_oid(old_blob)
+                    except KeyError:
+                        # Old feature is missing (eg, a partial clone) - just write the new one.
+                        continue
+                    if reencoded_oid != new_oid:
+                        continue
+                result[i] = (path, None if self.skip_unchanged else old_blob.id)
+            if self.skip_unchanged:
+                self._seen[tree_path] = seen
+
+        return result
+
+    def iter_feature_blobs(self, features):
+        """
+        Generator. Encodes the given features, yielding (full_path, data) for new and changed features,
+        and either (full_path, old_blob_oid) or (full_path, None) for unchanged features - see compare_batch.
+        """
+        for batch in chunk(features, self.BATCH_SIZE):
+            yield from self.compare_batch(
+                self.new_dataset.encode_feature(feature, self.schema)
+                for feature in batch
+            )
+
+    def iter_deleted_paths(self):
+        """
+        Generator. Only for use with skip_unchanged, once every new feature has been compared.
+        Yields the full path of every feature (or whole tree of features) in the dataset being replaced that has
+        no equivalent among the new features, and so should be deleted.
+        """
+        if self.old_feature_tree is None:
+            return
+        touched = set(self._seen)
+        for tree_path in self._seen:
+            parts = tree_path.split("/")
+            touched.update("/".join(parts[:i]) for i in range(1, len(parts)))
+        yield from self._iter_deleted_paths(self.old_feature_tree, "", touched)
+
+    def _iter_deleted_paths(self, tree, tree_path, touched):
+        seen = self._seen.get(tree_path, 0)
+        for j, obj in enumerate(tree):
+            if seen & (1 << j):
+                continue
+            child_path = f"{tree_path}/{obj.name}" if tree_path else obj.name
+            if obj.type_str == "tree" and child_path in touched:
+                yield from self._iter_deleted_paths(obj, child_path, touched)
+            else:
+                yield f"{self.feature_path_prefix}/{child_path}"
@@ -25,6 +25,8 @@ class TextDiffWriter(BaseDiffWriter):
     the complete old value and the complete new value.
     """
 
+    stream_feature_deltas = True
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fp = resolve_output_path(self.output_path)
@@ -1,3 +1,4 @@
+import collections
 import functools
 import itertools
 
@@ -34,3 +35,22 @@ def chunk(iterable, size):
         if not chunk:
             return
         yield chunk
+
+
+def bounded_ordered_map(executor, fn, iterable, max_pending):
+    """
+    Generator. Like executor.map(fn, iterable), except that at most <max_pending> calls are submitted at once,
+    so that iterable is consumed lazily rather than all up front. Results are yielded in the same order as iterable.
+    """
+    pending = collections.deque()
+    try:
+        for item in iterable:
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+            pending.append(executor.submit(fn, item))
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # The caller stopped early, or something went wrong - don't bother finishing the remaining work.
+        for future in pending:
+            future.cancel()
@@ -47,12 +47,16 @@ class MemoryTree:
 
 
 class MemoryBlob(bytes):
-    """Test-only implementation of pygit2.Blob. Supports self.data and memoryview(self)."""
+    """Test-only implementation of pygit2.Blob. Supports self.data, self.id and memoryview(self)."""
 
     @property
     def data(self):
         return self
 
+    @property
+    def id(self):
+        return pygit2.hash(self)
+
     @property
     def type_str(self):
         return "blob"
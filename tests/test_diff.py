@@ -1,16 +1,24 @@
 import functools
 import json
+import pickle
 import re
 import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any
 
 import html5lib
 import pytest
 
 import kart
-from kart.diff_structs import Delta, DeltaDiff
+from kart import diff_util
+from kart.dataset_mixins import DatasetDiffMixin
+from kart.diff_structs import Delta, DeltaDiff, StreamingDeltaDiff
 from kart.json_diff_writers import JsonLinesDiffWriter
+from kart.key_filters import FeatureKeyFilter
 from kart.geometry import hex_wkb_to_ogr
 from kart.repo import KartRepo
+from kart.tabular.v3 import TableV3
 
 
 H = pytest.helpers.helpers()
@@ -1321,6 +1329,126 @@ def test_diff_object_add_empty():
     assert null_diff + diff == diff
 
 
+def test_streaming_delta_diff(monkeypatch):
+    monkeypatch.setattr(StreamingDeltaDiff, "MAX_BUFFERED_DELTAS", 3)
+
+    # Small diffs are buffered in full, and sorted as usual.
+    diff = StreamingDeltaDiff(Delta.insert((pk, {"pk": pk})) for pk in (30, 10, 20))
+    assert not diff.is_streaming
+    assert [key for key, delta in diff.sorted_items()] == [10, 20, 30]
+    assert not StreamingDeltaDiff(iter(()))
+
+    # Larger diffs are output in the order they were found, and can only be output once.
+    diff = StreamingDeltaDiff(
+        Delta.insert((pk, {"pk": pk})) for pk in (30, 10, 20, 50, 40)
+    )
+    assert diff.is_streaming
+    assert diff
+    assert [key for key, delta in diff.sorted_items()] == [30, 10, 20, 50, 40]
+    with pytest.raises(RuntimeError):
+        list(diff.sorted_items())
+    with pytest.raises(NotImplementedError):
+        ~diff
+
+
+@pytest.mark.parametrize("output_format", ["text", "json-lines"])
+def test_diff_streaming(output_format, data_archive_readonly, cli_runner, monkeypatch):
+    with data_archive_readonly("points"):
+        args = ["diff", "HEAD^...HEAD", f"--output-format={output_format}"]
+        r = cli_runner.invoke(args)
+        assert r.exit_code == 0, r.stderr
+        buffered_output = r.stdout.splitlines()
+
+        # With only 2 deltas buffered, the other 3 are streamed straight from the repository to the output.
+        monkeypatch.setattr(StreamingDeltaDiff, "MAX_BUFFERED_DELTAS", 2)
+        r = cli_runner.invoke(args + ["--exit-code"])
+        assert r.exit_code == 1, r.stderr
+        streamed_output = r.stdout.splitlines()
+
+        # The same changes are output, but not necessarily in primary key order.
+        assert sorted(streamed_output) == sorted(buffered_output)
+        if output_format == "json-lines":
+            features = [json.loads(line) for line in streamed_output]
+            features = [f for f in features if f["type"] == "feature"]
+            assert len(features) == 5
+
+
+@dataclass
+class _DataclassKeyValue:
+    """KeyValue as it was before it used __slots__ - _cached_value was set lazily, in the instance __dict__."""
+
+    key: Any
+    value: Any
+
+    def get_lazy_value(self):
+        if not callable(self.value):
+            return self.value
+        if not hasattr(self, "_cached_value"):
+            self._cached_value = self.value()
+        return self._cached_value
+
+
+@dataclass
+class _DataclassDelta:
+    """Delta as it was before it used __slots__."""
+
+    old: _DataclassKeyValue
+    new: _DataclassKeyValue
+
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+        self.type = "update"
+        self.flags = 0
+
+    @property
+    def key(self):
+        return self.old.key
+
+
+def test_delta_diff_memory(benchmark):
+    # Run with --benchmark-enable to measure a 5M-feature diff - otherwise, a smaller diff is measured.
+    num_deltas = 100_000 if benchmark.disabled else 5_000_000
+    lazy_value = functools.partial(dict, pk=None)
+
+    def _build_diff():
+        diff = DeltaDiff()
+        for pk in range(num_deltas):
+            diff.add_delta(Delta.update((pk, lazy_value), (pk, lazy_value)))
+        return diff
+
+    def _bytes_per_delta(make_delta):
+        # DeltaDiff only accepts Deltas, so both kinds of delta are measured in a plain dict.
+        tracemalloc.start()
+        try:
+            deltas = {}
+            for pk in range(num_deltas):
+                delta = make_delta(pk)
+                deltas[delta.key] = delta
+            return tracemalloc.get_traced_memory()[0] / num_deltas
+        finally:
+            tracemalloc.stop()
+
+    bytes_per_delta = _bytes_per_delta(
+        lambda pk: Delta.update((pk, lazy_value), (pk, lazy_value))
+    )
+    dataclass_bytes_per_delta = _bytes_per_delta(
+        lambda pk: _DataclassDelta(
+            _DataclassKeyValue(pk, lazy_value), _DataclassKeyValue(pk, lazy_value)
+        )
+    )
+    benchmark.extra_info["bytes_per_delta"] = bytes_per_delta
+    benchmark.extra_info["dataclass_bytes_per_delta"] = dataclass_bytes_per_delta
+    benchmark.extra_info["total_mb"] = bytes_per_delta * num_deltas / 1024**2
+
+    # Absolute sizes vary between interpreters - __slots__ saves about half on Python 3.10, and about a quarter
+    # on 3.11 to 3.13, which store instance attributes inline until __dict__ is first accessed.
+    assert bytes_per_delta < 0.85 * dataclass_bytes_per_delta
+
+    benchmark.group = "test_delta_diff_memory"
+    benchmark.pedantic(_build_diff, rounds=1, iterations=1)
+
+
 # ID  R0  ->  R1  ->  R2
 # 1   a       a1      a
 # 2   b       b1      b1
@@ -1578,6 +1706,50 @@ def test_diff_filtered_text(data_archive_readonly, cli_runner):
         ]
 
 
+def test_diff_feature_key_filter_lookup(data_archive_readonly, monkeypatch):
+    with data_archive_readonly("points") as repo_path:
+        repo = KartRepo(repo_path)
+        old_ds = repo.datasets("HEAD^")[H.POINTS.LAYER]
+        new_ds = repo.datasets("HEAD")[H.POINTS.LAYER]
+
+        def _diff(*keys):
+            feature_filter = FeatureKeyFilter(keys)
+            return [
+                (key, delta.old_value, delta.new_value)
+                for key, delta in DeltaDiff(
+                    old_ds.diff_feature(new_ds, feature_filter)
+                ).sorted_items()
+            ]
+
+        with monkeypatch.context() as m:
+            m.setattr(DatasetDiffMixin, "TARGETED_DIFF_MAX_KEYS", 0)
+            full_diff = _diff("1182", "1", "999999")
+        assert [key for key, *_ in full_diff] == [1182]
+
+        # A few keys are looked up directly, rather than diffing the whole feature tree.
+        with monkeypatch.context() as m:
+            m.setattr(
+                DatasetDiffMixin,
+                "get_raw_diff_for_subtree",
+                lambda *args, **kwargs: pytest.fail("Diffed the whole feature tree"),
+            )
+            assert _diff("1182", "1", "999999") == full_diff
+            assert _diff("1") == []
+            assert _diff() == []
+
+        # Keys that aren't valid primary key values still need the whole tree to be diffed.
+        assert _diff("1182", "abc") == full_diff
+        assert _diff("abc") == []
+
+        # Reversed diffs are the same either way.
+        assert [
+            (key, delta.old_value, delta.new_value)
+            for key, delta in DeltaDiff(
+                new_ds.diff_feature(old_ds, FeatureKeyFilter(["1182"]), reverse=True)
+            ).sorted_items()
+        ] == full_diff
+
+
 def test_diff_wildcard_dataset_filters(data_archive, cli_runner):
     with data_archive("polygons") as repo_path:
         # Add another dataset at "second/dataset"
@@ -1789,6 +1961,25 @@ def test_create_patch(data_archive_readonly, cli_runner):
         }
 
 
+@pytest.mark.parametrize("patch_type,features_read", [("full", 10), ("minimal", 5)])
+def test_create_patch_reads_only_output_features(
+    patch_type, features_read, data_archive_readonly, cli_runner, monkeypatch
+):
+    # Minimal patches don't include the old version of updated features, so those shouldn't be read at all.
+    blobs_read = []
+    orig_get_feature_from_blob = TableV3.get_feature_from_blob
+
+    def _get_feature_from_blob(self, feature_blob):
+        blobs_read.append(feature_blob.id)
+        return orig_get_feature_from_blob(self, feature_blob)
+
+    monkeypatch.setattr(TableV3, "get_feature_from_blob", _get_feature_from_blob)
+    with data_archive_readonly("points"):
+        r = cli_runner.invoke(["create-patch", f"--patch-type={patch_type}", "HEAD"])
+        assert r.exit_code == 0, r.stderr
+        assert len(blobs_read) == features_read
+
+
 def test_show_shallow_clone(data_archive_readonly, cli_runner, tmp_path, chdir):
     # just checking you can 'show' the first commit of a shallow clone
     with data_archive_readonly("points") as original_path:
@@ -1928,3 +2119,55 @@ def test_diff_geojson_usage(data_archive, cli_runner, tmp_path):
             r.stderr.splitlines()[-1]
             == "Error: Invalid value for --output: Output path should be a directory for GeoJSON format."
         )
+
+
+@pytest.mark.parametrize("output_format", ["text", "json", "json-lines", "geojson"])
+def test_diff_num_processes(output_format, data_archive_readonly, cli_runner, tmp_path):
+    # au-census has two datasets, so they are diffed in two worker processes.
+    with data_archive_readonly("au-census"):
+        outputs = []
+        for num_processes in (1, 2):
+            output_path = tmp_path / f"{output_format}-{num_processes}"
+            r = cli_runner.invoke(
+                [
+                    "diff",
+                    "[EMPTY]...HEAD",
+                    f"--output-format={output_format}",
+                    f"--output={output_path}",
+                    f"--num-processes={num_processes}",
+                ]
+            )
+            assert r.exit_code == 0, r.stderr
+            if output_path.is_dir():
+                outputs.append(
+                    {p.name: p.read_text() for p in sorted(output_path.iterdir())}
+                )
+            else:
+                outputs.append(output_path.read_text())
+
+        # The datasets are output in the same order, with the same contents.
+        assert outputs[0] == outputs[1]
+
+
+def test_diff_detach_lazy_values(data_archive_readonly):
+    # Diffs are sent back from diff workers with blob IDs in place of the lazy values, which are then read as needed.
+    with data_archive_readonly("points") as repo_path:
+        repo = KartRepo(repo_path)
+        old = repo.datasets("HEAD^")[H.POINTS.LAYER]
+        new = repo.datasets("HEAD")[H.POINTS.LAYER]
+        expected = old.diff(new)["feature"]
+
+        ds_diff = old.diff(new)
+        diff_util._detach_lazy_values(ds_diff)
+        ds_diff = pickle.loads(pickle.dumps(ds_diff))
+        for delta in ds_diff["feature"].values():
+            for key_value in (delta.old, delta.new):
+                if key_value is not None:
+                    assert isinstance(key_value.value, diff_util._DetachedBlobValue)
+
+        diff_util._attach_lazy_values(ds_diff, repo, old, new)
+        feature_diff = ds_diff["feature"]
+        assert feature_diff.keys() == expected.keys()
+        for key, delta in feature_diff.items():
+            assert delta.old_value == expected[key].old_value
+            assert delta.new_value == expected[key].new_value
@@ -4,14 +4,23 @@ import pytest
 from osgeo import ogr, osr
 
 from kart.geometry import (
+    Geometry,
+    ewkb_to_gpkg_geom,
     gpkg_geom_to_hex_wkb,
     gpkg_geom_to_ogr,
+    gpkg_geom_to_wkb,
     hex_wkb_to_gpkg_geom,
+    is_normalised_gpkg_geom,
     normalise_gpkg_geom,
+    normalise_gpkg_geoms,
     ogr_to_gpkg_geom,
+    transform_gpkg_geoms,
+    wkb_envelope,
+    wkb_to_gpkg_geom,
     GPKG_ENVELOPE_NONE,
     GPKG_ENVELOPE_XY,
 )
+from kart.repo import KartRepo
 
 SRID_RE = re.compile(r"^SRID=(-?\d+);(.*)$")
 
@@ -232,3 +241,188 @@ def test_gpkg_wkb_gpkg_roundtrip(
     gpkg_geom = hex_wkb_to_gpkg_geom(hex_wkb_2)
 
     assert gpkg_geom == input
+
+
+@pytest.mark.parametrize(
+    "wkt",
+    ["POINT(1 2)", "POINT(1 2 3)", "LINESTRING(1 2,3 4)", "POLYGON((0 0,0 1,1 1,0 0))"],
+)
+def test_geometry_conversions(wkt):
+    geom = Geometry.from_wkt(wkt)
+    ogr_geom = ogr.CreateGeometryFromWkt(wkt)
+    assert (
+        bytes(geom.wkb_view()) == geom.to_wkb() == ogr_geom.ExportToIsoWkb(ogr.wkbNDR)
+    )
+    assert geom.to_hex_wkb() == geom.to_wkb().hex().upper()
+
+    assert geom.with_crs_id(0) is geom
+    geom_4326 = geom.with_crs_id(4326)
+    assert isinstance(geom_4326, Geometry)
+    assert geom_4326.crs_id == 4326
+    assert geom_4326.to_wkb() == geom.to_wkb()
+    assert normalise_gpkg_geom(geom_4326) == geom
+
+    assert Geometry.from_hex_ewkb(geom_4326.to_ewkb().hex()) == geom
+
+
+@pytest.mark.parametrize(
+    "wkt",
+    [
+        "POINT(1 2)",
+        "POINT Z(1 2 3)",
+        "POINT M(1 2 3)",
+        "POINT ZM(1 2 3 4)",
+        "LINESTRING(1 2,3 -4,5 6)",
+        "LINESTRING Z(1 2 3,3 -4 5)",
+        "POLYGON((0 0,0 1,1 1,0 0),(0.1 0.1,0.2 0.2,0.1 0.2,0.1 0.1))",
+        "MULTIPOINT((1 2),(-3 4))",
+        "MULTILINESTRING((1 2,3 4),(-5 6,7 -8))",
+        "MULTIPOLYGON Z(((0 0 1,0 1 2,1 1 3,0 0 1)),((5 5 -1,5 6 0,6 6 0,5 5 -1)))",
+        "GEOMETRYCOLLECTION(POINT(10 20),LINESTRING(1 2,3 4))",
+        # Long enough to be handled by numpy, where it is available.
+        "LINESTRING(" + ",".join(f"{i} {-i * 2}" for i in range(100)) + ")",
+    ],
+)
+def test_wkb_envelope(wkt):
+    geom = Geometry.from_wkt(wkt)
+    ogr_geom = ogr.CreateGeometryFromWkt(wkt)
+    expected_2d = ogr_geom.GetEnvelope()
+
+    assert wkb_envelope(geom.to_wkb(), only_2d=True) == expected_2d
+    assert geom.envelope(only_2d=True, calculate_if_missing=True) == expected_2d
+    assert wkb_envelope(geom, wkb_offset=geom.wkb_offset, only_2d=True) == expected_2d
+
+    if ogr_geom.Is3D():
+        assert wkb_envelope(geom.to_wkb())[:6] == ogr_geom.GetEnvelope3D()
+    # Big-endian WKB gives the same result.
+    assert wkb_envelope(ogr_geom.ExportToIsoWkb(ogr.wkbXDR)) == wkb_envelope(
+        geom.to_wkb()
+    )
+
+
+@pytest.mark.parametrize(
+    "wkt", ["POINT EMPTY", "LINESTRING EMPTY", "GEOMETRYCOLLECTION EMPTY"]
+)
+def test_wkb_envelope_empty(wkt):
+    ogr_geom = ogr.CreateGeometryFromWkt(wkt)
+    assert wkb_envelope(ogr_geom.ExportToIsoWkb(ogr.wkbNDR)) is None
+
+
+def test_transform_gpkg_geoms():
+    from kart.crs_util import make_crs
+
+    transform = osr.CoordinateTransformation(
+        make_crs("EPSG:4326"), make_crs("EPSG:2193")
+    )
+    wkts = [
+        "POINT(174.8 -41.3)",
+        "POINT Z(174.8 -41.3 10)",
+        "POINT M(174.8 -41.3 10)",
+        "LINESTRING(174.8 -41.3,175 -40)",
+        "MULTIPOLYGON(((174 -41,174 -40,175 -40,174 -41)),((170 -45,170 -44,171 -44,170 -45)))",
+        "POINT EMPTY",
+        "CIRCULARSTRING(174 -41,174.5 -40.5,175 -41)",
+    ]
+    geoms = [Geometry.from_wkt(wkt) for wkt in wkts] + [None]
+    result = transform_gpkg_geoms(geoms, transform)
+
+    assert len(result) == len(geoms)
+    # Curved geometries are left for the caller to reproject with OGR.
+    assert result[-2] is None
+    assert result[-1] is None
+
+    for wkt, geom in zip(wkts[:-1], result):
+        expected = ogr.CreateGeometryFromWkt(wkt)
+        expected.Transform(transform)
+        assert geom.to_wkb() == expected.ExportToIsoWkb(ogr.wkbNDR)
+        assert geom.is_empty() == expected.IsEmpty()
+
+
+@pytest.mark.parametrize(
+    "wkt",
+    [
+        "POINT(1 2)",
+        "POINT EMPTY",
+        "POINT ZM(1 2 3 4)",
+        "LINESTRING(1 2,3 -4,5 6)",
+        "LINESTRING EMPTY",
+        "POLYGON((0 0,0 1,1 1,0 0),(0.1 0.1,0.2 0.2,0.1 0.2,0.1 0.1))",
+        "POLYGON M((0 0 1,0 1 2,1 1 3,0 0 1))",
+        "MULTIPOLYGON Z(((0 0 1,0 1 2,1 1 3,0 0 1)),((5 5 -1,5 6 0,6 6 0,5 5 -1)))",
+        "GEOMETRYCOLLECTION(POINT(10 20),LINESTRING(1 2,3 4))",
+        "GEOMETRYCOLLECTION EMPTY",
+    ],
+)
+def test_wkb_conversions_without_ogr(wkt):
+    ogr_geom = ogr.CreateGeometryFromWkt(wkt)
+    expected = ogr_to_gpkg_geom(ogr_geom)
+
+    assert wkb_to_gpkg_geom(ogr_geom.ExportToIsoWkb(ogr.wkbNDR)) == expected
+    assert wkb_to_gpkg_geom(ogr_geom.ExportToIsoWkb(ogr.wkbXDR)) == expected
+    assert wkb_to_gpkg_geom(ogr_geom.ExportToWkb(ogr.wkbXDR)) == expected
+    assert ewkb_to_gpkg_geom(expected.with_crs_id(4326).to_ewkb()) == expected
+
+    big_endian = ogr_to_gpkg_geom(
+        ogr_geom,
+        _little_endian=False,
+        _little_endian_wkb=False,
+        _add_envelope_type=GPKG_ENVELOPE_NONE,
+    )
+    assert normalise_gpkg_geom(big_endian) == expected
+    assert gpkg_geom_to_wkb(big_endian) == ogr_geom.ExportToIsoWkb(ogr.wkbNDR)
+
+
+@pytest.mark.parametrize("impl", ["ogr", "struct"])
+def test_wkb_to_gpkg_geom_performance(impl, data_archive_readonly, benchmark):
+    with data_archive_readonly("polygons") as repo_path:
+        dataset = KartRepo(repo_path).datasets()["nz_waca_adjustments"]
+        wkbs = [f["geom"].to_wkb() for f in dataset.features()]
+
+    if impl == "ogr":
+
+        def _convert():
+            for wkb in wkbs:
+                ogr_to_gpkg_geom(ogr.CreateGeometryFromWkb(wkb))
+
+    else:
+
+        def _convert():
+            for wkb in wkbs:
+                wkb_to_gpkg_geom(wkb)
+
+    benchmark.group = "test_wkb_to_gpkg_geom_performance"
+    benchmark(_convert)
+
+
+@pytest.mark.parametrize(
+    "wkt",
+    [
+        "POINT(1 2)",
+        "POINT EMPTY",
+        "LINESTRING(1 2,3 4)",
+        "POLYGON Z((0 0 1,0 1 2,1 1 3,0 0 1))",
+        "POLYGON M((0 0 1,0 1 2,1 1 3,0 0 1))",
+    ],
+)
+def test_normalise_gpkg_geoms(wkt):
+    ogr_geom = ogr.CreateGeometryFromWkt(wkt)
+    normalised = ogr_to_gpkg_geom(ogr_geom)
+    assert is_normalised_gpkg_geom(normalised)
+    assert normalise_gpkg_geom(normalised) is normalised
+
+    not_normalised = [
+        normalised.with_crs_id(4326),
+        ogr_to_gpkg_geom(ogr_geom, _little_endian=False),
+        ogr_to_gpkg_geom(ogr_geom, _little_endian_wkb=False),
+    ]
+    if not ogr_geom.IsEmpty():
+        other_envelope = GPKG_ENVELOPE_XY if normalised.envelope_type == 0 else 0
+        not_normalised.append(
+            ogr_to_gpkg_geom(ogr_geom, _add_envelope_type=other_envelope)
+        )
+
+    assert not any(is_normalised_gpkg_geom(g) for g in not_normalised)
+    assert normalise_gpkg_geoms([normalised, None, *not_normalised]) == [
+        normalised,
+        None,
+    ] + [normalised] * len(not_normalised)
@@ -410,6 +410,266 @@ def test_import_replace_existing_with_column_renames(
             assert new_feature_tree == old_feature_tree
 
 
+def test_import_replace_existing_with_schema_and_feature_changes(
+    data_archive,
+    tmp_path,
+    cli_runner,
+    chdir,
+):
+    with data_archive("gpkg-polygons") as data:
+        repo_path = tmp_path / "emptydir"
+        r = cli_runner.invoke(["init", repo_path])
+        assert r.exit_code == 0
+        with chdir(repo_path):
+            r = cli_runner.invoke(
+                [
+                    "import",
+                    data / "nz-waca-adjustments.gpkg",
+                    "nz_waca_adjustments:mytable",
+                ]
+            )
+            assert r.exit_code == 0, r.stderr
+
+            # Add a new column, and change a couple of features.
+            with Db_GPKG.create_engine(
+                data / "nz-waca-adjustments.gpkg"
+            ).connect() as conn:
+                conn.execute(
+                    """ALTER TABLE "nz_waca_adjustments" ADD COLUMN "newcolumn" TEXT;"""
+                )
+                conn.execute(
+                    """UPDATE "nz_waca_adjustments" SET "newcolumn" = 'new' WHERE id = 1424927;"""
+                )
+                conn.execute(
+                    """UPDATE "nz_waca_adjustments" SET "adjusted_nodes" = 99 WHERE id = 1443053;"""
+                )
+
+            r = cli_runner.invoke(
+                [
+                    "import",
+                    "--replace-existing",
+                    data / "nz-waca-adjustments.gpkg",
+                    "nz_waca_adjustments:mytable",
+                ]
+            )
+            assert r.exit_code == 0, r.stderr
+            r = cli_runner.invoke(["show", "-o", "json"])
+            assert r.exit_code == 0, r.stderr
+            diff = json.loads(r.stdout)["kart.diff/v1+hexwkb"]["mytable"]
+
+            # Only the changed features are rewritten.
+            assert diff["meta"]["schema.json"]
+            assert sorted(d["+"]["id"] for d in diff["feature"]) == [1424927, 1443053]
+
+
+def test_import_replace_existing_skips_unchanged_features(
+    data_archive,
+    tmp_path,
+    cli_runner,
+    chdir,
+):
+    with data_archive("gpkg-polygons") as data:
+        repo_path = tmp_path / "emptydir"
+        r = cli_runner.invoke(["init", repo_path])
+        assert r.exit_code == 0
+        with chdir(repo_path):
+            r = cli_runner.invoke(
+                [
+                    "import",
+                    data / "nz-waca-adjustments.gpkg",
+                    "nz_waca_adjustments:mytable",
+                ]
+            )
+            assert r.exit_code == 0, r.stderr
+
+            # Update, delete and insert a feature.
+            with Db_GPKG.create_engine(
+                data / "nz-waca-adjustments.gpkg"
+            ).connect() as conn:
+                conn.execute(
+                    """UPDATE "nz_waca_adjustments" SET "adjusted_nodes" = 99 WHERE id = 1424927;"""
+                )
+                conn.execute(
+                    """DELETE FROM "nz_waca_adjustments" WHERE id = 1443053;"""
+                )
+                conn.execute(
+                    """
+                    INSERT INTO "nz_waca_adjustments" (id, geom, date_adjusted, survey_reference, adjusted_nodes)
+                        SELECT 9999999, geom, date_adjusted, survey_reference, adjusted_nodes
+                        FROM "nz_waca_adjustments" WHERE id = 1424927;
+                    """
+                )
+
+            r = cli_runner.invoke(
+                [
+                    "import",
+                    "--replace-existing",
+                    data / "nz-waca-adjustments.gpkg",
+                    "nz_waca_adjustments:mytable",
+                ]
+            )
+            assert r.exit_code == 0, r.stderr
+            r = cli_runner.invoke(["show", "-o", "json"])
+            assert r.exit_code == 0, r.stderr
+            diff = json.loads(r.stdout)["kart.diff/v1+hexwkb"]["mytable"]
+
+            assert not diff.get("meta")
+            changes = {
+                (d.get("-", {}).get("id"), d.get("+", {}).get("id"))
+                for d in diff["feature"]
+            }
+            assert changes == {
+                (1424927, 1424927),
+                (1443053, None),
+                (None, 9999999),
+            }
+
+            # The result is the same as importing the new data from scratch.
+            repo = KartRepo(repo_path)
+            r = cli_runner.invoke(
+                [
+                    "import",
+                    "--no-checkout",
+                    data / "nz-waca-adjustments.gpkg",
+                    "nz_waca_adjustments:scratch",
+                ]
+            )
+            assert r.exit_code == 0, r.stderr
+            head_tree = repo.structure("HEAD").tree
+            assert (
+                head_tree / "mytable/.table-dataset/feature"
+                == head_tree / "scratch/.table-dataset/feature"
+            )
+
+
+def test_import_profile(data_archive, tmp_path, cli_runner, chdir):
+    with data_archive("gpkg-polygons") as data:
+        repo_path = tmp_path / "emptydir"
+        r = cli_runner.invoke(["init", repo_path])
+        assert r.exit_code == 0
+        profile_path = tmp_path / "profile.json"
+        with chdir(repo_path):
+            r = cli_runner.invoke(
+                [
+                    "import",
+                    f"--profile={profile_path}",
+                    data / "nz-waca-adjustments.gpkg",
+                    "nz_waca_adjustments:mytable",
+                ]
+            )
+            assert r.exit_code == 0, r.stderr
+
+        profile = json.loads(profile_path.read_text())
+        assert profile["features"] == H.POLYGONS.ROWCOUNT
+        assert {"read", "encode-path", "encode-msgpack", "write", "write-meta"} <= set(
+            profile["stages"]
+        )
+        feature_sizes = profile["blobSizes"]["feature"]
+        assert feature_sizes["count"] == H.POLYGONS.ROWCOUNT
+        assert sum(feature_sizes["histogram"].values()) == H.POLYGONS.ROWCOUNT
+
+
+def test_import_profile_concurrent_sources(data_archive, tmp_path, cli_runner, chdir):
+    with data_archive("gpkg-polygons") as data:
+        repo_path = tmp_path / "emptydir"
+        r = cli_runner.invoke(["init", repo_path])
+        assert r.exit_code == 0
+        profile_path = tmp_path / "profile.json"
+        with chdir(repo_path):
+            r = cli_runner.invoke(
+                [
+                    "import",
+                    f"--profile={profile_path}",
+                    "--max-concurrent-sources=2",
+                    data / "nz-waca-adjustments.gpkg",
+                    "nz_waca_adjustments:first",
+                    "nz_waca_adjustments:second",
+                ]
+            )
+            assert r.exit_code == 0, r.stderr
+
+        # Each source is imported by a worker process, which sends its profile back to be combined.
+        profile = json.loads(profile_path.read_text())
+        assert profile["features"] == 2 * H.POLYGONS.ROWCOUNT
+        assert {"read", "encode-path", "encode-msgpack", "write"} <= set(
+            profile["stages"]
+        )
+        assert profile["blobSizes"]["feature"]["count"] == 2 * H.POLYGONS.ROWCOUNT
+
+
+def test_import_optimise(data_archive, tmp_path, cli_runner, chdir):
+    with data_archive("gpkg-polygons") as data:
+        repo_path = tmp_path / "emptydir"
+        r = cli_runner.invoke(["init", repo_path])
+        assert r.exit_code == 0
+        profile_path = tmp_path / "profile.json"
+        with chdir(repo_path):
+            r = cli_runner.invoke(
+                [
+                    "import",
+                    "--optimise",
+                    f"--profile={profile_path}",
+                    data / "nz-waca-adjustments.gpkg",
+                    "nz_waca_adjustments:mytable",
+                ]
+            )
+            assert r.exit_code == 0, r.stderr
+            assert "Optimised repository" in r.stdout
+
+        pack_dir = repo_path / ".kart" / "objects" / "pack"
+        assert len(list(pack_dir.glob("*.pack"))) == 1
+        assert len(list(pack_dir.glob("*.bitmap"))) == 1
+        assert (pack_dir / "multi-pack-index").exists()
+        assert (repo_path / ".kart" / "objects" / "info" / "commit-graph").exists()
+
+        profile = json.loads(profile_path.read_text())
+        assert "optimise-repo" in profile["stages"]
+        assert set(profile["repoOptimisation"]) == {
+            "sizeBefore",
+            "sizeAfter",
+            "seconds",
+        }
+
+
+def test_import_from_kart_repo(data_archive, tmp_path, cli_runner, chdir):
+    with data_archive("polygons") as source_repo_path:
+        source_repo = KartRepo(source_repo_path)
+        source_ds = source_repo.datasets()[H.POLYGONS.LAYER]
+
+        repo_path = tmp_path / "emptydir"
+        r = cli_runner.invoke(["init", repo_path])
+        assert r.exit_code == 0
+        with chdir(repo_path):
+            r = cli_runner.invoke(["import", "--list", f"kart:{source_repo_path}"])
+            assert r.exit_code == 0, r.stderr
+            assert H.POLYGONS.LAYER in r.stdout
+
+            r = cli_runner.invoke(
+                [
+                    "import",
+                    f"kart:{source_repo_path}@HEAD:{H.POLYGONS.LAYER}",
+                ]
+            )
+            assert r.exit_code == 0, r.stderr
+            r = cli_runner.invoke(
+                [
+                    "import",
+                    f"kart:{source_repo_path}",
+                    f"{H.POLYGONS.LAYER}:renamed",
+                ]
+            )
+            assert r.exit_code == 0, r.stderr
+
+        repo = KartRepo(repo_path)
+        for ds_path in (H.POLYGONS.LAYER, "renamed"):
+            ds = repo.datasets()[ds_path]
+            assert ds.feature_count == H.POLYGONS.ROWCOUNT
+            assert ds.schema == source_ds.schema
+            # The feature blobs were reused as they are, so the feature tree is identical.
+            assert ds.feature_tree.id == source_ds.feature_tree.id
+            assert ds.get_feature([1424927]) == source_ds.get_feature([1424927])
+
+
 def test_import_replace_ids(
     data_archive,
     tmp_path,
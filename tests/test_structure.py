@@ -1,14 +1,17 @@
 import contextlib
 import itertools
+import json
 import os
 from pathlib import Path
+import pickle
 import re
 import subprocess
 
-from osgeo import gdal
+from osgeo import gdal, ogr
 
 import pygit2
 import pytest
+import sqlalchemy
 
 from memory_repo import MemoryRepo
 
@@ -20,9 +23,14 @@ from kart.sqlalchemy.gpkg import Db_GPKG
 from kart.schema import Schema
 from kart.geometry import ogr_to_gpkg_geom, gpkg_geom_to_ogr
 from kart.tabular.import_source import TableImportSource
-from kart.tabular.ogr_import_source import postgres_url_to_ogr_conn_str
+from kart.tabular.ogr_import_source import (
+    gdal_supports_arrow_batches,
+    postgres_url_to_ogr_conn_str,
+)
+from kart.tabular.generated_pks import GeneratedPks
 from kart.tabular.pk_generation import PkGeneratingTableImportSource
-from kart.repo import KartRepo
+from kart.tabular.postgis_binary_copy import PostgisBinaryCopyReader
+from kart.repo import KartRepo, KartRepoFiles
 
 
 H = pytest.helpers.helpers()
@@ -401,6 +409,77 @@ def postgis_layer(postgis_db, data_archive):
     return _postgis_layer
 
 
+def test_postgis_import_source_reads_pk_ranges(postgis_db, postgis_layer):
+    with postgis_layer(
+        "gpkg-polygons", "nz-waca-adjustments.gpkg", "nz_waca_adjustments"
+    ):
+        source = TableImportSource.open(
+            os.environ["KART_POSTGRES_URL"], table="nz_waca_adjustments"
+        )
+        source = source.clone_for_table("nz_waca_adjustments")
+        single_query_features = sorted(source.features(), key=lambda f: f["id"])
+
+        source.MIN_PK_RANGE_FOR_RANGE_READS = 0
+        source.CURSOR_SIZE = 10
+        schema = source.schema
+        table_def = source.db_type.adapter.table_def_for_schema(
+            schema, db_schema=source.db_schema, table_name=source.table
+        )
+        with source._exported_snapshot() as (conn, snapshot):
+            pk_ranges = source._pk_ranges(conn, schema, table_def)
+            assert len(pk_ranges) == 16
+
+            # Rows deleted after the snapshot was exported are still read from it.
+            with postgis_db.connect() as other_conn:
+                other_conn.execute("""DELETE FROM nz_waca_adjustments;""")
+            snapshot_features = list(
+                source._features_in_pk_ranges(
+                    schema, table_def, pk_ranges, snapshot=snapshot
+                )
+            )
+        assert snapshot_features == single_query_features
+        assert list(source.features()) == []
+
+
+@pytest.mark.parametrize(
+    "archive,gpkg,table",
+    [
+        ("gpkg-polygons", "nz-waca-adjustments.gpkg", "nz_waca_adjustments"),
+        ("gpkg-types", "types.gpkg", "types"),
+    ],
+)
+def test_postgis_import_source_binary_copy(
+    archive, gpkg, table, postgis_db, postgis_layer
+):
+    with postgis_layer(archive, gpkg, table):
+        source = TableImportSource.open(os.environ["KART_POSTGRES_URL"], table=table)
+        source = source.clone_for_table(table)
+        schema = source.schema
+        table_def = source.db_type.adapter.table_def_for_schema(
+            schema, db_schema=source.db_schema, table_name=source.table
+        )
+        pk_col = table_def.c[schema.pk_columns[0].name]
+        with source.engine.connect() as conn:
+            r = conn.execute(
+                sqlalchemy.select(table_def.columns)
+                .select_from(table_def)
+                .order_by(pk_col)
+            )
+            cursor_features = list(source._resultset_as_dicts(r))
+
+        reader = PostgisBinaryCopyReader(source.engine, schema, table_def)
+        reader.BATCH_SIZE = 7
+        copy_features = [
+            feature
+            for batch in reader.feature_batches(order_by=pk_col)
+            for feature in batch
+        ]
+
+        # Binary COPY gives exactly the same values as reading through a cursor.
+        assert len(copy_features) == len(cursor_features) > 0
+        assert copy_features == cursor_features
+
+
 def test_postgres_preserves_float_precision(postgis_db):
     with postgis_db.connect() as conn:
         val = conn.scalar("SHOW extra_float_digits")
@@ -693,6 +772,62 @@ def test_generated_pk_feature_matching_performance(data_archive_readonly, benchm
         benchmark(_match_features_benchmark)
 
 
+def test_generated_pks_storage():
+    hashes = [pygit2.hash(str(i % 10).encode()).hex for i in range(200_000)]
+    legacy_json = {str(pk): hashes[pk] for pk in range(1, 200_000, 3)}
+
+    generated_pks = GeneratedPks.from_dict(legacy_json)
+    assert len(generated_pks) == len(legacy_json)
+    assert generated_pks.max_pk == 199_999
+    assert generated_pks.to_dict() == {int(k): v for k, v in legacy_json.items()}
+
+    chunks = generated_pks.to_chunks()
+    assert sorted(chunks) == ["00000000", "00000001", "00000002", "00000003"]
+    reloaded = GeneratedPks.from_chunks(chunks[name] for name in sorted(chunks))
+    assert reloaded.to_dict() == generated_pks.to_dict()
+
+    # Changing one primary key only changes the chunk that contains it.
+    reloaded[4] = hashes[5]
+    reloaded[200_002] = hashes[2]
+    new_chunks = reloaded.to_chunks()
+    assert new_chunks["00000000"] != chunks["00000000"]
+    assert new_chunks["00000001"] == chunks["00000001"]
+    assert new_chunks["00000003"] != chunks["00000003"]
+    assert reloaded[4] == hashes[5]
+    assert reloaded.max_pk == 200_002
+
+    # Primary keys with the same hash are reassigned lowest first.
+    unassigned = generated_pks.unassigned_pks_index()
+    assert unassigned.pop(hashes[1]) == 1
+    assert unassigned.pop(hashes[1]) == 31
+    assert unassigned.pop(pygit2.hash(b"new").hex) is None
+    assert 1 not in unassigned.unassigned_pks()
+    assert len(unassigned.unassigned_pks()) == len(legacy_json) - 2
+
+
+def test_generated_pks_json_fails_cleanly_on_older_kart(
+    data_archive, tmp_path, cli_runner, chdir
+):
+    with data_archive("shapefiles/shp-points.tgz") as data:
+        repo_path = tmp_path / "repo"
+        repo_path.mkdir()
+        with chdir(repo_path):
+            r = cli_runner.invoke(["init"])
+            assert r.exit_code == 0, r
+            r = cli_runner.invoke(["import", data / "nz_pa_points_topo_150k.shp"])
+            assert r.exit_code == 0, r.stderr
+
+        repo = KartRepo(repo_path)
+        dataset = repo.datasets()[H.POINTS.LAYER]
+        data = dataset.get_meta_item(PkGeneratingTableImportSource.GENERATED_PKS_ITEM)
+        assert data["generatedPrimaryKeysVersion"] == 1
+        assert data["generatedPrimaryKeysCount"] == H.POINTS.ROWCOUNT
+
+        # This is how versions of Kart that only know the original JSON format read the mapping.
+        with pytest.raises(ValueError, match="upgrade Kart to reimport this dataset"):
+            {int(pk): h for pk, h in data["generatedPrimaryKeys"].items()}
+
+
 def test_postgis_import_replace_no_ids(
     postgis_db,
     postgis_layer,
@@ -932,6 +1067,61 @@ def test_import_multiple(data_archive, chdir, cli_runner, tmp_path):
         assert tree / f_path
 
 
+@pytest.mark.parametrize("max_concurrent_sources", [1, 2])
+def test_import_multiple_concurrently(
+    max_concurrent_sources, data_archive, chdir, cli_runner, tmp_path
+):
+    repo_path = tmp_path / "repo"
+    repo_path.mkdir()
+    with data_archive("gpkg-polygons") as data:
+        with chdir(repo_path):
+            r = cli_runner.invoke(["init"])
+            assert r.exit_code == 0, r
+
+            r = cli_runner.invoke(
+                [
+                    "import",
+                    f"GPKG:{data / 'nz-waca-adjustments.gpkg'}",
+                    f"{H.POLYGONS.LAYER}:first",
+                    f"{H.POLYGONS.LAYER}:second",
+                    f"--max-concurrent-sources={max_concurrent_sources}",
+                ]
+            )
+            assert r.exit_code == 0, r
+
+            repo = KartRepo(repo_path)
+            # A single commit, containing both datasets.
+            assert len(list(repo.walk(repo.head.target))) == 1
+            first = repo.datasets()["first"]
+            second = repo.datasets()["second"]
+            assert first.feature_count == second.feature_count == H.POLYGONS.ROWCOUNT
+            assert first.feature_tree.id == second.feature_tree.id
+
+
+@pytest.mark.parametrize(
+    "archive,source_name",
+    [
+        pytest.param("gpkg-polygons", "nz-waca-adjustments.gpkg", id="gpkg"),
+        pytest.param(
+            "shapefiles/shp-polygons.tgz", "nz_waca_adjustments.shp", id="shp"
+        ),
+    ],
+)
+def test_pickle_import_source(archive, source_name, data_archive, tmp_path):
+    # Sources are pickled to send them to worker processes, when several are imported at once.
+    repo = KartRepo.init_repository(tmp_path / "repo")
+    with data_archive(archive) as data:
+        source = TableImportSource.open(data / source_name, table=H.POLYGONS.LAYER)
+        source = PkGeneratingTableImportSource.wrap_source_if_needed(source, repo)
+        unpickled = pickle.loads(pickle.dumps(source))
+
+        assert type(unpickled) is type(source)
+        assert unpickled.dest_path == source.dest_path
+        assert unpickled.schema == source.schema
+        with source, unpickled:
+            assert list(unpickled.features()) == list(source.features())
+
+
 def test_import_into_empty_branch(data_archive, cli_runner, chdir, tmp_path):
     repo_path = tmp_path / "repo"
     repo_path.mkdir()
@@ -1049,6 +1239,201 @@ def test_fast_import(data_archive, tmp_path, cli_runner, chdir):
             assert feature_count == source.feature_count
 
 
+@pytest.mark.slow
+def test_fast_import_parallel_encoding(data_archive, tmp_path, cli_runner, chdir):
+    table = H.POINTS.LAYER
+    with data_archive("gpkg-points") as data:
+        trees = []
+        for num_processes in (1, 3):
+            repo_path = tmp_path / f"repo-{num_processes}"
+            repo_path.mkdir()
+
+            with chdir(repo_path):
+                r = cli_runner.invoke(["init"])
+                assert r.exit_code == 0, r
+
+                repo = KartRepo(repo_path)
+
+                source = TableImportSource.open(
+                    data / "nz-pa-points-topo-150k.gpkg", table=table
+                )
+                settings = fast_import.FastImportSettings(
+                    num_processes=num_processes, chunk_size=100
+                )
+                fast_import.fast_import_tables(
+                    repo, [source], settings=settings, from_commit=None
+                )
+                trees.append(repo.head_tree.id)
+
+                dataset = repo.datasets()[table]
+                assert dataset.feature_count == source.feature_count
+
+        # Encoding features in worker processes should give exactly the same result.
+        assert trees[0] == trees[1]
+
+
+@pytest.mark.parametrize(
+    "archive,source_name,table",
+    [
+        pytest.param(
+            "shapefiles/shp-points.tgz",
+            "nz_pa_points_topo_150k.shp",
+            H.POINTS.LAYER,
+            id="points",
+        ),
+        pytest.param(
+            "shapefiles/shp-polygons.tgz",
+            "nz_waca_adjustments.shp",
+            "nz_waca_adjustments",
+            id="polygons",
+        ),
+    ],
+)
+def test_import_source_arrow_batches(archive, source_name, table, data_archive):
+    with data_archive(archive) as data:
+        source = TableImportSource.open(data / source_name, table=table)
+        with source:
+            if not source._can_read_arrow_batches():
+                pytest.skip("GDAL can't read this layer in Arrow batches")
+            arrow_features = list(source.features())
+
+            source._arrow_batches = lambda: None
+            ogr_features = list(source.features())
+
+        # Reading features in batches should give exactly the same result as reading them one at a time.
+        assert len(arrow_features) == source.feature_count
+        assert arrow_features == ogr_features
+
+
+@pytest.mark.parametrize("nullable", [True, False])
+def test_import_source_arrow_batches_nulls(nullable, tmp_path):
+    gpkg_path = tmp_path / "nulls.gpkg"
+    ds = gdal.GetDriverByName("GPKG").Create(
+        str(gpkg_path), 0, 0, 0, gdal.GDT_Unknown
+    )
+    layer = ds.CreateLayer("nulls", geom_type=ogr.wkbPoint)
+    bool_defn = ogr.FieldDefn("b", ogr.OFTInteger)
+    bool_defn.SetSubType(ogr.OFSTBoolean)
+    field_defns = [
+        ogr.FieldDefn("i", ogr.OFTInteger64),
+        ogr.FieldDefn("f", ogr.OFTReal),
+        ogr.FieldDefn("d", ogr.OFTDate),
+        bool_defn,
+        ogr.FieldDefn("s", ogr.OFTString),
+    ]
+    for field_defn in field_defns:
+        field_defn.SetNullable(nullable)
+        layer.CreateField(field_defn)
+
+    rows = [
+        (12, 1.5, (2020, 2, 29), 1, "a"),
+        (0, 0.0, (1970, 1, 1), 0, ""),
+    ]
+    if nullable:
+        rows.append((None,) * 5)
+    for row in rows:
+        feature = ogr.Feature(layer.GetLayerDefn())
+        for name, value in zip("ifdbs", row):
+            if value is None:
+                feature.SetFieldNull(name)
+            elif name == "d":
+                feature.SetField(name, *value, 0, 0, 0, 0)
+            else:
+                feature.SetField(name, value)
+        layer.CreateFeature(feature)
+    del layer, ds
+
+    source = TableImportSource.open(f"OGR:{gpkg_path}", table="nulls")
+    with source:
+        if nullable:
+            # Nullable numbers, dates and booleans can't be read in batches.
+            assert not source._can_read_arrow_batches()
+        else:
+            assert source._can_read_arrow_batches() == gdal_supports_arrow_batches()
+        features = list(source.features())
+
+        source._arrow_batches = lambda: None
+        ogr_features = list(source.features())
+
+    assert features == ogr_features
+    assert [f["d"] for f in features][:2] == ["2020-02-29", "1970-01-01"]
+    if nullable:
+        assert [features[2][k] for k in "ifdbs"] == [None] * 5
+
+
+def test_fast_import_resumable(data_archive, tmp_path, cli_runner, chdir):
+    table = H.POINTS.LAYER
+    with data_archive("gpkg-points") as data:
+        trees = []
+        for resumable in (False, True):
+            repo_path = tmp_path / f"repo-{resumable}"
+            repo_path.mkdir()
+
+            with chdir(repo_path):
+                r = cli_runner.invoke(["init"])
+                assert r.exit_code == 0, r
+
+                repo = KartRepo(repo_path)
+                source = TableImportSource.open(
+                    data / "nz-pa-points-topo-150k.gpkg", table=table
+                )
+                settings = fast_import.FastImportSettings(checkpoint_interval=100)
+
+                if resumable:
+                    resumable_features = source.resumable_features
+
+                    def interrupted_features(position=None):
+                        for i, item in enumerate(resumable_features(position)):
+                            if i == 1050:
+                                raise RuntimeError("Connection lost")
+                            yield item
+
+                    source.resumable_features = interrupted_features
+                    with pytest.raises(RuntimeError):
+                        fast_import.fast_import_tables(
+                            repo,
+                            [source],
+                            settings=settings,
+                            from_commit=None,
+                            resumable=True,
+                        )
+                    assert repo.head_is_unborn
+                    state = json.loads(
+                        repo.read_gitdir_file(KartRepoFiles.IMPORT_STATE)
+                    )
+                    assert len(state["checkpoints"]) == 10
+                    assert state["checkpoints"][-1]["count"] == 1000
+
+                    resumed_from = []
+
+                    def resumed_features(position=None):
+                        resumed_from.append(position)
+                        yield from resumable_features(position)
+
+                    source.resumable_features = resumed_features
+
+                fast_import.fast_import_tables(
+                    repo,
+                    [source],
+                    settings=settings,
+                    from_commit=None,
+                    resumable=resumable,
+                )
+                trees.append(repo.head_tree.id)
+
+                if resumable:
+                    # The second import continued from the last checkpoint, and then cleaned up after itself.
+                    assert resumed_from == [state["checkpoints"][-1]["position"]]
+                    assert not repo.gitdir_file(KartRepoFiles.IMPORT_STATE).exists()
+                    assert not [
+                        r for r in repo.references if r.startswith("refs/kart-import/")
+                    ]
+                    assert len(list(repo.walk(repo.head.target))) == 1
+
+        # The interrupted and resumed import gives the same result as an uninterrupted one.
+        assert trees[0] == trees[1]
+
+
 def test_postgis_import_with_sampled_geometry_dimension(
     postgis_db,
     data_archive,
@@ -1,7 +1,23 @@
+import logging
+
+import msgpack
+import pytest
 from memory_repo import MemoryTree, MemoryRepo
 
+from kart.geometry import Geometry
+
+from kart.parsed_blob_cache import PARSED_BLOB_CACHE
+from kart.repo import KartRepo
+from kart.tabular.feature_cache import DECODED_FEATURE_CACHE
 from kart.tabular.v3 import TableV3
 from kart.schema import Legend, ColumnSchema, Schema
+from kart.serialise_util import (
+    msg_pack,
+    msg_pack_many,
+    msg_pack_scalars,
+    msg_unpack,
+    msg_unpack_many,
+)
 
 
 DATASET_PATH = "path/to/dataset"
@@ -26,6 +42,55 @@ def test_legend_roundtrip():
     assert roundtripped == orig
 
 
+def test_parsed_blobs_shared_between_datasets(gen_uuid):
+    schema = Schema(
+        [
+            ColumnSchema(gen_uuid(), "id", "integer", 0),
+            ColumnSchema(gen_uuid(), "name", "text", None),
+        ]
+    )
+    empty_dataset = TableV3.new_dataset_for_writing(DATASET_PATH, schema, MemoryRepo())
+    schema_path, schema_data = empty_dataset.encode_schema(schema)
+    legend_path, legend_data = empty_dataset.encode_legend(schema.legend)
+
+    PARSED_BLOB_CACHE.clear()
+    # Two commits that both contain the same schema and legend blobs:
+    datasets = [
+        TableV3(
+            MemoryTree({schema_path: schema_data, legend_path: legend_data})
+            / DATASET_PATH,
+            DATASET_PATH,
+            MemoryRepo(),
+        )
+        for i in range(2)
+    ]
+    legend_hash = schema.legend.hexhash()
+    assert datasets[0].schema == schema
+    assert datasets[1].schema is datasets[0].schema
+    assert datasets[0].get_legend(legend_hash) == schema.legend
+    assert datasets[1].get_legend(legend_hash) is datasets[0].get_legend(legend_hash)
+
+    assert PARSED_BLOB_CACHE.stats()["kinds"] == {
+        "legend": {"hits": 1, "misses": 1},
+        "schema": {"hits": 1, "misses": 1},
+    }
+
+
+def test_parsed_blob_cache_stats_logged(data_archive, cli_runner, caplog):
+    with data_archive("points"):
+        PARSED_BLOB_CACHE.clear()
+        caplog.set_level(logging.DEBUG)
+        r = cli_runner.invoke(["-vv", "log", "--with-feature-count=exact"])
+        assert r.exit_code == 0, r.stderr
+        messages = [
+            r.getMessage()
+            for r in caplog.records
+            if r.name == "kart.parsed_blob_cache"
+        ]
+        assert len(messages) == 1
+        assert messages[0].startswith("Parsed blob cache: {'entries': ")
+
+
 def test_raw_dict_to_value_tuples():
     legend = Legend(["a", "b", "c"], ["d", "e", "f"])
     raw_feature_dict = {
@@ -203,6 +268,70 @@ def test_feature_roundtrip(gen_uuid):
     assert roundtripped_feature == feature_dict
     # We guarantee that the dict iterates in row-order.
     assert tuple(roundtripped_feature.values()) == feature_tuple
+    assert tableV3.get_feature_row(path=feature_path) == feature_tuple
+
+
+def test_decoded_feature_cache(gen_uuid):
+    schema = Schema(
+        [
+            ColumnSchema(gen_uuid(), "id", "integer", 0),
+            ColumnSchema(gen_uuid(), "name", "text", None),
+        ]
+    )
+    empty_dataset = TableV3.new_dataset_for_writing(DATASET_PATH, schema, MemoryRepo())
+    schema_path, schema_data = empty_dataset.encode_schema(schema)
+    legend_path, legend_data = empty_dataset.encode_legend(schema.legend)
+    tree = MemoryTree({schema_path: schema_data, legend_path: legend_data})
+    for feature in [(1, "one"), (2, "two"), (3, "three")]:
+        feature_path, feature_data = empty_dataset.encode_feature(feature, schema)
+        tree.all_blobs[feature_path] = feature_data
+
+    DECODED_FEATURE_CACHE.clear()
+    DECODED_FEATURE_CACHE.configure(1024 * 1024)
+    try:
+        # Each dataset instance decodes the features, but they are only decoded once.
+        for i in range(2):
+            tableV3 = TableV3(tree / DATASET_PATH, DATASET_PATH, MemoryRepo())
+            assert tableV3.get_feature(1) == {"id": 1, "name": "one"}
+            assert tableV3.get_feature_row(2) == (2, "two")
+        stats = DECODED_FEATURE_CACHE.stats()
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 2, 2)
+
+        # Shrinking the budget evicts the least recently used features.
+        DECODED_FEATURE_CACHE.configure(DECODED_FEATURE_CACHE.row_size((2, "two")) + 10)
+        stats = DECODED_FEATURE_CACHE.stats()
+        assert (stats["entries"], stats["evictions"]) == (1, 1)
+        assert tableV3.get_feature(2) == {"id": 2, "name": "two"}
+        assert DECODED_FEATURE_CACHE.stats()["hits"] == 3
+    finally:
+        DECODED_FEATURE_CACHE.configure(0)
+        DECODED_FEATURE_CACHE.clear()
+
+
+def test_decoded_feature_cache_stats_logged(data_archive, cli_runner, caplog):
+    with data_archive("points") as repo_path:
+        r = cli_runner.invoke(["config", "kart.featurecache.maxbytes", "1m"])
+        assert r.exit_code == 0, r.stderr
+        try:
+            caplog.set_level(logging.DEBUG)
+            r = cli_runner.invoke(["-vv", "diff", "HEAD^..HEAD"])
+            assert r.exit_code == 0, r.stderr
+            messages = [
+                r.getMessage()
+                for r in caplog.records
+                if r.name == "kart.tabular.feature_cache"
+            ]
+            assert len(messages) == 1
+            assert messages[0].startswith("Decoded feature cache: {'entries': ")
+            assert DECODED_FEATURE_CACHE.max_bytes == 1024 * 1024
+
+            # The cache is configured once per command - opening another repo doesn't change it.
+            DECODED_FEATURE_CACHE.configure(1234)
+            KartRepo(repo_path)
+            assert DECODED_FEATURE_CACHE.max_bytes == 1234
+        finally:
+            DECODED_FEATURE_CACHE.configure(0)
+            DECODED_FEATURE_CACHE.clear()
 
 
 def test_schema_change_roundtrip(gen_uuid):
@@ -271,3 +400,88 @@ def test_schema_change_roundtrip(gen_uuid):
     }
     # We guarantee that the dict iterates in row-order.
     assert tuple(roundtripped.values()) == (7, None, "Bloggs", "Joe", None)
+    assert tableV3.get_feature_row(path=feature_path) == (
+        7,
+        None,
+        "Bloggs",
+        "Joe",
+        None,
+    )
+
+    project = new_schema.legend_projection(old_schema.legend)
+    assert project((7,), ("Joe", "Bloggs", "1970-01-01")) == (
+        7,
+        None,
+        "Bloggs",
+        "Joe",
+        None,
+    )
+    project = new_schema.legend_projection(new_schema.legend)
+    assert project((7,), (None, "Bloggs", "Joe", None)) == (
+        7,
+        None,
+        "Bloggs",
+        "Joe",
+        None,
+    )
+
+
+def test_msg_pack_many():
+    geom = Geometry.from_wkt("POINT(1 2)")
+    values = [
+        ["abc123", (i, geom, True, 1.5, f"feature {i}", b"bytes", None)]
+        for i in range(3)
+    ]
+    packed = msg_pack_many(values)
+    assert packed == [msg_pack(v) for v in values]
+    assert msg_unpack_many(packed) == [msg_unpack(p) for p in packed]
+    assert msg_unpack_many(packed)[2] == [
+        "abc123",
+        [2, geom, True, 1.5, "feature 2", b"bytes", None],
+    ]
+
+    # The reused packers give exactly the same bytes as msgpack.packb, so existing paths and blobs don't change.
+    assert msg_pack(["abc123", ("abc", 123)]) == msgpack.packb(
+        ["abc123", ["abc", 123]], use_bin_type=True
+    )
+    for pk_values in [(1,), (-1, "abc"), (2**40, b"xyz", None, True, 1.5)]:
+        assert msg_pack_scalars(pk_values) == msgpack.packb(
+            list(pk_values), use_bin_type=True
+        )
+        assert msg_pack_scalars(pk_values) == msg_pack(pk_values)
+
+
+@pytest.mark.parametrize("impl", ["packb", "batch"])
+def test_msg_pack_performance(impl, benchmark):
+    geom = Geometry.from_wkt("POLYGON((0 0,0 1,1 1,1 0,0 0))")
+    values = [
+        ["abc123", (i, geom, True, 1.5, f"feature {i}", None)] for i in range(10_000)
+    ]
+
+    if impl == "packb":
+
+        def _pack_and_unpack():
+            packed = [
+                msgpack.packb(
+                    v,
+                    use_bin_type=True,
+                    strict_types=True,
+                    default=lambda o: msgpack.ExtType(ord("G"), o)
+                    if isinstance(o, Geometry)
+                    else list(o),
+                )
+                for v in values
+            ]
+            return [msgpack.unpackb(p, raw=False) for p in packed]
+
+    else:
+
+        def _pack_and_unpack():
+            return msg_unpack_many(msg_pack_many(values))
+
+    benchmark.group = "test_msg_pack_performance"
+    assert len(benchmark(_pack_and_unpack)) == len(values)
+    if not benchmark.disabled:
+        benchmark.extra_info["features_per_second"] = (
+            len(values) / benchmark.stats.stats.mean
+        )